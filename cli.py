@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""Headless entry point: ``python cli.py <command> ...``.
+
+Commands mirror the GUI tabs: ``copy`` (xlMerger), ``merge``, ``split``,
+``limits`` and ``craft`` (Excel Builder); ``journal`` queries the SQLite
+journal written by ``copy --journal``. They read the same JSON the GUI
+works with and never import Qt. Engines are imported inside the command,
+so ``--help`` and argument errors return at once.
+
+stdout carries one JSON object per line: ``progress``/``status`` events
+while a job runs, then ``done`` with the outputs and metrics, or
+``error``. Log messages go to stderr.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_VIOLATIONS = 3
+EXIT_CANCELLED = 130
+
+
+def _emit(event, **fields):
+    print(json.dumps({"event": event, **fields}, ensure_ascii=False, default=str), flush=True)
+
+
+def _load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _copy_columns(mapping, folder):
+    """Turn the GUI mapping ``{short name: column}`` into engine arguments.
+
+    A key naming a sub-folder of ``folder`` is a language folder; any other
+    key is matched against the workbooks in ``folder`` by name or stem.
+    Returns ``(file_to_column, folder_to_column)``.
+    """
+    if "file_to_column" in mapping or "folder_to_column" in mapping:
+        return mapping.get("file_to_column") or {}, mapping.get("folder_to_column") or {}
+    workbooks = {}
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith((".xlsx", ".xls")) and not name.startswith("~$"):
+            workbooks.setdefault(name, name)
+            workbooks.setdefault(os.path.splitext(name)[0], name)
+    file_to_column, folder_to_column = {}, {}
+    for key, column in mapping.items():
+        if os.path.isdir(os.path.join(folder, key)):
+            folder_to_column[key] = column
+        elif key in workbooks:
+            file_to_column[workbooks[key]] = column
+        else:
+            raise ValueError(f"'{key}' не найден в {folder}: нет ни папки, ни файла Excel с таким именем")
+    if file_to_column and folder_to_column:
+        raise ValueError("Сопоставление смешивает файлы и папки; используйте что-то одно")
+    return file_to_column, folder_to_column
+
+
+def cmd_copy(args):
+    from core.excel_processor import ExcelProcessor
+    from core.publisher import default_publisher
+    from core.staging import default_staging
+    from utils.logger import Logger
+
+    file_to_column, folder_to_column = _copy_columns(_load_json(args.mapping), args.folder)
+    sheets = args.sheets or ExcelProcessor.get_sheet_names(args.target)
+    processor = ExcelProcessor(
+        main_excel_path=args.target,
+        folder_path=args.folder,
+        copy_column=args.source_column,
+        selected_sheets=sheets,
+        sheet_to_header_row={sheet: args.header_row - 1 for sheet in sheets},
+        sheet_to_column={sheet: args.source_column for sheet in sheets},
+        file_to_column=file_to_column,
+        folder_to_column=folder_to_column,
+        file_to_sheet_map=_load_json(args.sheet_map) if args.sheet_map else None,
+        skip_first_row=args.skip_first_row,
+        copy_by_row_number=args.by_row_number,
+        preserve_formatting=args.preserve_formatting,
+        logger=Logger(args.log, fmt=args.log_format, journal=args.journal),
+        verify_mode=args.verify,
+        workers=args.workers,
+        key_column=args.key_column,
+        source_key_column=args.source_key_column,
+        selected_sheets_only=True,
+        use_cache=args.cache,
+        incremental=args.incremental,
+        staging=None if args.no_staging else default_staging(),
+        publisher=default_publisher(),
+        checkpoint=args.checkpoint,
+    )
+    output, metrics = processor.copy_data(
+        progress_callback=lambda step, total: _emit("progress", step=step, total=total),
+        status_callback=lambda status: _emit("status", **status),
+        with_metrics=True,
+    )
+    _emit(
+        "done",
+        outputs=[output],
+        cache_hit=processor.cache_hit,
+        resumed_files=processor.resumed_files,
+        source_errors=processor.source_errors,
+        verification_mismatches=len(processor.verification_mismatches),
+        metrics=metrics.to_dict(),
+    )
+    return EXIT_OK
+
+
+def cmd_merge(args):
+    from core.merge_columns import merge_targets
+    from core.publisher import default_publisher
+    from core.source_cache import SourceColumnCache
+    from core.staging import default_staging
+
+    config = _load_json(args.config)
+    # Список задач в формате MultiMergeMappingDialog или одна задача.
+    tasks = config.get("tasks", [config]) if isinstance(config, dict) else config
+    publisher = default_publisher()
+    staging = None if args.no_staging else default_staging()
+    source_cache = SourceColumnCache()
+    for task in tasks:
+        for mapping in task.get("mappings", []):
+            source_cache.expect(mapping["source"], mapping.get("source_columns", []))
+
+    def progress(done, total, task, mapping):
+        _emit("progress", target=task["target"], step=done, total=total, source=mapping.get("source"))
+
+    started = time.perf_counter()
+    outputs, failed = [], []
+    for task, output, error in merge_targets(
+        tasks, workers=args.workers, progress_callback=progress, staging=staging, publisher=publisher,
+        source_cache=source_cache, verify_mode=args.verify, copy_styles=not args.values_only,
+    ):
+        if error is not None:
+            failed.append(task["target"])
+            _emit("log", message=f"✗ {task['target']}: {error}")
+        else:
+            outputs.append(output)
+    publisher.wait(outputs)
+    _emit("done", outputs=outputs, failed=failed, metrics={
+        "total_seconds": time.perf_counter() - started,
+        "targets": len(tasks),
+        "mappings": sum(len(task.get("mappings", [])) for task in tasks),
+        "sources_parsed": source_cache.parses,
+        "source_cache_hits": source_cache.hits,
+    })
+    return EXIT_ERROR if failed else EXIT_OK
+
+
+def _split_config(config):
+    """``{sheet: [source, targets, extras]}`` as saved from SplitMappingDialog."""
+    result = {}
+    for sheet, entry in config.items():
+        if isinstance(entry, dict):
+            entry = (entry.get("source"), entry.get("targets"), entry.get("extras"))
+        source, targets, extras = entry
+        result[sheet] = (source, targets or None, extras or None)
+    return result
+
+
+def cmd_split(args):
+    from core.split_excel import split_excel_multiple_sheets
+    from core.staging import default_staging
+
+    started = time.perf_counter()
+    created = split_excel_multiple_sheets(
+        args.excel,
+        _split_config(_load_json(args.config)),
+        output_dir=args.output_dir,
+        progress_callback=lambda idx, total, name: _emit("progress", step=idx, total=total, file=name),
+        staging=None if args.no_staging else default_staging(),
+    )
+    _emit("done", outputs=created, metrics={"total_seconds": time.perf_counter() - started})
+    return EXIT_OK
+
+
+def _limit_mappings(config):
+    """JSON lists back to the tuples built by the limits MappingDialog."""
+    mappings = []
+    for mapping in config:
+        if mapping[-1] == "cell":
+            cells, *rest = mapping
+            mappings.append(([tuple(cell) for cell in cells], *rest))
+        else:
+            mappings.append(tuple(mapping))
+    return mappings
+
+
+def cmd_limits(args):
+    from openpyxl import load_workbook
+
+    from core.limit_auto import check_limits_auto
+    from core.limit_manual import check_limits_manual
+
+    started = time.perf_counter()
+    mappings = _limit_mappings(_load_json(args.config))
+    workbook = load_workbook(args.excel)
+    try:
+        sheet = workbook[args.sheet] if args.sheet else workbook.active
+        headers = [str(cell.value) if cell.value is not None else ""
+                   for cell in next(sheet.iter_rows(min_row=1, max_row=1))]
+        auto_lines, auto_violations = check_limits_auto(sheet, headers, mappings)
+        manual_lines, manual_violations = check_limits_manual(sheet, headers, mappings)
+        base, ext = os.path.splitext(args.excel)
+        output = args.output or f"{base}_checked{ext}"
+        workbook.save(output)
+    finally:
+        workbook.close()
+    violations = auto_violations + manual_violations
+    _emit("done", outputs=[output], violations=violations, report=auto_lines + manual_lines,
+          metrics={"total_seconds": time.perf_counter() - started})
+    return EXIT_VIOLATIONS if violations and args.fail_on_violations else EXIT_OK
+
+
+def cmd_craft(args):
+    from core.publisher import PublishError, default_publisher
+    from excel_builder import ExcelBuilderExecutor, ExcelFilesManager
+
+    started = time.perf_counter()
+    operations = _load_json(args.config)
+    if isinstance(operations, dict):
+        operations = operations.get("operations", [])
+    manager = ExcelFilesManager()
+    for path in args.inputs:
+        if os.path.isdir(path):
+            manager.add_folder(path)
+        else:
+            manager.add_files([path])
+    if not manager.files:
+        raise ValueError("Не найдено ни одного файла Excel")
+    output_root = args.output_root or manager.build_output_root()
+    os.makedirs(output_root, exist_ok=True)
+    executor = ExcelBuilderExecutor(log_callback=lambda text: _emit("log", message=text),
+                                    publisher=default_publisher())
+    uploads = [(f, executor.process_file(f, output_root, operations)) for f in manager.files]
+    failed = []
+    for idx, (f, upload) in enumerate(uploads, start=1):
+        try:
+            if upload is not None:
+                upload.result()
+        except PublishError as e:
+            failed.append(f["path"])
+            _emit("log", message=f"✗ {f['path']}: {e}")
+        _emit("progress", step=idx, total=len(uploads), file=f["path"])
+    _emit("done", outputs=[output_root], failed=failed,
+          metrics={"total_seconds": time.perf_counter() - started, "files": len(uploads)})
+    return EXIT_ERROR if failed else EXIT_OK
+
+
+def cmd_journal(args):
+    from utils.journal import CopyJournal
+
+    journal = CopyJournal(args.db)
+    limit = args.limit or None
+    if args.runs:
+        for run in journal.runs(target=args.target, limit=limit):
+            _emit("run", **run)
+    else:
+        for event in journal.events(target=args.target, sheet=args.sheet, row=args.row, col=args.col,
+                                    run_id=args.run, level=args.level, limit=limit):
+            _emit("cell", **event)
+    return EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="xlmerger", description="xlMerger без графического интерфейса")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    copy = commands.add_parser("copy", help="копировать переводы в целевой файл (xlMerger)")
+    copy.add_argument("target", help="целевой файл Excel")
+    copy.add_argument("--folder", required=True, help="папка с файлами или папками переводов")
+    copy.add_argument("--mapping", required=True, help="JSON сопоставления, сохранённый в GUI")
+    copy.add_argument("--sheets", nargs="+", help="листы цели (по умолчанию все)")
+    copy.add_argument("--header-row", type=int, default=1, help="номер строки заголовков (с 1)")
+    copy.add_argument("--source-column", default="A", help="буква столбца в файлах перевода")
+    copy.add_argument("--sheet-map", help="JSON {файл: {лист цели: лист перевода}}")
+    copy.add_argument("--key-column", help="столбец ключей в цели (буква или заголовок)")
+    copy.add_argument("--source-key-column", default="A", help="столбец ключей в переводах")
+    copy.add_argument("--skip-first-row", action="store_true")
+    copy.add_argument("--by-row-number", action="store_true", help="копировать по номеру строки")
+    copy.add_argument("--preserve-formatting", action="store_true")
+    copy.add_argument("--verify", choices=("off", "fast", "strict"), default="off")
+    copy.add_argument("--workers", type=int, default=0, help="процессов для разбора источников")
+    copy.add_argument("--cache", action="store_true", help="не пересобирать неизменившийся результат")
+    copy.add_argument("--incremental", action="store_true", help="записывать только изменившиеся ячейки")
+    copy.add_argument("--checkpoint", action="store_true", help="продолжать прерванный запуск")
+    copy.add_argument("--log", default="copy_log.txt", help="журнал копирования")
+    copy.add_argument("--log-format", choices=("text", "json"), default="text", help="формат журнала")
+    copy.add_argument("--journal", help="SQLite-журнал запусков и скопированных ячеек")
+    copy.add_argument("--no-staging", action="store_true", help="читать сетевые файлы на месте")
+    copy.set_defaults(handler=cmd_copy)
+
+    merge = commands.add_parser("merge", help="объединить столбцы из других книг")
+    merge.add_argument("config", help="JSON: задачи {target, mappings, output?}")
+    merge.add_argument("--verify", choices=("off", "fast", "strict"), default="off")
+    merge.add_argument("--no-staging", action="store_true")
+    merge.add_argument("--values-only", action="store_true", help="копировать только значения, без формата")
+    merge.add_argument("--workers", type=int, default=1, help="процессов, по одной цели на процесс")
+    merge.set_defaults(handler=cmd_merge)
+
+    split = commands.add_parser("split", help="разделить книгу на языковые пары")
+    split.add_argument("excel")
+    split.add_argument("config", help="JSON {лист: [исходный столбец, целевые|null, доп.|null]}")
+    split.add_argument("--output-dir")
+    split.add_argument("--no-staging", action="store_true")
+    split.set_defaults(handler=cmd_split)
+
+    limits = commands.add_parser("limits", help="проверить лимиты длины текста")
+    limits.add_argument("excel")
+    limits.add_argument("config", help="JSON со списком сопоставлений лимитов")
+    limits.add_argument("--sheet", help="лист (по умолчанию активный)")
+    limits.add_argument("--output", help="куда сохранить отмеченную книгу")
+    limits.add_argument("--fail-on-violations", action="store_true",
+                        help=f"код выхода {EXIT_VIOLATIONS}, если есть нарушения")
+    limits.set_defaults(handler=cmd_limits)
+
+    craft = commands.add_parser("craft", help="применить операции Excel Builder к файлам")
+    craft.add_argument("inputs", nargs="+", help="файлы или папки Excel")
+    craft.add_argument("--config", required=True, help="JSON со списком операций")
+    craft.add_argument("--output-root", help="папка результата (по умолчанию <папка>_upd)")
+    craft.set_defaults(handler=cmd_craft)
+
+    journal = commands.add_parser("journal", help="найти в SQLite-журнале, какой запуск записал ячейку")
+    journal.add_argument("db", help="файл журнала (copy --journal)")
+    journal.add_argument("--runs", action="store_true", help="список запусков вместо ячеек")
+    journal.add_argument("--target", help="целевой файл")
+    journal.add_argument("--sheet")
+    journal.add_argument("--row", type=int)
+    journal.add_argument("--col", type=int, help="номер столбца (с 1)")
+    journal.add_argument("--run", type=int, help="id запуска")
+    journal.add_argument("--level", choices=("COPY", "ERROR"))
+    journal.add_argument("--limit", type=int, default=100, help="0 — без ограничения")
+    journal.set_defaults(handler=cmd_journal)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except KeyboardInterrupt:
+        _emit("error", message="cancelled")
+        return EXIT_CANCELLED
+    except Exception as e:  # noqa: BLE001 - ошибка уходит в JSON и код выхода
+        from core.cancel import OperationCancelled
+
+        if isinstance(e, OperationCancelled):
+            _emit("error", message=str(e))
+            return EXIT_CANCELLED
+        _emit("error", message=str(e), type=type(e).__name__)
+        return EXIT_ERROR
+
+
+if __name__ == "__main__":
+    import multiprocessing
+
+    # Пул процессов (--workers) в собранном приложении.
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Cooperative cancellation for long-running jobs.
+
+The GUI owns a :class:`CancelToken` and sets it from its thread; the job
+checks it between files and every few hundred rows and stops with
+:class:`OperationCancelled`. Nothing is interrupted mid-write.
+"""
+import threading
+
+
+class OperationCancelled(Exception):
+    """Raised inside a job after its :class:`CancelToken` was cancelled."""
+
+    def __init__(self, message: str = "Операция отменена пользователем"):
+        super().__init__(message)
+
+
+class CancelToken:
+    """Thread-safe flag shared between the job and the code that stops it.
+
+    ``event`` may be a ``multiprocessing`` event to share the flag with
+    worker processes.
+    """
+
+    def __init__(self, event=None):
+        self._event = event if event is not None else threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise OperationCancelled()
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""Checkpoints of long copy runs, so a failed run can resume.
+
+``ExcelProcessor`` applies source files one by one in a fixed order. A
+:class:`RunCheckpoint` records, for every finished source file, the exact
+sequence of cell writes it produced (value and style) and how many
+errors it logged. The records are appended to ``<target>_out.xlsx.checkpoint``
+every ``interval`` seconds and whenever the run fails, one JSON document per
+line. The file often sits on a shared drive, so it holds only data: cell
+values are tagged JSON and styles the XML of their openpyxl objects.
+
+A resumed run replays the recorded writes of the leading files that are
+still unchanged instead of parsing them again, then continues with the
+next file. Because the replay goes through the same code path in the same
+order, the in-memory target state, and therefore the saved output, is the
+same as after an uninterrupted run. The file is deleted after a
+successful save.
+"""
+import datetime
+import decimal
+import json
+import os
+import time
+from typing import Dict, List
+
+from openpyxl.styles import Alignment, Border, Font, Protection
+from openpyxl.styles.fills import Fill
+from openpyxl.xml.functions import fromstring, tostring
+
+from core.run_cache import config_digest
+from core.source_reader import CellStyle
+
+CHECKPOINT_VERSION = 2
+CHECKPOINT_SUFFIX = ".checkpoint"
+
+
+def _stat(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+_VALUE_TYPES = (
+    ("datetime", datetime.datetime, datetime.datetime.fromisoformat),
+    ("date", datetime.date, datetime.date.fromisoformat),
+    ("time", datetime.time, datetime.time.fromisoformat),
+)
+# Порядок полей CellStyle и классы для разбора их XML.
+_STYLE_CLASSES = (Font, Border, Fill, None, Protection, Alignment)
+
+
+def _encode_value(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    for tag, kind, _parse in _VALUE_TYPES:
+        if isinstance(value, kind):
+            return {tag: value.isoformat()}
+    if isinstance(value, datetime.timedelta):
+        return {"timedelta": value.total_seconds()}
+    if isinstance(value, decimal.Decimal):
+        return {"decimal": str(value)}
+    raise TypeError(f"Значение {type(value).__name__} не сохраняется в контрольной точке")
+
+
+def _decode_value(value):
+    if not isinstance(value, dict):
+        return value
+    (tag, text), = value.items()
+    for name, _kind, parse in _VALUE_TYPES:
+        if tag == name:
+            return parse(text)
+    if tag == "timedelta":
+        return datetime.timedelta(seconds=text)
+    if tag == "decimal":
+        return decimal.Decimal(text)
+    raise ValueError(f"Неизвестный тип значения: {tag}")
+
+
+def _encode_style(style: CellStyle):
+    return [
+        part if cls is None else tostring(part.to_tree()).decode("utf-8")
+        for cls, part in zip(_STYLE_CLASSES, style)
+    ]
+
+
+def _decode_style(parts) -> CellStyle:
+    return CellStyle(*(
+        part if cls is None else cls.from_tree(fromstring(part))
+        for cls, part in zip(_STYLE_CLASSES, parts)
+    ))
+
+
+class RunCheckpoint:
+    """Append-only log of finished source files of one run."""
+
+    def __init__(self, output_file: str, config: Dict[str, object], target_path: str, interval: float = 30.0):
+        self.path = output_file + CHECKPOINT_SUFFIX
+        self.config_hash = config_digest(config)
+        self.target_path = target_path
+        self.interval = interval
+        self._header = None
+        self._buffer: List[Dict[str, object]] = []
+        self._job = None
+        self._last_flush = 0.0
+        # id(CellStyle) -> (style, JSON-форма): стили общие для многих ячеек.
+        self._styles = {}
+
+    def load(self, job_paths: List[str]) -> List[Dict[str, object]]:
+        """Return the records that can be replayed for ``job_paths``.
+
+        Records are kept up to the first one whose position, path or source
+        fingerprint no longer matches; everything after it must run again.
+        """
+        records = []
+        styles = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                if not (
+                    isinstance(header, dict)
+                    and header.get("version") == CHECKPOINT_VERSION
+                    and header.get("config") == self.config_hash
+                    and header.get("target") == _stat(self.target_path)
+                ):
+                    return []
+                for line in f:
+                    if len(records) >= len(job_paths):
+                        break
+                    record = json.loads(line)
+                    index = len(records)
+                    if record.get("path") != job_paths[index] or record.get("stat") != _stat(job_paths[index]):
+                        break
+                    record["writes"] = [self._decode_write(write, styles) for write in record["writes"]]
+                    records.append(record)
+        except (OSError, AttributeError, KeyError, ValueError, TypeError, SyntaxError):
+            # Оборванная запись в конце файла — берём то, что успело записаться.
+            pass
+        return records
+
+    def start(self, kept: List[Dict[str, object]]) -> None:
+        """Rewrite the file with the header and the records being reused."""
+        self._header = {
+            "version": CHECKPOINT_VERSION,
+            "config": self.config_hash,
+            "target": _stat(self.target_path),
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self._header) + "\n")
+            for record in kept:
+                f.write(self._encode_record(record))
+        os.replace(tmp_path, self.path)
+        self._buffer = []
+        self._job = None
+        self._last_flush = time.monotonic()
+
+    def begin_job(self, path: str) -> None:
+        self._job = {"path": path, "stat": _stat(path), "writes": [], "errors": 0}
+
+    def record(self, *write) -> None:
+        """Remember one ``_set_cell`` call of the current source file."""
+        if self._job is not None:
+            self._job["writes"].append(write)
+
+    def end_job(self, errors: int = 0) -> None:
+        """Mark the current source file as finished."""
+        if self._job is None:
+            return
+        self._job["errors"] = errors
+        self._buffer.append(self._job)
+        self._job = None
+        if time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Append the finished files to the checkpoint file."""
+        self._job = None
+        if not self._buffer or self._header is None:
+            return
+        try:
+            lines = [self._encode_record(record) for record in self._buffer]
+        except TypeError:
+            # Значение без JSON-формы: дальше этого файла запуск не возобновить.
+            self._header = None
+            self._buffer = []
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def _encode_record(self, record) -> str:
+        writes = []
+        for sheet, row, col, value, style in record["writes"]:
+            if style is not None:
+                cached = self._styles.get(id(style))
+                if cached is None or cached[0] is not style:
+                    cached = self._styles[id(style)] = (style, _encode_style(style))
+                style = cached[1]
+            writes.append([sheet, row, col, _encode_value(value), style])
+        return json.dumps({**record, "writes": writes}, ensure_ascii=False) + "\n"
+
+    @staticmethod
+    def _decode_write(write, styles):
+        sheet, row, col, value, style = write
+        if style is not None:
+            key = json.dumps(style)
+            if key not in styles:
+                styles[key] = _decode_style(style)
+            style = styles[key]
+        return sheet, row, col, _decode_value(value), style
+
+    def discard(self) -> None:
+        self._buffer = []
+        self._job = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""Per-cell hash manifest for incremental copy runs.
+
+The manifest remembers a short hash of every value (and, when formatting
+is copied, style) written into ``<target>_out`` together with the
+fingerprints of the target and of that output. On the next run the
+previous output becomes the base workbook and only cells whose hash
+changed are written again.
+"""
+import hashlib
+import json
+import os
+from typing import Dict, Tuple
+
+from core.run_cache import config_digest, file_sha256
+
+DELTA_VERSION = 1
+DELTA_SUFFIX = ".delta.json"
+
+CellKey = Tuple[str, int, int]
+
+
+def cell_digest(value, style=None) -> str:
+    """Return a 64-bit hash of a written value and its optional style."""
+    text = "" if value is None else str(value)
+    payload = f"{type(value).__name__}\x00{text}"
+    if style is not None:
+        payload += f"\x00{style!r}"
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _fingerprint(path: str) -> Dict[str, object]:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_sha256(path)}
+
+
+def _same_file(path: str, recorded) -> bool:
+    if not isinstance(recorded, dict) or not os.path.isfile(path):
+        return False
+    stat = os.stat(path)
+    if stat.st_size != recorded.get("size"):
+        return False
+    if stat.st_mtime_ns == recorded.get("mtime_ns"):
+        return True
+    return file_sha256(path) == recorded.get("sha256")
+
+
+class DeltaManifest:
+    """Cell hashes of the previous run and of the current one."""
+
+    def __init__(self, output_file: str, config: Dict[str, object], target_path: str):
+        self.output_file = output_file
+        self.path = output_file + DELTA_SUFFIX
+        self.config_hash = config_digest(config)
+        self.target_path = target_path
+        self.previous: Dict[CellKey, str] = {}
+        self.current: Dict[CellKey, str] = {}
+        self._target_fingerprint = None
+
+    def load_base(self) -> bool:
+        """Load the previous hashes if the previous output can serve as base.
+
+        The base is valid only when the settings, the target workbook and
+        the previous output are exactly what the manifest describes.
+        """
+        self.previous = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(manifest, dict) or manifest.get("version") != DELTA_VERSION:
+            return False
+        if manifest.get("config") != self.config_hash:
+            return False
+        if not _same_file(self.target_path, manifest.get("target")):
+            return False
+        if not _same_file(self.output_file, manifest.get("output")):
+            return False
+        self.previous = {
+            (sheet, int(row), int(col)): digest
+            for sheet, columns in manifest.get("cells", {}).items()
+            for col, rows in columns.items()
+            for row, digest in rows.items()
+        }
+        return True
+
+    def begin(self) -> None:
+        """Remove the stored manifest; it is written again after a clean run."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self._target_fingerprint = _fingerprint(self.target_path)
+
+    def record(self, sheet: str, row: int, col: int, digest: str) -> bool:
+        """Remember ``digest`` for the cell and return ``True`` if it changed."""
+        key = (sheet, row, col)
+        self.current[key] = digest
+        return self.previous.get(key) != digest
+
+    def stale_cells(self):
+        """Cells written by the previous run but not by this one."""
+        return sorted(key for key in self.previous if key not in self.current)
+
+    def save(self) -> bool:
+        """Write the current hashes; skipped if the target changed meanwhile."""
+        if self._target_fingerprint is None or not _same_file(self.target_path, self._target_fingerprint):
+            return False
+        cells: Dict[str, Dict[str, Dict[str, str]]] = {}
+        for (sheet, row, col), digest in self.current.items():
+            cells.setdefault(sheet, {}).setdefault(str(col), {})[str(row)] = digest
+        manifest = {
+            "version": DELTA_VERSION,
+            "config": self.config_hash,
+            "target": self._target_fingerprint,
+            "output": _fingerprint(self.output_file),
+            "cells": cells,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        return True
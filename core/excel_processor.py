@@ -1,19 +1,41 @@
 # -*- coding: utf-8 -*-
 import os
-import hashlib
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from openpyxl import load_workbook
+from openpyxl.cell.read_only import ReadOnlyCell
 import openpyxl.utils as utils
-from openpyxl.styles import PatternFill
-from copy import copy as copy_style
 
-from utils.logger import Logger
+from core.cancel import OperationCancelled
+from core.checkpoint import RunCheckpoint
+from core.delta_manifest import DeltaManifest, cell_digest
+from core.prefetch import Prefetcher
+from core.publisher import Publisher, PublishError
+from core.run_cache import RunCache
+from core.run_metrics import RunMetrics
+from core.staging import StagingCache
+from core.source_reader import (
+    CellStyleMapper, capture_cell_style, get_data_max_row, normalize_key, read_column_values,
+    read_source_columns,
+)
+from core.verification import CopyVerifier, VERIFY_OFF
+from core.xlsx_patch import PatchError, save_column_edits
+from core.xlsx_probe import probe_workbook
+from utils.journal import RUN_CANCELLED, RUN_FAILED, RUN_OK
+from utils.log_transport import LogCollector, run_logged
+from utils.logger import Logger, logger as app_logger
 
 class ExcelProcessor:
     def __init__(
         self, main_excel_path, folder_path, copy_column, selected_sheets,
         sheet_to_header_row, sheet_to_column, file_to_column=None, folder_to_column=None,
         file_to_sheet_map=None, skip_first_row=False, copy_by_row_number=False,
-        preserve_formatting=False, logger=None
+        preserve_formatting=False, logger=None, verify_mode=VERIFY_OFF, workers=0,
+        prefetch_depth=2, key_column=None, source_key_column="A", selected_sheets_only=False,
+        use_cache=False, incremental=False, staging: StagingCache | None = None,
+        publisher: Publisher | None = None, checkpoint=False
     ):
         self.main_excel_path = main_excel_path
         self.folder_path = folder_path
@@ -27,27 +49,82 @@ class ExcelProcessor:
         self.skip_first_row = skip_first_row
         self.copy_by_row_number = copy_by_row_number
         self.preserve_formatting = preserve_formatting
+        self.verify_mode = verify_mode
+        # workers > 1: файлы перевода разбираются в пуле процессов.
+        self.workers = workers or 0
+        # Сколько файлов перевода загружать заранее в фоновом потоке.
+        self.prefetch_depth = prefetch_depth
+        # Режим сопоставления по ключу: key_column — буква или заголовок
+        # столбца с ID в целевом листе, source_key_column — буква в переводах.
+        self.key_column = key_column
+        self.source_key_column = source_key_column
+        if key_column:
+            try:
+                utils.column_index_from_string(source_key_column or "")
+            except ValueError:
+                raise ValueError("Ключ в переводах должен быть буквой столбца, например A.") from None
+        # Не загружать целевой файл: выбранные листы читаются потоково, правки
+        # вписываются в их XML, остальные листы переносятся в _out побайтно
+        # (см. _save_output).
+        self.selected_sheets_only = selected_sheets_only
+        # Повторный запуск с теми же файлами и настройками возвращает
+        # готовый _out (манифест хранится рядом с ним, см. core.run_cache).
+        self.use_cache = use_cache
+        # Инкрементальный режим: база — предыдущий _out, записываются только
+        # ячейки, хэш которых изменился (см. core.delta_manifest).
+        self.incremental = incremental
+        # Локальные копии файлов с сетевых дисков (см. core.staging).
+        self.staging = staging
+        # _out сохраняется во временный файл и публикуется атомарно (core.publisher).
+        self.publisher = publisher
+        # Контрольные точки: после сбоя повторный запуск продолжает с того же
+        # файла перевода (см. core.checkpoint). Результат совпадает побайтно
+        # только при точечной записи листов, поэтому без неё режим недоступен.
+        self.checkpoint = checkpoint
+        if checkpoint and not self._use_partial_load():
+            raise ValueError("Контрольные точки работают только с selected_sheets_only для .xlsx/.xlsm.")
 
         self.workbook = None
         self.columns = {}
         self.header_row = {}
+        self.verifier = None
+        self.verification_mismatches = []
+        self.source_wait_seconds = 0.0
+        self._key_indexes = {}
+        self._edits = None
+        self._edit_styles = None
+        self._style_mapper = None
+        self._cancel_token = None
+        # Счётчики для окна прогресса (скорость, оставшееся время).
+        self.files_done = 0
+        self.files_total = 0
+        self.cells_copied = 0
+        self.source_errors = 0
+        self.cache_hit = False
+        self.cells_unchanged = 0
+        self._delta = None
+        self._base_path = None
+        self.metrics = None
+        self._log_seconds = 0.0
+        self._read_paths = {}
+        self._checkpoint = None
+        self._replaying = False
+        self.resumed_files = 0
 
         self.logger = logger or Logger()
 
     @staticmethod
     def get_sheet_names(excel_path):
-        wb = load_workbook(excel_path, read_only=True)
-        names = wb.sheetnames
-        wb.close()
-        return names
+        return probe_workbook(excel_path).sheet_names
 
     @staticmethod
     def get_sheet_columns(excel_path, sheet_name, header_row_index):
-        wb = load_workbook(excel_path, read_only=True)
-        sheet = wb[sheet_name]
-        cols = [cell.value for cell in sheet[header_row_index + 1]]
-        wb.close()
-        return cols
+        return probe_workbook(excel_path, {sheet_name: header_row_index}).headers[sheet_name]
+
+    @staticmethod
+    def get_sheet_headers(excel_path, sheet_to_header_row):
+        """Return ``{sheet: header values}`` for several sheets in one pass."""
+        return probe_workbook(excel_path, sheet_to_header_row).headers
 
     def validate_paths_and_column(self):
         if self.folder_path and not os.path.isdir(self.folder_path):
@@ -60,135 +137,636 @@ class ExcelProcessor:
             self.logger.log_error("Не указан столбец для копирования", "", "", "")
             raise ValueError("Укажите столбец для копирования.")
 
-    def copy_data(self, progress_callback=None):
+    def copy_data(self, progress_callback=None, cancel_token=None, status_callback=None, with_metrics=False):
+        """Copy the mapped columns into ``<target>_out`` and return its path.
+
+        ``progress_callback(step, total)`` is called once per sheet and
+        mapping. ``status_callback(status)`` additionally gets a dict with
+        ``step``, ``steps``, ``files_done``, ``files_total`` and ``cells``
+        after every source file. If ``cancel_token`` is cancelled the run
+        stops between files or rows with :class:`OperationCancelled`; the
+        output file is then not written at all, only the copy log is saved.
+        With ``checkpoint`` (which requires ``selected_sheets_only``) the
+        finished source files are kept in ``<target>_out.xlsx.checkpoint``
+        after a failure or cancellation and the next run continues from
+        there, producing the same bytes as an uninterrupted run.
+
+        Phase timings, throughput, bytes read per source and peak memory are
+        collected in :attr:`metrics` (:class:`~core.run_metrics.RunMetrics`)
+        and written to the log; with ``with_metrics`` the call returns
+        ``(output_file, metrics)`` instead of just the path.
+
+        A logger with a journal (:meth:`utils.logger.Logger.begin_run`)
+        records the run and its status there.
+        """
+        journal = hasattr(self.logger, "begin_run")
+        if journal:
+            self.logger.begin_run(self.main_excel_path, folder=self.folder_path, sheets=list(self.selected_sheets))
+        try:
+            result = self._copy_data(progress_callback, cancel_token, status_callback, with_metrics)
+        except OperationCancelled:
+            if journal:
+                self.logger.end_run(RUN_CANCELLED)
+            raise
+        except BaseException:
+            # Целевая книга в режиме read_only держит файл открытым.
+            if self.workbook is not None:
+                self.workbook.close()
+            if journal:
+                self.logger.end_run(RUN_FAILED)
+            raise
+        if journal:
+            self.logger.end_run(RUN_OK, result[0] if with_metrics else result)
+        return result
+
+    def _copy_data(self, progress_callback, cancel_token, status_callback, with_metrics):
         self.validate_paths_and_column()
         if not self.selected_sheets:
             self.logger.log_error("Не выбраны листы", "", "", "")
             raise ValueError("Выберите хотя бы один лист.")
 
-        self.workbook = load_workbook(self.main_excel_path)
-        self.logger.log_info(f"Загружен основной Excel: {self.main_excel_path}")
+        self.verifier = CopyVerifier(self.verify_mode)
+        self.verification_mismatches = []
+        self.source_wait_seconds = 0.0
+        self._key_indexes = {}
+        self._cancel_token = cancel_token
+        self.files_done = 0
+        self.files_total = 0
+        self.cells_copied = 0
+        self.source_errors = 0
+        self.cache_hit = False
+        self.cells_unchanged = 0
+        metrics = self.metrics = RunMetrics()
+        self._log_seconds = 0.0
+
+        is_file_mapping = bool(self.file_to_column)
+        items = self.file_to_column.items() if is_file_mapping else self.folder_to_column.items()
+        items = [(name, column_name) for name, column_name in items if column_name]
+        item_files = [self._item_files(name, is_file_mapping) for name, _column_name in items]
+        base, ext = os.path.splitext(self.main_excel_path)
+        output_file = f"{base}_out{ext}"
+
+        sources = [file_path for _, files in item_files for file_path in files]
+        cache = None
+        if self.use_cache:
+            cache = RunCache(output_file, self._cache_config(), [self.main_excel_path, *sources])
+            if cache.lookup():
+                self.cache_hit = True
+                self.logger.log_info(f"Файлы и настройки не изменились, используется готовый результат: {output_file}")
+                if progress_callback:
+                    progress_callback(1, 1)
+                self._log_metrics()
+                self.logger.save()
+                return (output_file, metrics) if with_metrics else output_file
+            cache.begin()
+
+        self._read_paths = {}
+        if self.staging is not None:
+            with metrics.phase("staging"):
+                self._read_paths = self.staging.stage([self.main_excel_path, *sources])
+            staged = sum(1 for path, local in self._read_paths.items() if local != path)
+            if staged:
+                self.logger.log_info(f"Сетевые файлы скопированы в локальный кэш: {staged}")
+
+        self._delta = None
+        self._base_path = self._read_path(self.main_excel_path)
+        if self.incremental and self._use_partial_load():
+            self._delta = DeltaManifest(output_file, self._cache_config(), self.main_excel_path)
+            if self._delta.load_base():
+                self._base_path = output_file
+                self.logger.log_info(
+                    f"Инкрементальный режим: база — {output_file}, ячеек в манифесте {len(self._delta.previous)}"
+                )
+            else:
+                self.logger.log_info("Инкрементальный режим: манифест не подходит, выполняется полное копирование")
+            self._delta.begin()
+
+        load_started = time.perf_counter()
+        if self._use_partial_load():
+            # Целевая книга не загружается: заголовки, ключи и исходные значения
+            # читаются потоково, а правки ({лист: {столбец: {строка: значение}}})
+            # вписываются в XML листа при сохранении.
+            self._edits = {}
+            self._edit_styles = {}
+            self.workbook = load_workbook(self._read_path(self.main_excel_path), read_only=True)
+            for sheet_name in self.selected_sheets:
+                # Размеры из <dimension> бывают неверными — читаем до конца листа.
+                self.workbook[sheet_name].reset_dimensions()
+            self.logger.log_info(
+                f"Загружен основной Excel: {self.main_excel_path} (листов: {len(self.selected_sheets)})"
+            )
+        else:
+            self._edits = None
+            self._edit_styles = None
+            self.workbook = load_workbook(self._read_path(self.main_excel_path))
+            self._style_mapper = CellStyleMapper()
+            self.logger.log_info(f"Загружен основной Excel: {self.main_excel_path}")
 
         for sheet_name in self.selected_sheets:
             header_row_index = self.sheet_to_header_row[sheet_name]
             self.header_row[sheet_name] = header_row_index
-            self.columns[sheet_name] = [
-                cell.value for cell in self.workbook[sheet_name][header_row_index + 1]
-            ]
+            self.columns[sheet_name] = list(next(
+                self.workbook[sheet_name].iter_rows(
+                    min_row=header_row_index + 1, max_row=header_row_index + 1, values_only=True
+                ),
+                (),
+            ))
             self.logger.log_info(f"Обрабатывается лист: {sheet_name}")
+            if self.key_column:
+                index = self._target_key_index(sheet_name)
+                self.logger.log_info(f"Индекс ключей '{self.key_column}': {len(index)} строк")
+        metrics.add("target_load", time.perf_counter() - load_started)
 
-        is_file_mapping = bool(self.file_to_column)
-        items = self.file_to_column.items() if is_file_mapping else self.folder_to_column.items()
-        total_steps = len(self.selected_sheets) * len([c for _, c in items if c]) if items else 1
+        total_steps = len(self.selected_sheets) * len(items) if items else 1
         progress = 0
 
-        for sheet_name in self.selected_sheets:
-            copy_col_index = utils.column_index_from_string(self.sheet_to_column[sheet_name])
-            header_row = self.header_row[sheet_name]
-
-            for name, column_name in items:
-                if not column_name:
-                    continue
+        plan = []
+        for (name, column_name), (source_path, files) in zip(items, item_files):
+            sheet_columns = {}
+            for sheet_name in self.selected_sheets:
                 if column_name not in self.columns[sheet_name]:
                     self.logger.log_error(f"Столбец '{column_name}' не найден на листе '{sheet_name}'", "", "", name)
                     raise Exception(
                         f"Столбец '{column_name}' не найден на листе '{sheet_name}' основного файла Excel."
                     )
+                sheet_columns[sheet_name] = (
+                    utils.column_index_from_string(self.sheet_to_column[sheet_name]),
+                    self.header_row[sheet_name],
+                    self.columns[sheet_name].index(column_name) + 1,
+                )
 
-                col_index = self.columns[sheet_name].index(column_name) + 1
-                if is_file_mapping:
-                    file_path = name
-                    if not os.path.isabs(file_path) and self.folder_path:
-                        file_path = os.path.join(self.folder_path, name)
-                    self.logger.log_info(f"Копирование из файла: {file_path}, лист: {sheet_name}, столбец: {column_name}")
-                    self._copy_from_file(
-                        file_path, sheet_name, copy_col_index, header_row, col_index
-                    )
-                else:
-                    lang_folder_path = os.path.join(self.folder_path, name)
-                    self.logger.log_info(f"Копирование из папки: {lang_folder_path}, лист: {sheet_name}, столбец: {column_name}")
-                    self._copy_from_folder(
-                        lang_folder_path, sheet_name, copy_col_index, header_row, col_index
+            if is_file_mapping:
+                message = f"Копирование из файла: {source_path}, столбец: {column_name}"
+            else:
+                message = f"Копирование из папки: {source_path}, столбец: {column_name}"
+            plan.append((message, sheet_columns, files))
+
+        # Источники обходятся во внешнем цикле: каждая книга перевода
+        # открывается один раз и отдаёт столбцы сразу для всех листов.
+        jobs = [
+            (file_path, self._sheet_requests(file_path, sheet_columns))
+            for _, sheet_columns, files in plan
+            for file_path in files
+        ]
+        self.files_total = len(jobs)
+        resumed = []
+        self._checkpoint = None
+        if self.checkpoint:
+            self._checkpoint = RunCheckpoint(output_file, self._cache_config(), self.main_excel_path)
+            resumed = self._checkpoint.load([file_path for file_path, _requests in jobs])
+            self._checkpoint.start(resumed)
+            if resumed:
+                self.logger.log_info(
+                    f"Продолжение с контрольной точки: пропущено файлов {len(resumed)} из {len(jobs)}"
+                )
+        self.resumed_files = len(resumed)
+        extracted = self._extract_sources(jobs[len(resumed):])
+        job_index = 0
+        completed = False
+        try:
+            for message, sheet_columns, files in plan:
+                self.logger.log_info(message)
+                for file_path in files:
+                    self._check_cancelled()
+                    if job_index < len(resumed):
+                        self._replay_job(resumed[job_index])
+                        job_index += 1
+                        self.files_done += 1
+                        self._report_status(status_callback, progress, total_steps)
+                        continue
+                    job_index += 1
+                    started = time.perf_counter()
+                    result, error = next(extracted)
+                    applied = time.perf_counter()
+                    self.source_wait_seconds += applied - started
+                    if result is not None:
+                        metrics.record_source(file_path, result["bytes"], self._rows_read(result), result["timings"])
+                    log_seconds = self._log_seconds
+                    errors = self.source_errors
+                    if self._checkpoint is not None:
+                        self._checkpoint.begin_job(file_path)
+                    self._apply_source(file_path, sheet_columns, result, error, strict=is_file_mapping)
+                    if self._checkpoint is not None:
+                        self._checkpoint.end_job(self.source_errors - errors)
+                    metrics.add(
+                        "cell_writes", time.perf_counter() - applied - (self._log_seconds - log_seconds)
                     )
-                progress += 1
-                if progress_callback:
-                    progress_callback(progress, total_steps)
+                    self.files_done += 1
+                    self._report_status(status_callback, progress, total_steps)
 
-        base, ext = os.path.splitext(self.main_excel_path)
-        output_file = f"{base}_out{ext}"
-        self.workbook.save(output_file)
+                for _ in sheet_columns:
+                    progress += 1
+                    if progress_callback:
+                        progress_callback(progress, total_steps)
+                self._report_status(status_callback, progress, total_steps)
+            self._check_cancelled()
+            completed = True
+        except OperationCancelled:
+            # Частичный результат не сохраняется: _out либо полный, либо его нет.
+            self.logger.log_info(
+                f"Копирование отменено: файлов {self.files_done} из {self.files_total}, "
+                f"ячеек {self.cells_copied}. Результат не сохранён"
+            )
+            self.workbook.close()
+            self.logger.save()
+            raise
+        finally:
+            extracted.close()
+            if not completed and self._checkpoint is not None:
+                self._checkpoint.flush()
+        metrics.add("source_wait", self.source_wait_seconds)
+
+        if self._delta is not None:
+            restored = self._restore_stale_cells()
+            self.logger.log_info(
+                f"Инкрементально: изменено ячеек {self.cells_copied}, без изменений {self.cells_unchanged}, "
+                f"восстановлено {restored}"
+            )
+        save_path = self.publisher.local_path(output_file) if self.publisher is not None else output_file
+        try:
+            with metrics.phase("save"):
+                self._save_output(save_path)
+            self.workbook.close()
+            with metrics.phase("verify"):
+                self._verify_output(save_path)
+            if self.publisher is not None:
+                with metrics.phase("publish"):
+                    self.publisher.publish(save_path, output_file)
+                    self.publisher.wait([output_file])
+        except PublishError as e:
+            self.logger.log_error("Не удалось опубликовать результат", "", "", str(e))
+            if self._checkpoint is not None:
+                self._checkpoint.flush()
+            self.logger.save()
+            raise
+        except BaseException:
+            if save_path != output_file and os.path.exists(save_path):
+                os.remove(save_path)
+            if self._checkpoint is not None:
+                self._checkpoint.flush()
+            raise
+        if self._checkpoint is not None:
+            self._checkpoint.discard()
         self.logger.log_info(f"Файл успешно сохранён: {output_file}")
+        # Результат с ошибками или расхождениями не кэшируется: его надо пересобрать.
+        if not self.source_errors and not self.verification_mismatches:
+            if cache is not None and not cache.store():
+                self.logger.log_info("Исходные файлы менялись во время копирования, результат не кэширован")
+            if self._delta is not None:
+                self._delta.save()
+        self._log_metrics()
         self.logger.save()
-        self.workbook.close()
-        return output_file
-
-    def _find_matching_sheet(self, lang_wb, main_sheet_name, file_path=None):
-        if file_path:
-            lookup_keys = [file_path, os.path.abspath(file_path), os.path.basename(file_path)]
-            mapping = None
-            for key in lookup_keys:
-                mapping = self.file_to_sheet_map.get(key, {}).get(main_sheet_name)
-                if mapping:
-                    break
-            if mapping and mapping in lang_wb.sheetnames:
-                return mapping
-        if main_sheet_name in lang_wb.sheetnames:
-            return main_sheet_name
-        elif len(lang_wb.sheetnames) == 1:
-            return lang_wb.sheetnames[0]
-        else:
-            sheets = ', '.join(lang_wb.sheetnames)
-            self.logger.log_error(f"Не найден лист '{main_sheet_name}'", "", "", sheets)
-            raise Exception(
-                f"Не найден лист '{main_sheet_name}' в файле перевода. "
-                f"В файле листы: {sheets}. "
-                f"Переименуйте листы для автоматического сопоставления, либо удалите лишние листы."
-            )
+        return (output_file, metrics) if with_metrics else output_file
+
+    def _log_metrics(self):
+        """Finish :attr:`metrics` and write its report to the log."""
+        metrics = self.metrics
+        metrics.add("logging", self._log_seconds)
+        metrics.cells_written = self.cells_copied
+        metrics.cells_unchanged = self.cells_unchanged
+        metrics.finish()
+        for line in metrics.summary_lines() + metrics.source_lines():
+            self.logger.log_info(f"Метрики: {line}")
+
+    @staticmethod
+    def _rows_read(result):
+        return sum(len(entry["values"]) for entry in result["sheets"].values() if "values" in entry)
+
+    def _replay_job(self, record):
+        """Repeat the cell writes of a source file finished before a restart."""
+        self._replaying = True
+        try:
+            for write in record["writes"]:
+                self._set_cell(*write)
+        finally:
+            self._replaying = False
+        self.source_errors += record["errors"]
+
+    def _restore_stale_cells(self):
+        """Put back target values in cells the previous run wrote but this one did not."""
+        stale = self._delta.stale_cells()
+        by_sheet = {}
+        for sheet_name, row, col in stale:
+            by_sheet.setdefault(sheet_name, set()).add((row, col))
+        for sheet_name, cells in by_sheet.items():
+            for row, col, cell in self._target_cells(self.workbook[sheet_name], cells):
+                self._edits.setdefault(sheet_name, {}).setdefault(col, {})[row] = cell.value
+                if self.preserve_formatting:
+                    style = capture_cell_style(cell)
+                    self._edit_styles.setdefault(sheet_name, {}).setdefault(col, {})[row] = style
+        return len(stale)
+
+    @staticmethod
+    def _target_cells(ws, cells):
+        """Yield ``(row, col, cell)`` for ``cells`` of a read-only sheet in one pass.
+
+        Cells missing from the sheet come back as empty cells with the
+        default style of the workbook.
+        """
+        rows = [row for row, _col in cells]
+        cols = [col for _row, col in cells]
+        min_col = min(cols)
+        missing = set(cells)
+        for row, values in enumerate(
+            ws.iter_rows(min_row=min(rows), max_row=max(rows), min_col=min_col, max_col=max(cols)),
+            start=min(rows),
+        ):
+            for offset, cell in enumerate(values):
+                col = min_col + offset
+                if (row, col) in missing and isinstance(cell, ReadOnlyCell):
+                    missing.discard((row, col))
+                    yield row, col, cell
+        # Строки за концом листа и пустые ячейки.
+        for row, col in sorted(missing):
+            yield row, col, ReadOnlyCell(ws, row, col, None)
+
+    def _read_path(self, path):
+        """Path to parse for ``path``: its staged local copy if there is one."""
+        return self._read_paths.get(path, path)
 
-    def _copy_from_file(self, file_path, main_sheet_name, copy_col_index, header_row, col_index):
-        if os.path.isfile(file_path) and file_path.endswith(('.xlsx', '.xls')):
-            lang_wb = load_workbook(file_path)
-            target_sheet_name = self._find_matching_sheet(lang_wb, main_sheet_name, file_path)
-            lang_sheet = lang_wb[target_sheet_name]
-            self._copy_from_sheet(lang_sheet, main_sheet_name, copy_col_index, header_row, col_index)
-            lang_wb.close()
+    def _item_files(self, name, is_file_mapping):
+        """Return ``(path, source files)`` for one file or folder mapping entry."""
+        if is_file_mapping:
+            file_path = name
+            if not os.path.isabs(file_path) and self.folder_path:
+                file_path = os.path.join(self.folder_path, name)
+            files = [file_path] if os.path.isfile(file_path) and file_path.endswith(('.xlsx', '.xls')) else []
+            return file_path, files
+        lang_folder_path = os.path.join(self.folder_path, name)
+        return lang_folder_path, self._list_source_files(lang_folder_path)
 
-    def _copy_from_folder(self, lang_folder_path, main_sheet_name, copy_col_index, header_row, col_index):
+    def _cache_config(self):
+        """Everything besides the input files that affects the output."""
+        return {
+            "folder_path": self.folder_path,
+            "copy_column": self.copy_column,
+            "selected_sheets": list(self.selected_sheets),
+            "sheet_to_header_row": self.sheet_to_header_row,
+            "sheet_to_column": self.sheet_to_column,
+            "file_to_column": self.file_to_column,
+            "folder_to_column": self.folder_to_column,
+            "file_to_sheet_map": self.file_to_sheet_map,
+            "skip_first_row": self.skip_first_row,
+            "copy_by_row_number": self.copy_by_row_number,
+            "preserve_formatting": self.preserve_formatting,
+            "verify_mode": self.verify_mode,
+            "key_column": self.key_column,
+            "source_key_column": self.source_key_column,
+        }
+
+    def _check_cancelled(self):
+        if self._cancel_token is not None:
+            self._cancel_token.raise_if_cancelled()
+
+    def _report_status(self, status_callback, step, steps):
+        if status_callback:
+            status_callback({
+                "step": step,
+                "steps": steps,
+                "files_done": self.files_done,
+                "files_total": self.files_total,
+                "cells": self.cells_copied,
+            })
+
+    def _use_partial_load(self):
+        return self.selected_sheets_only and self.main_excel_path.lower().endswith((".xlsx", ".xlsm"))
+
+    def _save_output(self, output_file):
+        """Save the target; with a partial load only edited sheets are rewritten.
+
+        The edited sheet XML (and ``styles.xml`` when formatting is copied)
+        is patched inside the zip package; every other member is streamed
+        unchanged. If the package cannot be patched the edits are replayed
+        on a full openpyxl load instead.
+        """
+        if self._edits is None:
+            self.workbook.save(output_file)
+            return
+        try:
+            save_column_edits(self._base_path, output_file, self._edits, self._edit_styles)
+        except PatchError as e:
+            self.logger.log_warning(f"Точечная запись невозможна ({e}), файл сохраняется полностью")
+            wb = load_workbook(self._base_path)
+            style_mapper = CellStyleMapper()
+            try:
+                for sheet_name, columns in self._edits.items():
+                    ws = wb[sheet_name]
+                    for col, rows in columns.items():
+                        styles = self._edit_styles.get(sheet_name, {}).get(col, {})
+                        for row, value in rows.items():
+                            cell = ws.cell(row=row, column=col)
+                            cell.value = value
+                            if row in styles:
+                                style_mapper.apply(cell, styles[row])
+                wb.save(output_file)
+            finally:
+                wb.close()
+
+    def _verify_output(self, output_file):
+        """Compare the saved target columns with the copied values once."""
+        if not self.verifier.enabled:
+            return
+        mismatches = self.verifier.verify(output_file)
+        self.verification_mismatches = mismatches
+        for sheet_name, row, col in mismatches:
+            self.logger.log_error("Значение не совпало после сохранения", "", "", f"{sheet_name}: R{row} C{col}")
+        if mismatches:
+            try:
+                self.verifier.mark(output_file, mismatches)
+            except PatchError as e:
+                self.logger.log_warning(f"Расхождения не выделены цветом ({e})")
+        self.logger.log_info(
+            f"Проверка ({self.verify_mode}): ячеек {sum(len(c) for c in self.verifier.expected.values())}, "
+            f"расхождений {len(mismatches)}"
+        )
+
+    @staticmethod
+    def _list_source_files(lang_folder_path):
+        files = []
         for filename in os.listdir(lang_folder_path):
             if filename.startswith('~$'):
                 continue
             file_path = os.path.join(lang_folder_path, filename)
             if os.path.isfile(file_path) and filename.endswith(('.xlsx', '.xls')):
+                files.append(file_path)
+        return files
+
+    def _mapped_sheet(self, file_path, main_sheet_name):
+        lookup_keys = [file_path, os.path.abspath(file_path), os.path.basename(file_path)]
+        for key in lookup_keys:
+            mapping = self.file_to_sheet_map.get(key, {}).get(main_sheet_name)
+            if mapping:
+                return mapping
+        return None
+
+    def _sheet_requests(self, file_path, sheet_columns):
+        key_index = utils.column_index_from_string(self.source_key_column) if self.key_column else None
+        return {
+            sheet_name: (copy_col_index, self._mapped_sheet(file_path, sheet_name), key_index)
+            for sheet_name, (copy_col_index, _header_row, _col_index) in sheet_columns.items()
+        }
+
+    def _target_key_index(self, sheet_name):
+        """Return ``{key: row}`` for the target sheet, built once per run.
+
+        The first occurrence of a key wins; repeated keys go to the copy log.
+        """
+        index = self._key_indexes.get(sheet_name)
+        if index is not None:
+            return index
+
+        header = self.columns[sheet_name]
+        if self.key_column in header:
+            key_col = header.index(self.key_column) + 1
+        else:
+            try:
+                key_col = utils.column_index_from_string(self.key_column)
+            except ValueError:
+                self.logger.log_error(f"Ключевой столбец '{self.key_column}' не найден", "", "", sheet_name)
+                raise ValueError(
+                    f"Ключевой столбец '{self.key_column}' не найден на листе '{sheet_name}' основного файла Excel."
+                )
+        index = {}
+        first_row = self.header_row[sheet_name] + 2
+        ws = self.workbook[sheet_name]
+        for row, (value,) in enumerate(
+            ws.iter_rows(min_row=first_row, min_col=key_col, max_col=key_col, values_only=True),
+            start=first_row,
+        ):
+            key = normalize_key(value)
+            if key is None:
+                continue
+            if key in index:
+                self.logger.log_warning(
+                    f"Дубликат ключа '{key}' на листе '{sheet_name}': строки {index[key]} и {row}, используется {index[key]}"
+                )
+                continue
+            index[key] = row
+        self._key_indexes[sheet_name] = index
+        return index
+
+    def _extract_sources(self, jobs):
+        """Yield ``(result, error)`` for every ``(file_path, requests)`` job, in order."""
+        if self.workers > 1 and len(jobs) > 1:
+            yield from self._extract_sources_parallel(jobs)
+            return
+        prefetcher = Prefetcher(
+            jobs,
+            lambda job: read_source_columns(self._read_path(job[0]), job[1], self.preserve_formatting),
+            self.prefetch_depth if len(jobs) > 1 else 0,
+        )
+        try:
+            for _job, result, error in prefetcher:
+                yield result, error
+        finally:
+            prefetcher.close()
+
+    def _extract_sources_parallel(self, jobs):
+        # Разбор XML идёт в рабочих процессах, а результаты забираются строго
+        # в порядке заданий, поэтому запись и лог совпадают с обычным режимом.
+        # Сообщения app_logger из процессов приходят через LogCollector в том же порядке.
+        collector = LogCollector(logger=self.logger, line_callback=app_logger.info)
+        pool = ProcessPoolExecutor(max_workers=self.workers, **collector.pool_kwargs(app_logger.name))
+        pending = deque()
+        jobs_iter = enumerate(jobs)
+
+        def pool_alive():
+            return not any(
+                f.done() and not f.cancelled() and isinstance(f.exception(), BrokenProcessPool) for _i, f in pending
+            )
+
+        def submit_next():
+            index, job = next(jobs_iter, (None, None))
+            if job is not None:
+                file_path, requests = job
+                pending.append((index, pool.submit(
+                    run_logged, collector.start(index), read_source_columns, self._read_path(file_path), requests,
+                    self.preserve_formatting,
+                )))
+
+        try:
+            for _ in range(self.workers * 2):
+                submit_next()
+            while pending:
+                index, future = pending.popleft()
+                submit_next()
+                while not future.done():
+                    collector.poll(0.05)
                 try:
-                    lang_wb = load_workbook(file_path)
-                    target_sheet_name = self._find_matching_sheet(lang_wb, main_sheet_name, file_path)
-                    lang_sheet = lang_wb[target_sheet_name]
-                    self._copy_from_sheet(lang_sheet, main_sheet_name, copy_col_index, header_row, col_index)
-                    lang_wb.close()
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    collector.end(index)
+                    yield None, e
+                    continue
                 except Exception as e:
-                    self.logger.log_error(f"Ошибка при обработке файла '{filename}': {e}", "", "", file_path)
+                    error, result = e, None
+                else:
+                    error = None
+                collector.wait(index, alive=pool_alive)
+                yield result, error
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            collector.close()
 
-    @staticmethod
-    def _get_data_max_row(ws) -> int:
-        """Return the last row that contains a non-None value.
+    def _apply_source(self, file_path, sheet_columns, result, error, strict=False):
+        """Write the columns extracted from one source file into the target.
 
-        ``ws.max_row`` can be inflated when formatting is applied to
-        cells far beyond the actual data range, causing the copy loop
-        to iterate over millions of empty rows and appear frozen.
+        With ``strict`` (explicit file mapping) errors are raised, otherwise
+        they are logged per file and the run continues.
         """
-        max_row = 0
-        for (r, _c), cell in ws._cells.items():
-            if cell.value is not None and r > max_row:
-                max_row = r
-        return max_row
+        filename = os.path.basename(file_path)
+        if error is not None:
+            if strict:
+                raise error
+            self.source_errors += 1
+            self.logger.log_error(f"Ошибка при обработке файла '{filename}': {error}", "", "", file_path)
+            return
+
+        styles = result["styles"]
+        for main_sheet_name, (_copy_col_index, header_row, col_index) in sheet_columns.items():
+            entry = result["sheets"][main_sheet_name]
+            try:
+                if "error" in entry:
+                    missing = entry["error"]
+                    self.logger.log_error(
+                        f"Не найден лист '{main_sheet_name}'", "", "", ', '.join(missing.sheetnames)
+                    )
+                    raise missing
+                self.logger.log_info(f"Лист: {main_sheet_name} <- {filename} [{entry['sheet']}]")
+                values = entry["values"]
+                style_ids = entry["style_ids"]
+                if style_ids is None:
+                    cells = ((row, value, None) for row, value in enumerate(values, start=1))
+                else:
+                    cells = (
+                        (row, value, styles[style_id])
+                        for row, (value, style_id) in enumerate(zip(values, style_ids), start=1)
+                    )
+                if self.key_column:
+                    self._apply_keyed_column(main_sheet_name, cells, entry["keys"], col_index, filename)
+                else:
+                    self._apply_column(main_sheet_name, cells, header_row, col_index)
+            except OperationCancelled:
+                raise
+            except Exception as e:
+                if strict:
+                    raise
+                self.source_errors += 1
+                self.logger.log_error(f"Ошибка при обработке файла '{filename}': {e}", "", "", file_path)
 
-    def _copy_from_sheet(self, lang_sheet, sheet_name, copy_col_index, header_row, col_index):
+    _get_data_max_row = staticmethod(get_data_max_row)
+    _read_column_values = staticmethod(read_column_values)
+
+    def _apply_column(self, sheet_name, cells, header_row, col_index):
+        """Write ``(row, value, source_style)`` items into the target column."""
         data_start_row = 2 if self.skip_first_row else 1
         sequential_target_row = header_row + 2
-        actual_max_row = self._get_data_max_row(lang_sheet)
 
-        for row in range(data_start_row, actual_max_row + 1):
-            source_value = lang_sheet.cell(row=row, column=copy_col_index).value
+        for row, source_value, source_style in cells:
+            if not row & 1023:
+                self._check_cancelled()
+            if row < data_start_row:
+                continue
             if source_value is None or (isinstance(source_value, str) and source_value.strip() == ""):
                 continue
             if self.copy_by_row_number:
@@ -196,31 +774,69 @@ class ExcelProcessor:
             else:
                 target_row = sequential_target_row
                 sequential_target_row += 1
-            source_cell = lang_sheet.cell(row=row, column=copy_col_index)
-            self._set_cell(sheet_name, target_row, col_index, source_value, source_cell)
-
-    def _set_cell(self, sheet_name, target_row, col_index, value, source_cell=None):
-        target_cell = self.workbook[sheet_name].cell(row=target_row, column=col_index)
-        def compute_hash(text):
-            if text is None:
-                text = ""
-            return hashlib.sha256(str(text).encode('utf-8')).hexdigest()
-        source_hash = compute_hash(value)
-        max_attempts = 5
-        for attempt in range(max_attempts):
-            target_cell.value = value
-            if self.preserve_formatting and source_cell is not None:
-                target_cell.font = copy_style(source_cell.font)
-                target_cell.border = copy_style(source_cell.border)
-                target_cell.fill = copy_style(source_cell.fill)
-                target_cell.number_format = source_cell.number_format
-                target_cell.protection = copy_style(source_cell.protection)
-                target_cell.alignment = copy_style(source_cell.alignment)
-            if value == target_cell.value and compute_hash(target_cell.value) == source_hash:
-                # Успешно скопировано — логируем
-                self.logger.log_copy(sheet_name, target_row, col_index, value)
-                break
+            self._set_cell(sheet_name, target_row, col_index, source_value, source_style)
+
+    def _apply_keyed_column(self, sheet_name, cells, keys, col_index, filename):
+        """Write source values to the target rows whose key matches.
+
+        Every source row is looked up in the target key index in O(1);
+        unmatched and repeated source keys are written to the copy log.
+        """
+        index = self._target_key_index(sheet_name)
+        data_start_row = 2 if self.skip_first_row else 1
+        seen = {}
+
+        for (row, source_value, source_style), raw_key in zip(cells, keys):
+            if not row & 1023:
+                self._check_cancelled()
+            if row < data_start_row:
+                continue
+            if source_value is None or (isinstance(source_value, str) and source_value.strip() == ""):
+                continue
+            key = normalize_key(raw_key)
+            if key is None:
+                self.logger.log_warning(f"Пустой ключ: {filename} R{row}, лист '{sheet_name}'")
+                continue
+            target_row = index.get(key)
+            if target_row is None:
+                self.logger.log_warning(f"Ключ '{key}' не найден на листе '{sheet_name}': {filename} R{row}")
+                continue
+            if key in seen:
+                self.logger.log_warning(
+                    f"Повтор ключа '{key}' в {filename}: строки {seen[key]} и {row}, записана строка {row}"
+                )
+            seen[key] = row
+            self._set_cell(sheet_name, target_row, col_index, source_value, source_style)
+
+    def _set_cell(self, sheet_name, target_row, col_index, value, source_style=None):
+        if self._checkpoint is not None and not self._replaying:
+            self._checkpoint.record(sheet_name, target_row, col_index, value, source_style)
+        copy_style = self.preserve_formatting and source_style is not None
+        if self._delta is not None:
+            digest = cell_digest(value, source_style if copy_style else None)
+            changed = self._delta.record(sheet_name, target_row, col_index, digest)
+            if not changed and target_row not in self._edits.get(sheet_name, {}).get(col_index, ()):
+                # Значение уже лежит в базе (предыдущем _out): не пишем и не логируем.
+                self.cells_unchanged += 1
+                self.verifier.record(sheet_name, target_row, col_index, value)
+                return
+        if self._edits is not None:
+            # Частичная загрузка: правки копятся и записываются в _save_output.
+            self._edits.setdefault(sheet_name, {}).setdefault(col_index, {})[target_row] = value
+            if copy_style:
+                self._edit_styles.setdefault(sheet_name, {}).setdefault(col_index, {})[target_row] = source_style
         else:
-            fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
-            target_cell.fill = fill
-            self.logger.log_error(f"Не удалось записать значение после {max_attempts} попыток", "", "", f"{sheet_name}: R{target_row} C{col_index} [{value}]")
+            target_cell = self.workbook[sheet_name].cell(row=target_row, column=col_index)
+            target_cell.value = value
+            if copy_style:
+                # source_style — CellStyle из source_reader: объекты уже скопированы.
+                self._style_mapper.apply(target_cell, source_style)
+        self.cells_copied += 1
+        # Сверка значения выполняется один раз после сохранения (_verify_output).
+        self.verifier.record(sheet_name, target_row, col_index, value)
+        if self._replaying:
+            # Эти строки уже попали в журнал при прерванном запуске.
+            return
+        started = time.perf_counter()
+        self.logger.log_copy(sheet_name, target_row, col_index, value)
+        self._log_seconds += time.perf_counter() - started
@@ -1,12 +1,27 @@
 # -*- coding: utf-8 -*-
+import multiprocessing
 import os
-import hashlib
-from typing import List, Dict
-from copy import copy as copy_style
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterator, List
 from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
 from openpyxl.utils import column_index_from_string
 
+from core.cancel import CancelToken, OperationCancelled
+from core.prefetch import Prefetcher
+from core.publisher import DeferredPublisher, Publisher
+from core.source_cache import SourceColumnCache, read_columns
+from core.source_reader import CellStyleMapper
+from core.staging import StagingCache
+from core.verification import CopyVerifier, VERIFY_OFF
+from core.xlsx_package import sheet_parts
+from core.xlsx_patch import PatchError, save_column_edits
+from utils.log_transport import LogCollector, init_worker, run_logged, worker_log
+from utils.logger import logger
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
 
 def _get_data_max_row(ws) -> int:
     """Return the last row that contains a non-None value.
@@ -25,9 +40,17 @@ def _get_data_max_row(ws) -> int:
 
 
 def merge_excel_columns(main_file: str, mappings: List[Dict[str, object]], output_file: str | None = None,
-                        progress_callback=None) -> str:
+                        progress_callback=None, verify_mode: str = VERIFY_OFF,
+                        prefetch_depth: int = 2, staging: StagingCache | None = None,
+                        publisher: Publisher | None = None,
+                        source_cache: SourceColumnCache | None = None, copy_styles: bool = True,
+                        cancel_token: CancelToken | None = None, read_paths: Dict[str, str] | None = None) -> str:
     """Merge columns from multiple Excel files into a main workbook.
 
+    The main workbook is not loaded: copied cells are collected and only
+    the target sheets and ``styles.xml`` are rewritten in the output
+    package, every other part is copied unchanged.
+
     Args:
         main_file: Path to the main Excel workbook.
         mappings: A list of mapping dictionaries. Each mapping must contain:
@@ -36,9 +59,35 @@ def merge_excel_columns(main_file: str, mappings: List[Dict[str, object]], outpu
             - ``target_sheet``: sheet name in the main workbook.
             - ``target_columns``: list of column letters in the target sheet.
               ``source_columns`` and ``target_columns`` must have the same length.
+            - ``source_sheet`` (optional): sheet of the source file; the
+              active sheet by default.
+            - ``copy_styles`` (optional): overrides ``copy_styles`` for
+              this mapping.
         output_file: Optional path where the merged workbook will be saved. If
             not provided, ``main_file`` suffixed with ``_merged`` is used.
         progress_callback: Optional callback function(idx, total, mapping) for progress updates.
+        verify_mode: ``"off"``, ``"fast"`` (length + CRC32) or ``"strict"``
+            (SHA-256). Unless ``"off"``, the saved workbook is re-read once and
+            cells that differ from the source are logged and filled red.
+        prefetch_depth: How many upcoming source workbooks a background thread
+            loads while the current one is applied. ``0`` loads them inline.
+        staging: Optional :class:`~core.staging.StagingCache`; the main file
+            and the sources are then parsed from their local copies.
+        publisher: Optional :class:`~core.publisher.Publisher`. The output is
+            then saved and verified in a local temporary file and moved to
+            ``output_file`` in the background; call
+            ``publisher.wait([output_file])`` before using it.
+        source_cache: Optional :class:`~core.source_cache.SourceColumnCache`
+            shared by the merges of one session, so a source mapped several
+            times is parsed once.
+        copy_styles: Copy the source formatting too. With ``False`` only
+            values are copied: sources are streamed in read-only mode and the
+            written cells keep the formatting they have in the target.
+        cancel_token: Checked before every mapping; a cancelled token stops
+            the merge with :class:`~core.cancel.OperationCancelled` before
+            anything is saved.
+        read_paths: Optional ``{path: local copy}`` staged by the caller,
+            e.g. by :func:`merge_targets` for its worker processes.
 
     Returns:
         Path to the saved workbook.
@@ -51,11 +100,34 @@ def merge_excel_columns(main_file: str, mappings: List[Dict[str, object]], outpu
     if not os.path.isfile(main_file):
         raise FileNotFoundError(main_file)
 
-    wb_main = load_workbook(main_file)
+    verifier = CopyVerifier(verify_mode)
+    local = dict(read_paths or {})
+    if staging is not None:
+        sources = [mp.get("source") for mp in mappings if os.path.isfile(mp.get("source"))]
+        local.update(staging.stage([main_file, *sources]))
+    main_local = local.get(main_file, main_file)
+    with zipfile.ZipFile(main_local) as archive:
+        main_sheetnames = list(sheet_parts(archive))
+    # {sheet: {col: {row: value}}}: правки по столбцам, строки собираются при записи листа.
+    edits: Dict[str, Dict[int, Dict[int, object]]] = {}
+    cell_styles: Dict[str, Dict[int, Dict[int, object]]] = {}
     total_mappings = len(mappings)
 
+    def load(mp):
+        src = mp.get("source")
+        read_path = local.get(src, src)
+        styles = mp.get("copy_styles", copy_styles)
+        if source_cache is not None:
+            return source_cache.columns(src, mp.get("source_columns", []), mp.get("source_sheet"), read_path,
+                                        styles=styles)
+        return read_columns(read_path, mp.get("source_columns", []), mp.get("source_sheet"), styles=styles)
+
+    prefetcher = Prefetcher(mappings, load, prefetch_depth)
+
     try:
-        for idx, mp in enumerate(mappings):
+        for idx, (mp, columns, load_error) in enumerate(prefetcher):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
             src = mp.get("source")
             src_cols = mp.get("source_columns", [])
             tgt_sheet = mp.get("target_sheet")
@@ -65,67 +137,252 @@ def merge_excel_columns(main_file: str, mappings: List[Dict[str, object]], outpu
                 raise FileNotFoundError(src)
             if len(src_cols) != len(tgt_cols):
                 raise ValueError("Source and target columns must match in length")
-            if tgt_sheet not in wb_main.sheetnames:
+            if tgt_sheet not in main_sheetnames:
                 raise KeyError(tgt_sheet)
 
-            ws_main = wb_main[tgt_sheet]
-            wb_src = load_workbook(src, data_only=True)
-            ws_src = wb_src.active
+            if load_error is not None:
+                raise load_error
+
+            sheet_edits = edits.setdefault(tgt_sheet, {})
+            sheet_styles = cell_styles.setdefault(tgt_sheet, {})
 
-            actual_max_row = _get_data_max_row(ws_src)
+            with_styles = mp.get("copy_styles", copy_styles)
 
             for s_col, t_col in zip(src_cols, tgt_cols):
-                s_idx = column_index_from_string(s_col)
                 t_idx = column_index_from_string(t_col)
-                for row in range(1, actual_max_row + 1):
-                    source_cell = ws_src.cell(row=row, column=s_idx)
-                    if source_cell.value is None:
-                        continue
-                    target_cell = ws_main.cell(row=row, column=t_idx)
-                    _set_cell_with_retry(target_cell, source_cell)
-            wb_src.close()
+                values = columns[s_col]
+                column_edits = sheet_edits.setdefault(t_idx, {})
+                if with_styles:
+                    column_styles = sheet_styles.setdefault(t_idx, {})
+                    for row, value, style in values:
+                        column_edits[row] = value
+                        column_styles[row] = style
+                else:
+                    # Только значения: формат ячеек цели остаётся прежним.
+                    column_edits.update((row, value) for row, value, _style in values)
+                if verifier.enabled:
+                    for row, value, _style in values:
+                        verifier.record(tgt_sheet, row, t_idx, value)
 
             if progress_callback:
                 progress_callback(idx + 1, total_mappings, mp)
+    finally:
+        prefetcher.close()
+
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+    if output_file is None:
+        base, ext = os.path.splitext(main_file)
+        output_file = base + "_merged" + ext
+    save_path = publisher.local_path(output_file) if publisher is not None else output_file
+    try:
+        try:
+            save_column_edits(main_local, save_path, edits, cell_styles)
+        except PatchError as e:
+            logger.warning("Merge %s: patch save failed (%s), saving the full workbook", main_file, e)
+            _save_full(main_local, save_path, edits, cell_styles)
+        logger.info("Merge %s: waited %.2fs for source workbooks", main_file, prefetcher.wait_seconds)
+
+        mismatches = verifier.verify(save_path)
+        for sheet, row, col in mismatches:
+            logger.error("Merge verification mismatch in %s: %s R%sC%s", output_file, sheet, row, col)
+        try:
+            verifier.mark(save_path, mismatches)
+        except PatchError as e:
+            logger.warning("Merge %s: mismatched cells not highlighted (%s)", output_file, e)
+    except BaseException:
+        if save_path != output_file and os.path.exists(save_path):
+            os.remove(save_path)
+        raise
+    if publisher is not None:
+        publisher.publish(save_path, output_file)
+    return output_file
 
-        if output_file is None:
-            base, ext = os.path.splitext(main_file)
-            output_file = base + "_merged" + ext
+
+def _save_full(main_file: str, output_file: str, edits, cell_styles) -> None:
+    """Apply the collected cells on a full openpyxl load and save it."""
+    wb_main = load_workbook(main_file)
+    style_mapper = CellStyleMapper()
+    try:
+        for sheet, columns in edits.items():
+            ws_main = wb_main[sheet]
+            for col, rows in columns.items():
+                styles = cell_styles.get(sheet, {}).get(col, {})
+                for row, value in rows.items():
+                    target_cell = ws_main.cell(row=row, column=col)
+                    target_cell.value = value
+                    # copy basic formatting to mimic a real copy-paste
+                    if row in styles:
+                        style_mapper.apply(target_cell, styles[row])
         wb_main.save(output_file)
-        return output_file
     finally:
         wb_main.close()
 
 
-def _set_cell_with_retry(target_cell, source_cell, max_attempts: int = 5) -> None:
-    """Copy the value and style from ``source_cell`` to ``target_cell`` with retries.
+# Состояние процесса-исполнителя merge_targets(): задаётся инициализатором пула.
+_worker_cancel: CancelToken | None = None
+_worker_cache: SourceColumnCache | None = None
 
-    Some environments sporadically fail to write long text values on the first try.
-    This helper ensures the full text is written by verifying the value hash after
-    each attempt. Failed writes are highlighted in red.
+
+def _init_merge_worker(log_queue, cancel_event) -> None:
+    global _worker_cancel, _worker_cache
+    init_worker(log_queue, logger.name)
+    _worker_cancel = CancelToken(cancel_event)
+    # Источники, общие для нескольких целей, разбираются один раз на процесс.
+    _worker_cache = SourceColumnCache()
+
+
+def _merge_target_job(task: Dict[str, object], read_paths: Dict[str, str], options: Dict[str, object],
+                      publish_settings):
+    """Body of one :func:`merge_targets` job in a worker process."""
+    log = worker_log()
+    mappings = task.get("mappings", [])
+    for mapping in mappings:
+        _worker_cache.expect(mapping.get("source", ""), mapping.get("source_columns", []))
+    publisher = DeferredPublisher(*publish_settings) if publish_settings is not None else None
+    output = merge_excel_columns(
+        task.get("target"), mappings, output_file=task.get("output"),
+        progress_callback=lambda idx, total, _mp: log.progress(idx, total),
+        read_paths=read_paths, publisher=publisher,
+        source_cache=_worker_cache, cancel_token=_worker_cancel, **options,
+    )
+    return output, publisher.saved if publisher is not None else []
+
+
+def merge_targets(tasks: List[Dict[str, object]], workers: int | None = None,
+                  progress_callback: Callable[[int, int, Dict, Dict], None] | None = None,
+                  cancel_token: CancelToken | None = None, staging: StagingCache | None = None,
+                  publisher: Publisher | None = None, source_cache: SourceColumnCache | None = None,
+                  **options) -> Iterator[tuple]:
+    """Merge every task of ``MultiMergeMappingDialog``; yield ``(task, output, error)`` in task order.
+
+    A task is ``{"target", "mappings", "output"?}``; ``options`` go to
+    :func:`merge_excel_columns`. A failing target yields its exception and
+    the others go on. ``progress_callback(done, total, task, mapping)``
+    counts mappings over all tasks.
+
+    With more than one worker every target is merged in its own process;
+    ``app_logger`` lines of the workers are logged here, in task order, and
+    each worker keeps its own source cache. A cancelled ``cancel_token``
+    stops the running merges before they save, drops the targets not
+    started yet and raises :class:`~core.cancel.OperationCancelled`.
+    Outputs of targets that finished after the cancel are not published.
+
+    Remote inputs are staged here, before the pool starts, and the workers
+    read the local copies. If a worker process dies, the unfinished targets
+    run again one at a time in a new pool; a target that brings that pool
+    down as well yields the ``BrokenProcessPool`` error.
     """
+    total = sum(len(task.get("mappings", [])) for task in tasks) or 1
+    workers = min(workers or DEFAULT_WORKERS, len(tasks))
+    if workers <= 1:
+        completed = 0
+        for task in tasks:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+
+            def progress(idx, _total, mapping, task=task, completed=completed):
+                if progress_callback is not None:
+                    progress_callback(completed + idx, total, task, mapping)
+
+            try:
+                output = merge_excel_columns(
+                    task.get("target"), task.get("mappings", []), output_file=task.get("output"),
+                    progress_callback=progress, staging=staging, publisher=publisher,
+                    source_cache=source_cache, cancel_token=cancel_token, **options,
+                )
+            except OperationCancelled:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                yield task, None, exc
+            else:
+                yield task, output, None
+            completed += len(task.get("mappings", []))
+        return
 
-    def compute_hash(text):
-        if text is None:
-            text = ""
-        return hashlib.sha256(str(text).encode("utf-8")).hexdigest()
+    done_by_job: Dict[int, int] = {}
 
-    value = source_cell.value
-    source_hash = compute_hash(value)
+    def on_progress(job, done, _total):
+        done_by_job[job] = done
+        if progress_callback is not None:
+            task = tasks[job]
+            progress_callback(sum(done_by_job.values()), total, task, task["mappings"][done - 1])
 
-    for _ in range(max_attempts):
-        target_cell.value = value
-        # copy basic formatting to mimic a real copy-paste
-        target_cell.font = copy_style(source_cell.font)
-        target_cell.border = copy_style(source_cell.border)
-        target_cell.fill = copy_style(source_cell.fill)
-        target_cell.number_format = source_cell.number_format
-        target_cell.protection = copy_style(source_cell.protection)
-        target_cell.alignment = copy_style(source_cell.alignment)
+    # Копии сетевых файлов готовит родитель: кэш staging не рассчитан на несколько процессов.
+    read_paths = {}
+    if staging is not None:
+        read_paths = staging.stage([
+            path
+            for task in tasks
+            for path in [task.get("target"), *(mp.get("source") for mp in task.get("mappings", []))]
+            if path and os.path.isfile(path)
+        ])
+    collector = LogCollector(line_callback=logger.info, progress_callback=on_progress)
+    cancel_event = multiprocessing.Event()
+    settings = (publisher.remote_only, publisher.temp_dir) if publisher is not None else None
 
-        if target_cell.value == value and compute_hash(target_cell.value) == source_hash:
-            return
+    def start_pool(max_workers):
+        return ProcessPoolExecutor(max_workers=max_workers, initializer=_init_merge_worker,
+                                   initargs=(collector.queue, cancel_event))
 
-    # mark the cell red if we failed to copy value correctly
-    target_cell.fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
+    def submit(job):
+        # Повторная отправка — новая попытка: записи упавшей не попадут в лог.
+        return pool.submit(run_logged, collector.start(job), _merge_target_job, tasks[job], read_paths, options,
+                           settings)
 
+    def broken(future):
+        return future.done() and not future.cancelled() and isinstance(future.exception(), BrokenProcessPool)
+
+    pool = start_pool(workers)
+    futures = [submit(job) for job in range(len(tasks))]
+    isolated = False
+    published = 0
+    try:
+        job = 0
+        while job < len(tasks):
+            task, future = tasks[job], futures[job]
+            while not future.done():
+                collector.poll(0.05)
+                if cancel_token is not None and cancel_token.cancelled:
+                    cancel_event.set()
+                    raise OperationCancelled()
+            try:
+                output, saved = future.result()
+            except BrokenProcessPool as exc:
+                # Процесс пула упал. Незавершённые цели идут заново по одной в новом
+                # пуле; если он падает и так, виновата именно ожидаемая цель.
+                pool.shutdown(wait=True)
+                collector.renew_queue()
+                pool = start_pool(1)
+                culprit, isolated = isolated, True
+                for other in range(job + 1 if culprit else job, len(tasks)):
+                    if broken(futures[other]):
+                        futures[other] = submit(other)
+                if not culprit:
+                    continue
+                collector.end(job)
+                published = job + 1
+                yield task, None, exc
+                job += 1
+                continue
+            except Exception as exc:  # noqa: BLE001
+                error, output, saved = exc, None, []
+            else:
+                error = None
+            collector.wait(job, alive=lambda: not any(broken(other) for other in futures))
+            for local_path, dest in saved:
+                publisher.publish(local_path, dest)
+            published = job + 1
+            yield task, output, error
+            job += 1
+    finally:
+        if published < len(futures):
+            cancel_event.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+        # Цели, объединённые после отмены, не публикуются.
+        for future in futures[published:]:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                for local_path, _dest in future.result()[1]:
+                    if os.path.exists(local_path):
+                        os.remove(local_path)
+        collector.close()
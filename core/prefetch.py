@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Bounded background prefetch of source workbooks.
+
+The copy engines work strictly load → apply → close per file. A
+:class:`Prefetcher` moves the load step into a thread that runs up to
+``depth`` items ahead, so disk/SMB latency overlaps with applying the
+previous file while memory stays bounded by the queue depth.
+"""
+import queue
+import threading
+import time
+from typing import Callable, Iterable, Iterator, Tuple
+
+_DONE = object()
+
+
+class Prefetcher:
+    """Iterate over ``(item, result, error)`` with ``loader`` running ahead.
+
+    Results come back in the order of ``items``. An exception raised by
+    ``loader`` is returned as ``error`` instead of stopping the pipeline.
+    ``wait_seconds`` is the time the consumer spent blocked on loading.
+    With ``depth <= 0`` items are loaded inline, without a thread.
+    """
+
+    def __init__(self, items: Iterable, loader: Callable, depth: int = 2):
+        self.items = list(items)
+        self.loader = loader
+        self.depth = int(depth or 0)
+        self.wait_seconds = 0.0
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, self.depth))
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _run(self) -> None:
+        for item in self.items:
+            if self._stop.is_set():
+                return
+            try:
+                entry = (item, self.loader(item), None)
+            except Exception as e:  # noqa: BLE001 - передаётся потребителю
+                entry = (item, None, e)
+            if not self._put(entry):
+                return
+        self._put(_DONE)
+
+    def _put(self, entry) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self) -> Iterator[Tuple[object, object, Exception | None]]:
+        if self.depth <= 0:
+            yield from self._iter_inline()
+            return
+        self._thread = threading.Thread(target=self._run, name="xlmerger-prefetch", daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                started = time.perf_counter()
+                entry = self._queue.get()
+                self.wait_seconds += time.perf_counter() - started
+                if entry is _DONE:
+                    return
+                yield entry
+        finally:
+            self.close()
+
+    def _iter_inline(self):
+        for item in self.items:
+            started = time.perf_counter()
+            try:
+                entry = (item, self.loader(item), None)
+            except Exception as e:  # noqa: BLE001 - передаётся потребителю
+                entry = (item, None, e)
+            self.wait_seconds += time.perf_counter() - started
+            yield entry
+
+    def close(self) -> None:
+        """Stop the loader thread and drop anything still queued."""
+        self._stop.set()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
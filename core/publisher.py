@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Save outputs locally and publish them to their destination in the background.
+
+Saving an ``.xlsx`` straight onto an SMB share makes the writer wait for
+every small deflate chunk to reach the server. With a :class:`Publisher`
+the writer saves to :meth:`Publisher.local_path` instead, then hands the
+file to :meth:`Publisher.publish`: a background thread copies it next to
+the destination under a temporary ``.part`` name and renames it into
+place, retrying on errors. The destination therefore only ever holds a
+complete file or the previous one, never a half-written ``_out.xlsx``.
+
+Local destinations skip the copy: the temporary file is created in the
+destination folder and published with a single rename.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List
+
+from core.staging import COPY_CHUNK_SIZE, is_remote_path
+from utils.logger import logger
+
+
+class PublishError(OSError):
+    """Raised when an output could not be published after all retries."""
+
+
+class Publisher:
+    """Background uploader of locally saved outputs.
+
+    Args:
+        retries: Extra attempts after a failed upload.
+        retry_delay: Delay before the first retry, doubled every time.
+        workers: Uploads running at the same time.
+        remote_only: Only :func:`~core.staging.is_remote_path` destinations
+            go through the local temp directory; others are renamed in place.
+        temp_dir: Local directory for outputs bound to a remote destination.
+    """
+
+    def __init__(self, retries: int = 3, retry_delay: float = 0.5, workers: int = 2,
+                 remote_only: bool = True, temp_dir: str | None = None):
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.workers = max(1, workers)
+        self.remote_only = remote_only
+        self.temp_dir = temp_dir
+        self._pool: ThreadPoolExecutor | None = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def local_path(self, dest: str) -> str:
+        """Return a new temporary path to save the output for ``dest`` to."""
+        if self.remote_only and not is_remote_path(dest):
+            directory = os.path.dirname(os.path.abspath(dest))
+        else:
+            directory = self.temp_dir or tempfile.gettempdir()
+        os.makedirs(directory, exist_ok=True)
+        base, ext = os.path.splitext(os.path.basename(dest))
+        return os.path.join(directory, f".{base}.{uuid.uuid4().hex[:8]}{ext}")
+
+    def publish(self, local_path: str, dest: str) -> Future:
+        """Move ``local_path`` to ``dest`` in the background.
+
+        The returned future resolves to ``dest`` or raises
+        :class:`PublishError`; :meth:`wait` does the same by destination.
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="xlmerger-publish")
+            previous = self._pending.get(dest)
+            # Две публикации в один файл выполняются по очереди.
+            future = self._pool.submit(self._upload, local_path, dest, previous)
+            self._pending[dest] = future
+        return future
+
+    def wait(self, dests: Iterable[str] | None = None) -> List[str]:
+        """Block until the uploads of ``dests`` (default: all) are done.
+
+        Raises the first :class:`PublishError` after every upload finished.
+        """
+        with self._lock:
+            if dests is None:
+                items = list(self._pending.items())
+            else:
+                items = [(dest, self._pending[dest]) for dest in dests if dest in self._pending]
+        done, error = [], None
+        for dest, future in items:
+            try:
+                done.append(future.result())
+            except PublishError as e:
+                error = error or e
+            with self._lock:
+                if self._pending.get(dest) is future:
+                    del self._pending[dest]
+        if error is not None:
+            raise error
+        return done
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def _upload(self, local_path: str, dest: str, previous: Future | None) -> str:
+        if previous is not None:
+            try:
+                previous.result()
+            except PublishError:
+                pass
+        same_dir = os.path.dirname(os.path.abspath(local_path)) == os.path.dirname(os.path.abspath(dest))
+        last_error = None
+        for attempt in range(self.retries + 1):
+            part = None
+            try:
+                if same_dir:
+                    os.replace(local_path, dest)
+                else:
+                    part = f"{dest}.{uuid.uuid4().hex[:8]}.part"
+                    with open(local_path, "rb") as fsrc, open(part, "wb") as fdst:
+                        shutil.copyfileobj(fsrc, fdst, COPY_CHUNK_SIZE)
+                    os.replace(part, dest)
+            except OSError as e:
+                last_error = e
+                if part is not None:
+                    try:
+                        os.remove(part)
+                    except OSError:
+                        pass
+                logger.warning("Publish %s failed (attempt %d): %s", dest, attempt + 1, e)
+                if attempt < self.retries:
+                    time.sleep(self.retry_delay * 2 ** attempt)
+                continue
+            if not same_dir:
+                try:
+                    os.remove(local_path)
+                except OSError:
+                    pass
+            return dest
+        raise PublishError(f"Не удалось сохранить {dest}: {last_error}. Результат остался в {local_path}")
+
+
+class DeferredPublisher(Publisher):
+    """Worker-process publisher: saves where :class:`Publisher` would, publishes nothing.
+
+    The saved ``(local, dest)`` pairs go back to the parent, whose
+    publisher uploads them.
+    """
+
+    def __init__(self, remote_only: bool, temp_dir: str | None):
+        super().__init__(remote_only=remote_only, temp_dir=temp_dir)
+        self.saved = []
+
+    def publish(self, local_path: str, dest: str):
+        self.saved.append((local_path, dest))
+        return None
+
+
+_default_publisher: Publisher | None = None
+
+
+def default_publisher() -> Publisher:
+    """The process-wide publisher used by the GUI."""
+    global _default_publisher
+    if _default_publisher is None:
+        _default_publisher = Publisher()
+    return _default_publisher
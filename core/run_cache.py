@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""Skip a copy run when neither its inputs nor its settings changed.
+
+A :class:`RunCache` fingerprints the target, every source file and the
+mapping configuration. Files are compared by size and modification time
+first; only when the size matches but the time differs is the content
+hashed, so touching or re-copying an unchanged file does not invalidate
+the cache. The manifest lives next to the output and also records the
+output's own fingerprint, so a modified or missing output is never reused.
+"""
+import hashlib
+import json
+import os
+from typing import Dict, Iterable
+
+CACHE_VERSION = 1
+MANIFEST_SUFFIX = ".cache.json"
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def config_digest(config: Dict[str, object]) -> str:
+    """Return a stable hash of a JSON-serializable configuration."""
+    payload = json.dumps(config, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _stat_entry(path: str) -> Dict[str, object]:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class RunCache:
+    """Fingerprint of one run: ``output_file`` built from ``inputs`` with ``config``."""
+
+    def __init__(self, output_file: str, config: Dict[str, object], inputs: Iterable[str]):
+        self.output_file = output_file
+        self.manifest_path = output_file + MANIFEST_SUFFIX
+        self.config_hash = config_digest(config)
+        self.inputs = sorted({os.path.abspath(path) for path in inputs})
+        self._snapshot: Dict[str, Dict[str, object]] = {}
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(manifest, dict) or manifest.get("version") != CACHE_VERSION:
+            return None
+        return manifest
+
+    @staticmethod
+    def _matches(path: str, recorded) -> bool:
+        if not isinstance(recorded, dict):
+            return False
+        try:
+            current = _stat_entry(path)
+        except OSError:
+            return False
+        if current["size"] != recorded.get("size"):
+            return False
+        if current["mtime_ns"] == recorded.get("mtime_ns"):
+            return True
+        # Размер тот же, время другое (файл скопировали или «потрогали»).
+        return file_sha256(path) == recorded.get("sha256")
+
+    def lookup(self) -> bool:
+        """Return ``True`` if the existing output can be reused as is."""
+        manifest = self._load_manifest()
+        if manifest is None or manifest.get("config") != self.config_hash:
+            return False
+        recorded_inputs = manifest.get("inputs", {})
+        if sorted(recorded_inputs) != self.inputs:
+            return False
+        if not all(self._matches(path, recorded_inputs[path]) for path in self.inputs):
+            return False
+        return self._matches(self.output_file, manifest.get("output"))
+
+    def begin(self) -> None:
+        """Drop the old manifest and remember the inputs as the run sees them.
+
+        Removing the manifest first means a failed or cancelled run can
+        never be mistaken for a cached one.
+        """
+        try:
+            os.remove(self.manifest_path)
+        except FileNotFoundError:
+            pass
+        self._snapshot = {path: _stat_entry(path) for path in self.inputs}
+
+    def store(self) -> bool:
+        """Record the fingerprint of the inputs and of the finished output.
+
+        Nothing is stored (and ``False`` is returned) if an input changed
+        while the run was in progress.
+        """
+        inputs = {}
+        for path in self.inputs:
+            try:
+                current = _stat_entry(path)
+            except OSError:
+                return False
+            if current != self._snapshot.get(path):
+                return False
+            inputs[path] = dict(current, sha256=file_sha256(path))
+
+        manifest = {
+            "version": CACHE_VERSION,
+            "config": self.config_hash,
+            "inputs": inputs,
+            "output": dict(_stat_entry(self.output_file), sha256=file_sha256(self.output_file)),
+        }
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+        return True
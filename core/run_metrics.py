@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""Timings and throughput of one copy run.
+
+:class:`RunMetrics` collects how long each phase took (staging of network
+files, target load, source parsing, sheet matching, cell writes, logging, save, verification, publishing),
+how many rows were read and cells written, how many bytes every source
+file contributed and the peak memory of the process. ``ExcelProcessor``
+fills it during ``copy_data``; the GUI shows :meth:`RunMetrics.summary_lines`
+on the completion page and the same lines go to the copy log.
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+# Порядок фаз в отчёте.
+PHASES = (
+    "staging",
+    "target_load",
+    "source_parse",
+    "sheet_matching",
+    "source_wait",
+    "cell_writes",
+    "logging",
+    "save",
+    "verify",
+    "publish",
+)
+
+PHASE_TITLES = {
+    "staging": "Локальный кэш",
+    "target_load": "Загрузка цели",
+    "source_parse": "Разбор источников",
+    "sheet_matching": "Сопоставление листов",
+    "source_wait": "Ожидание источников",
+    "cell_writes": "Запись ячеек",
+    "logging": "Журнал",
+    "save": "Сохранение",
+    "verify": "Проверка",
+    "publish": "Публикация",
+}
+
+
+def peak_memory_bytes() -> int | None:
+    """Return the peak resident memory of this process, if the OS reports it."""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux отдаёт килобайты, macOS — байты.
+        return peak if sys.platform == "darwin" else peak * 1024
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class _Counters(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+            counters = _Counters()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return counters.PeakWorkingSetSize
+        except (AttributeError, OSError):
+            return None
+    return None
+
+
+def _format_bytes(size: int) -> str:
+    for unit in ("Б", "КБ", "МБ"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "Б" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} ГБ"
+
+
+class RunMetrics:
+    """Structured metrics of one ``copy_data`` run."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.sources: List[Dict[str, object]] = []
+        self.rows_read = 0
+        self.cells_written = 0
+        self.cells_unchanged = 0
+        self.total_seconds = 0.0
+        self.peak_memory_bytes: int | None = None
+        self._started = time.perf_counter()
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        """Add the time spent inside the ``with`` block to phase ``name``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def record_source(self, path: str, bytes_read: int, rows: int, timings: Dict[str, float] | None = None) -> None:
+        """Account one parsed source file; ``timings`` come from ``read_source_columns``."""
+        timings = timings or {}
+        self.rows_read += rows
+        self.add("source_parse", timings.get("parse", 0.0))
+        self.add("sheet_matching", timings.get("match", 0.0))
+        self.sources.append({
+            "path": path,
+            "bytes": bytes_read,
+            "rows": rows,
+            "seconds": timings.get("parse", 0.0) + timings.get("match", 0.0),
+        })
+
+    def finish(self) -> "RunMetrics":
+        self.total_seconds = time.perf_counter() - self._started
+        self.peak_memory_bytes = peak_memory_bytes()
+        return self
+
+    @property
+    def bytes_read(self) -> int:
+        return sum(source["bytes"] for source in self.sources)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.total_seconds if self.total_seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "total_seconds": self.total_seconds,
+            "phases": dict(self.phases),
+            "rows_read": self.rows_read,
+            "rows_per_second": self.rows_per_second,
+            "cells_written": self.cells_written,
+            "cells_unchanged": self.cells_unchanged,
+            "bytes_read": self.bytes_read,
+            "sources": [dict(source) for source in self.sources],
+            "peak_memory_bytes": self.peak_memory_bytes,
+        }
+
+    def summary_lines(self) -> List[str]:
+        """Human-readable report, one line per fact."""
+        lines = [
+            f"Время: {self.total_seconds:.2f} с, строк прочитано {self.rows_read} "
+            f"({self.rows_per_second:.0f} строк/с), ячеек записано {self.cells_written}",
+        ]
+        phases = [
+            f"{PHASE_TITLES.get(name, name)} {self.phases[name]:.2f} с"
+            for name in PHASES
+            if name in self.phases
+        ]
+        if phases:
+            lines.append("Фазы: " + ", ".join(phases))
+        if self.sources:
+            lines.append(f"Прочитано из источников: {_format_bytes(self.bytes_read)} ({len(self.sources)} файлов)")
+        if self.peak_memory_bytes is not None:
+            lines.append(f"Пиковая память: {_format_bytes(self.peak_memory_bytes)}")
+        return lines
+
+    def source_lines(self) -> List[str]:
+        return [
+            f"{os.path.basename(source['path'])}: {_format_bytes(source['bytes'])}, "
+            f"строк {source['rows']}, {source['seconds']:.2f} с"
+            for source in self.sources
+        ]
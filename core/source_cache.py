@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""Column values of source workbooks, shared by the mappings of a merge session.
+
+``MultiMergeMappingDialog`` often maps one translation file to several
+target sheets and several target workbooks. A :class:`SourceColumnCache`
+lives as long as one ``MergeWorker`` run: the first mapping of a source
+parses it once and extracts every column the session will need from it
+(see :meth:`SourceColumnCache.expect`). Later mappings get the extracted
+values from memory. Entries are keyed by ``(path, mtime, sheet)``, so a
+file changed during the session is parsed again, and the least recently
+used files are dropped once the estimated size passes ``max_bytes``.
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+from openpyxl import load_workbook
+from openpyxl.utils import column_index_from_string
+
+from core.source_reader import capture_cell_style
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Кортеж (row, value, style) и ссылка на него в списке.
+_ENTRY_OVERHEAD = 72
+
+ColumnValues = Dict[str, List[Tuple[int, object, object]]]
+
+
+def read_columns(path: str, columns: Iterable[str], sheet: str | None = None, styles: bool = True) -> ColumnValues:
+    """Return ``{letter: [(row, value, style), ...]}`` for non-empty cells.
+
+    ``sheet`` ``None`` means the active sheet. One
+    :class:`~core.source_reader.CellStyle` is shared by all cells with the
+    same source style. With ``styles=False`` the workbook is streamed in
+    read-only mode and ``style`` is ``None``.
+    """
+    by_index = {column_index_from_string(letter): letter for letter in set(columns)}
+    if not styles:
+        return _stream_values(path, by_index, sheet)
+    wb = load_workbook(path, data_only=True)
+    try:
+        ws = wb[sheet] if sheet else wb.active
+        result: ColumnValues = {letter: [] for letter in by_index.values()}
+        styles_by_key = {}
+        # Обход хранилища ячеек вместо ws.cell(): не создаёт пустые ячейки
+        # и не зависит от раздутого форматированием max_row.
+        for (row, col), cell in sorted(ws._cells.items()):
+            letter = by_index.get(col)
+            if letter is None or cell.value is None:
+                continue
+            style_key = tuple(cell._style)
+            style = styles_by_key.get(style_key)
+            if style is None:
+                style = styles_by_key[style_key] = capture_cell_style(cell)
+            result[letter].append((row, cell.value, style))
+        return result
+    finally:
+        wb.close()
+
+
+def _stream_values(path: str, by_index: Dict[int, str], sheet: str | None) -> ColumnValues:
+    result: ColumnValues = {letter: [] for letter in by_index.values()}
+    if not by_index:
+        return result
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet else wb.active
+        # Размеры из <dimension> бывают неверными — читаем до конца листа.
+        ws.reset_dimensions()
+        min_col, max_col = min(by_index), max(by_index)
+        targets = [(idx - min_col, result[letter]) for idx, letter in by_index.items()]
+        for row, values in enumerate(ws.iter_rows(min_col=min_col, max_col=max_col, values_only=True), start=1):
+            for offset, column in targets:
+                value = values[offset]
+                if value is not None:
+                    column.append((row, value, None))
+        return result
+    finally:
+        wb.close()
+
+
+def _estimate_bytes(columns: ColumnValues) -> int:
+    return sum(
+        _ENTRY_OVERHEAD + sys.getsizeof(value)
+        for values in columns.values()
+        for _row, value, _style in values
+    )
+
+
+class SourceColumnCache:
+    """Worker-scoped LRU cache of extracted source columns.
+
+    Args:
+        max_bytes: Estimated size of the cached values above which the least
+            recently used source files are dropped.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.parses = 0
+        self._entries: "OrderedDict[tuple, Tuple[ColumnValues, int, bool]]" = OrderedDict()
+        self._expected: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _norm(path: str) -> str:
+        return os.path.normcase(os.path.abspath(path))
+
+    def expect(self, path: str, columns: Iterable[str]) -> None:
+        """Announce that ``columns`` of ``path`` will be needed in this session."""
+        self._expected.setdefault(self._norm(path), set()).update(columns)
+
+    def columns(self, path: str, columns: Iterable[str], sheet: str | None = None,
+                read_path: str | None = None, styles: bool = True) -> ColumnValues:
+        """Return the values of ``columns``, parsing ``read_path`` (default ``path``) on a miss.
+
+        A miss extracts the requested columns together with everything
+        announced through :meth:`expect` and already cached for the file.
+        Entries read with styles also serve ``styles=False`` requests, not
+        the other way round.
+        """
+        columns = list(columns)
+        norm = self._norm(path)
+        key = (norm, os.stat(path).st_mtime_ns, sheet)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and (cached[2] or not styles) and all(letter in cached[0] for letter in columns):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return {letter: cached[0][letter] for letter in columns}
+            wanted = set(columns) | self._expected.get(norm, set())
+            if cached is not None:
+                wanted |= set(cached[0])
+                styles = styles or cached[2]
+            # Разбор под блокировкой: второй запрос того же файла дождётся первого.
+            values = read_columns(read_path or path, wanted, sheet, styles=styles)
+            self.parses += 1
+            self._store(key, values, styles)
+        return {letter: values[letter] for letter in columns}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _store(self, key, values: ColumnValues, styled: bool) -> None:
+        # Устаревшие версии файла (другой mtime) больше не понадобятся.
+        for old in [k for k in self._entries if k[0] == key[0] and k[2] == key[2]]:
+            self.size -= self._entries.pop(old)[1]
+        size = _estimate_bytes(values)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (values, size, styled)
+        self.size += size
+        while self.size > self.max_bytes:
+            _old_key, (_values, old_size, _styled) = self._entries.popitem(last=False)
+            self.size -= old_size
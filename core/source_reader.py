@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""Extraction of translation columns from source workbooks.
+
+The functions here never touch the target workbook or the logger, so they
+can run either in the main process or in a worker process. A parsed
+source is reduced to compact per-sheet column arrays which the caller
+applies to the target in its own, deterministic order.
+"""
+import os
+import time
+from collections import namedtuple
+from copy import copy as copy_style
+from typing import Dict, List, Tuple
+
+from openpyxl import load_workbook
+from openpyxl.styles.cell_style import StyleArray
+
+CellStyle = namedtuple(
+    "CellStyle", ["font", "border", "fill", "number_format", "protection", "alignment"]
+)
+
+
+def apply_cell_style(cell, style: CellStyle) -> None:
+    """Assign every attribute of ``style`` to an openpyxl ``cell``."""
+    cell.font = style.font
+    cell.border = style.border
+    cell.fill = style.fill
+    cell.number_format = style.number_format
+    cell.protection = style.protection
+    cell.alignment = style.alignment
+
+
+class CellStyleMapper:
+    """Apply :class:`CellStyle` objects to the cells of one target workbook.
+
+    :func:`apply_cell_style` interns six style objects into the target's
+    style tables for every cell. The mapper does that once per distinct
+    source style, remembers the resulting target style ids and then only
+    assigns those ids, so the cost follows the number of distinct styles,
+    not the number of cells. Styles are looked up by identity first: the
+    readers share one ``CellStyle`` per source style, so the value hash is
+    computed once per source workbook.
+    """
+
+    _FIELDS = ("fontId", "borderId", "fillId", "numFmtId", "protectionId", "alignmentId")
+
+    def __init__(self):
+        self._by_identity: Dict[int, Tuple[CellStyle, tuple]] = {}
+        self._by_value: Dict[CellStyle, tuple] = {}
+
+    @property
+    def translated(self) -> int:
+        """Number of distinct styles interned into the target."""
+        return len(self._by_value)
+
+    def apply(self, cell, style: CellStyle) -> None:
+        entry = self._by_identity.get(id(style))
+        if entry is not None and entry[0] is style:
+            ids = entry[1]
+        else:
+            ids = self._by_value.get(style)
+            if ids is None:
+                apply_cell_style(cell, style)
+                ids = self._by_value[style] = tuple(getattr(cell._style, name) for name in self._FIELDS)
+                self._by_identity[id(style)] = (style, ids)
+                return
+            # Ссылка на style в записи не даёт id() достаться другому объекту.
+            self._by_identity[id(style)] = (style, ids)
+        if cell._style is None:
+            cell._style = StyleArray()
+        array = cell._style
+        array.fontId, array.borderId, array.fillId, array.numFmtId, array.protectionId, array.alignmentId = ids
+
+
+def capture_cell_style(cell) -> CellStyle:
+    """Return a picklable :class:`CellStyle` copied from ``cell``."""
+    return CellStyle(
+        copy_style(cell.font),
+        copy_style(cell.border),
+        copy_style(cell.fill),
+        cell.number_format,
+        copy_style(cell.protection),
+        copy_style(cell.alignment),
+    )
+
+
+class SheetNotFoundError(Exception):
+    """Raised when no sheet of a source workbook matches a target sheet."""
+
+    def __init__(self, main_sheet_name: str, sheetnames: List[str]):
+        self.main_sheet_name = main_sheet_name
+        self.sheetnames = list(sheetnames)
+        sheets = ', '.join(self.sheetnames)
+        super().__init__(
+            f"Не найден лист '{main_sheet_name}' в файле перевода. "
+            f"В файле листы: {sheets}. "
+            f"Переименуйте листы для автоматического сопоставления, либо удалите лишние листы."
+        )
+
+    def __reduce__(self):
+        # Ошибка передаётся из рабочих процессов, поэтому должна пиклиться.
+        return self.__class__, (self.main_sheet_name, self.sheetnames)
+
+
+def match_sheet(sheetnames: List[str], main_sheet_name: str, mapped_sheet: str | None = None) -> str:
+    """Return the source sheet that corresponds to ``main_sheet_name``.
+
+    An explicit mapping wins, then a sheet with the same name, then the
+    only sheet of a single-sheet workbook.
+    """
+    if mapped_sheet and mapped_sheet in sheetnames:
+        return mapped_sheet
+    if main_sheet_name in sheetnames:
+        return main_sheet_name
+    if len(sheetnames) == 1:
+        return sheetnames[0]
+    raise SheetNotFoundError(main_sheet_name, sheetnames)
+
+
+def get_data_max_row(ws) -> int:
+    """Return the last row that contains a non-None value.
+
+    ``ws.max_row`` can be inflated when formatting is applied to
+    cells far beyond the actual data range, causing the copy loop
+    to iterate over millions of empty rows and appear frozen.
+    """
+    max_row = 0
+    for (r, _c), cell in ws._cells.items():
+        if cell.value is not None and r > max_row:
+            max_row = r
+    return max_row
+
+
+def read_column_values(ws, column_index: int) -> list:
+    """Stream one column of a read-only worksheet into a list of values.
+
+    Item ``i`` holds the value of row ``i + 1``. Only the requested
+    column is kept while rows are parsed, and trailing empty rows are
+    dropped, so memory grows with the column rather than the sheet.
+    """
+    # Размеры из <dimension> бывают неверными — читаем до конца листа.
+    ws.reset_dimensions()
+    values = []
+    last_data_row = 0
+    for (value,) in ws.iter_rows(min_col=column_index, max_col=column_index, values_only=True):
+        values.append(value)
+        if value is not None:
+            last_data_row = len(values)
+    del values[last_data_row:]
+    return values
+
+
+def read_columns_values(ws, column_indexes: List[int]) -> List[list]:
+    """Stream several columns of a read-only worksheet in one pass.
+
+    Returns one list per requested column, all trimmed to the last row
+    where the first column has a value.
+    """
+    ws.reset_dimensions()
+    min_col, max_col = min(column_indexes), max(column_indexes)
+    offsets = [idx - min_col for idx in column_indexes]
+    columns: List[list] = [[] for _ in column_indexes]
+    last_data_row = 0
+    for values in ws.iter_rows(min_col=min_col, max_col=max_col, values_only=True):
+        for column, offset in zip(columns, offsets):
+            column.append(values[offset])
+        if values[offsets[0]] is not None:
+            last_data_row = len(columns[0])
+    for column in columns:
+        del column[last_data_row:]
+    return columns
+
+
+def normalize_key(value):
+    """Return a hashable row key, or ``None`` for an empty key cell.
+
+    Keys are compared as stripped strings; whole floats such as ``12.0``
+    become ``"12"`` so numeric IDs match their text form.
+    """
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    key = str(value).strip()
+    return key or None
+
+
+def read_column_with_styles(ws, column_index: int, styles: List[CellStyle], style_ids: Dict[tuple, int]):
+    """Return ``(values, style_ids)`` of one column of a fully loaded sheet.
+
+    Distinct cell styles are appended to ``styles`` once per workbook and
+    referenced by their index, so the result stays compact and picklable.
+    """
+    values = []
+    ids = []
+    for row in range(1, get_data_max_row(ws) + 1):
+        cell = ws.cell(row=row, column=column_index)
+        values.append(cell.value)
+        # Ячейки, созданные при обращении (пропуски в столбце), ещё без стиля.
+        key = tuple(cell._style) if cell._style is not None else tuple(StyleArray())
+        style_id = style_ids.get(key)
+        if style_id is None:
+            style_id = len(styles)
+            style_ids[key] = style_id
+            styles.append(capture_cell_style(cell))
+        ids.append(style_id)
+    return values, ids
+
+
+def read_source_columns(
+    file_path: str,
+    requests: Dict[str, Tuple[int, str | None, int | None]],
+    preserve_formatting: bool = False,
+) -> Dict[str, object]:
+    """Open ``file_path`` once and extract the requested column of every sheet.
+
+    Args:
+        file_path: Source workbook.
+        requests: ``{main_sheet_name: (column_index, mapped_sheet_name,
+            key_column_index)}``. ``key_column_index`` may be ``None``.
+        preserve_formatting: Also return style ids and the style table.
+            Without it the workbook is streamed in read-only mode.
+
+    Returns:
+        ``{"sheets": {main_sheet_name: entry}, "styles": [CellStyle, ...],
+        "bytes": file size, "timings": {"parse": s, "match": s}}``
+        where ``entry`` is ``{"sheet", "values", "style_ids", "keys"}`` or,
+        when no sheet matches, ``{"error": SheetNotFoundError}``. ``keys``
+        is ``None`` unless a key column was requested.
+
+    Errors raised while opening the workbook propagate to the caller.
+    """
+    started = time.perf_counter()
+    match_seconds = 0.0
+    wb = load_workbook(file_path, read_only=not preserve_formatting)
+    styles: List[CellStyle] = []
+    style_ids: Dict[tuple, int] = {}
+    sheets: Dict[str, Dict[str, object]] = {}
+    try:
+        for main_sheet_name, (column_index, mapped_sheet, key_index) in requests.items():
+            match_started = time.perf_counter()
+            try:
+                sheet_name = match_sheet(wb.sheetnames, main_sheet_name, mapped_sheet)
+            except SheetNotFoundError as e:
+                sheets[main_sheet_name] = {"error": e}
+                continue
+            finally:
+                match_seconds += time.perf_counter() - match_started
+            ws = wb[sheet_name]
+            keys = None
+            if preserve_formatting:
+                values, ids = read_column_with_styles(ws, column_index, styles, style_ids)
+                if key_index is not None:
+                    keys = [ws.cell(row=row, column=key_index).value for row in range(1, len(values) + 1)]
+            elif key_index is not None:
+                values, keys = read_columns_values(ws, [column_index, key_index])
+                ids = None
+            else:
+                values, ids = read_column_values(ws, column_index), None
+            sheets[main_sheet_name] = {"sheet": sheet_name, "values": values, "style_ids": ids, "keys": keys}
+    finally:
+        wb.close()
+    timings = {"parse": time.perf_counter() - started - match_seconds, "match": match_seconds}
+    return {"sheets": sheets, "styles": styles, "bytes": os.path.getsize(file_path), "timings": timings}
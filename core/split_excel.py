@@ -5,6 +5,8 @@ from typing import Callable, List, Dict, Tuple
 import xlsxwriter
 from openpyxl.utils import get_column_letter
 
+from core.staging import StagingCache
+
 
 def _is_lang_column(name: str) -> bool:
     if not name:
@@ -126,9 +128,14 @@ def split_excel_by_languages(
     target_langs: list[str] | None = None,
     extra_columns: list[str] | None = None,
     progress_callback: Callable[[int, int, str], None] | None = None,
+    staging: StagingCache | None = None,
 ) -> List[str]:
-    """Split Excel into language pairs."""
-    wb = load_workbook(excel_path)
+    """Split Excel into language pairs.
+
+    With ``staging`` a workbook on a network share is parsed from its
+    local copy; the output still defaults to the workbook's own folder.
+    """
+    wb = load_workbook(staging.local_path(excel_path) if staging is not None else excel_path)
     sheet = wb[sheet_name]
 
     header_map: Dict[str, int] = {}
@@ -235,9 +242,13 @@ def split_excel_multiple_sheets(
     sheet_configs: Dict[str, Tuple[str, List[str] | None, List[str] | None]],
     output_dir: str | None = None,
     progress_callback: Callable[[int, int, str], None] | None = None,
+    staging: StagingCache | None = None,
 ) -> List[str]:
-    """Split multiple sheets preserving sheet names."""
-    wb = load_workbook(excel_path)
+    """Split multiple sheets preserving sheet names.
+
+    ``staging`` works as in :func:`split_excel_by_languages`.
+    """
+    wb = load_workbook(staging.local_path(excel_path) if staging is not None else excel_path)
 
     if output_dir is None:
         output_dir = os.path.dirname(excel_path)
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""Local staging copies of workbooks that live on network shares.
+
+openpyxl reads an ``.xlsx`` through many small random reads of the zip
+directory and members; over SMB every one of them is a round trip. A
+:class:`StagingCache` first copies remote inputs to a local directory with
+large sequential reads, several files in parallel, and the engines parse
+the local copy instead. Copies are keyed by the source path, checked
+against the source's size and modification time, kept between runs and
+evicted least-recently-used once the cache grows past ``max_bytes``.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable
+
+from utils.logger import logger
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "xlmerger-staging")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+INDEX_NAME = "index.json"
+
+_DRIVE_REMOTE = 4
+
+
+def is_remote_path(path: str) -> bool:
+    """Return ``True`` for UNC paths and, on Windows, mapped network drives."""
+    if path.startswith(("\\\\", "//")):
+        return True
+    if sys.platform == "win32":
+        drive = os.path.splitdrive(os.path.abspath(path))[0]
+        if drive:
+            try:
+                import ctypes
+
+                return ctypes.windll.kernel32.GetDriveTypeW(drive + "\\") == _DRIVE_REMOTE
+            except (AttributeError, OSError):
+                return False
+    return False
+
+
+def _copy_sequential(src: str, dst: str, chunk_size: int = COPY_CHUNK_SIZE) -> None:
+    with open(src, "rb", buffering=0) as fsrc, open(dst, "wb") as fdst:
+        shutil.copyfileobj(fsrc, fdst, chunk_size)
+
+
+class StagingCache:
+    """Directory of local copies of remote inputs, shared by all runs.
+
+    Args:
+        cache_dir: Where the copies and ``index.json`` live.
+        max_bytes: Size cap; least recently used copies are removed above it.
+        workers: How many files are copied at the same time.
+        remote_only: Stage only :func:`is_remote_path` inputs; local files
+            are used in place.
+    """
+
+    def __init__(self, cache_dir: str | None = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 workers: int = 4, remote_only: bool = True):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.workers = max(1, workers)
+        self.remote_only = remote_only
+        self.index_path = os.path.join(self.cache_dir, INDEX_NAME)
+        self.hits = 0
+        self.copied_bytes = 0
+        self._lock = threading.Lock()
+
+    # --- индекс -----------------------------------------------------------
+
+    def _load_index(self) -> Dict[str, Dict[str, object]]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return index if isinstance(index, dict) else {}
+
+    def _save_index(self, index) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def _key(path: str) -> str:
+        normalized = os.path.normcase(os.path.abspath(path))
+        return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str, source: str) -> str:
+        return os.path.join(self.cache_dir, key + os.path.splitext(source)[1].lower())
+
+    # --- публичный API ----------------------------------------------------
+
+    def wants(self, path: str) -> bool:
+        return not self.remote_only or is_remote_path(path)
+
+    def local_path(self, path: str) -> str:
+        """Stage one file and return the path to parse."""
+        return self.stage([path])[path]
+
+    def stage(self, paths: Iterable[str]) -> Dict[str, str]:
+        """Return ``{path: local path}`` with every remote input staged.
+
+        Valid copies are reused; missing or stale ones are copied in
+        parallel. A file that cannot be staged (copy error, larger than the
+        cap, changed while being copied) maps to itself.
+        """
+        paths = list(dict.fromkeys(paths))
+        result = {path: path for path in paths}
+        wanted = [path for path in paths if self.wants(path)]
+        if not wanted:
+            return result
+
+        with self._lock:
+            index = self._load_index()
+            now = time.time()
+            to_copy = []
+            for path in wanted:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                key = self._key(path)
+                entry = index.get(key)
+                local = self._entry_path(key, path)
+                if (
+                    entry
+                    and entry.get("size") == stat.st_size
+                    and entry.get("mtime_ns") == stat.st_mtime_ns
+                    and os.path.isfile(local)
+                    and os.path.getsize(local) == stat.st_size
+                ):
+                    entry["last_used"] = now
+                    result[path] = local
+                    self.hits += 1
+                elif stat.st_size <= self.max_bytes:
+                    index.pop(key, None)
+                    to_copy.append((path, key, local, stat))
+
+            if to_copy:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with ThreadPoolExecutor(max_workers=min(self.workers, len(to_copy))) as pool:
+                    copied = list(pool.map(self._copy_one, to_copy))
+                for (path, key, local, stat), ok in zip(to_copy, copied):
+                    if not ok:
+                        continue
+                    index[key] = {
+                        "source": path,
+                        "size": stat.st_size,
+                        "mtime_ns": stat.st_mtime_ns,
+                        "last_used": now,
+                    }
+                    result[path] = local
+                    self.copied_bytes += stat.st_size
+
+            self._evict(index, pinned={self._key(path) for path in wanted})
+            self._save_index(index)
+        return result
+
+    def clear(self) -> None:
+        """Remove every staged copy and the index."""
+        with self._lock:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    # --- внутреннее -------------------------------------------------------
+
+    def _copy_one(self, job) -> bool:
+        path, _key, local, stat = job
+        tmp_path = f"{local}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            _copy_sequential(path, tmp_path)
+            after = os.stat(path)
+            if (after.st_size, after.st_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                # Файл меняли во время копирования — такой копии верить нельзя.
+                os.remove(tmp_path)
+                return False
+            os.replace(tmp_path, local)
+            return True
+        except OSError as e:
+            logger.warning("Staging %s failed: %s", path, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+
+    def _evict(self, index, pinned) -> None:
+        """Drop least recently used copies until the cache fits ``max_bytes``.
+
+        Copies staged for the current call are never evicted by it.
+        """
+        total = sum(entry.get("size", 0) for entry in index.values())
+        if total <= self.max_bytes:
+            return
+        for key, entry in sorted(index.items(), key=lambda item: item[1].get("last_used", 0)):
+            if total <= self.max_bytes:
+                break
+            if key in pinned:
+                continue
+            try:
+                os.remove(self._entry_path(key, entry.get("source", "")))
+            except OSError:
+                pass
+            total -= entry.get("size", 0)
+            del index[key]
+
+
+_default_cache: StagingCache | None = None
+
+
+def default_staging() -> StagingCache:
+    """The process-wide cache used by the GUI (remote inputs only)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = StagingCache()
+    return _default_cache
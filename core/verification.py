@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Post-save verification of copied cell values.
+
+Instead of re-hashing every value while it is written, the copy engines
+record a checksum per target cell and check the saved workbook once, in
+streaming mode, after ``workbook.save``.
+"""
+import datetime
+import hashlib
+import zipfile
+import zlib
+from typing import Dict, List, Tuple
+
+from openpyxl import load_workbook
+from openpyxl.compat.numbers import NUMERIC_TYPES
+from openpyxl.styles import PatternFill
+from openpyxl.utils.datetime import from_excel, to_excel
+
+from core.xlsx_patch import Restyle, write_patched_workbook
+from core.xlsx_styles import style_appender
+
+VERIFY_OFF = "off"
+VERIFY_FAST = "fast"
+VERIFY_STRICT = "strict"
+VERIFY_MODES = (VERIFY_OFF, VERIFY_FAST, VERIFY_STRICT)
+
+MISMATCH_FILL = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
+
+
+def value_checksum(value, mode: str = VERIFY_FAST):
+    """Return a checksum of ``value`` as it will read back from the file.
+
+    ``fast`` uses the UTF-8 length together with CRC32, ``strict`` uses
+    SHA-256. Values are compared in the form they take in the sheet XML:
+    numbers as openpyxl writes them (``%.16g``, so ``1.0`` and ``1`` agree),
+    dates and times as Excel serials rounded to milliseconds like the
+    reader does. Line endings are normalized because the XML parser turns
+    ``\\r\\n`` and ``\\r`` into ``\\n`` when the saved sheet is read.
+    """
+    data = _canonical_text(value).replace("\r\n", "\n").replace("\r", "\n").encode("utf-8")
+    if mode == VERIFY_STRICT:
+        return hashlib.sha256(data).digest()
+    return len(data), zlib.crc32(data)
+
+
+def _canonical_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, datetime.timedelta):
+        value = to_excel(from_excel(to_excel(value), timedelta=True))
+    elif isinstance(value, (datetime.date, datetime.time)):
+        value = to_excel(from_excel(to_excel(value)))
+    if isinstance(value, NUMERIC_TYPES):
+        return "%.16g" % value
+    return str(value)
+
+
+class CopyVerifier:
+    """Collects expected checksums and compares them with a saved workbook."""
+
+    def __init__(self, mode: str = VERIFY_FAST):
+        if mode not in VERIFY_MODES:
+            raise ValueError(f"Unknown verification mode: {mode}")
+        self.mode = mode
+        self.expected: Dict[str, Dict[Tuple[int, int], object]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != VERIFY_OFF
+
+    def record(self, sheet: str, row: int, col: int, value) -> None:
+        if self.mode == VERIFY_OFF:
+            return
+        self.expected.setdefault(sheet, {})[(row, col)] = value_checksum(value, self.mode)
+
+    def verify(self, path: str) -> List[Tuple[str, int, int]]:
+        """Re-read ``path`` and return ``(sheet, row, col)`` of cells that differ."""
+        mismatches: List[Tuple[str, int, int]] = []
+        if not self.enabled or not self.expected:
+            return mismatches
+
+        wb = load_workbook(path, read_only=True)
+        try:
+            for sheet, cells in self.expected.items():
+                rows = [r for r, _ in cells]
+                cols = [c for _, c in cells]
+                min_row, max_row = min(rows), max(rows)
+                min_col, max_col = min(cols), max(cols)
+                ws = wb[sheet]
+                ws.reset_dimensions()
+                seen = set()
+                for row_idx, values in enumerate(
+                    ws.iter_rows(min_row=min_row, max_row=max_row, min_col=min_col,
+                                 max_col=max_col, values_only=True),
+                    start=min_row,
+                ):
+                    for offset, value in enumerate(values):
+                        key = (row_idx, min_col + offset)
+                        expected = cells.get(key)
+                        if expected is None:
+                            continue
+                        seen.add(key)
+                        if value_checksum(value, self.mode) != expected:
+                            mismatches.append((sheet, row_idx, min_col + offset))
+                # Строки, которых нет в сохранённом листе, тоже считаются расхождением.
+                for row_idx, col_idx in cells:
+                    if (row_idx, col_idx) not in seen:
+                        mismatches.append((sheet, row_idx, col_idx))
+        finally:
+            wb.close()
+        return sorted(mismatches)
+
+    @staticmethod
+    def mark(path: str, mismatches: List[Tuple[str, int, int]]) -> None:
+        """Highlight mismatched cells of ``path`` in red.
+
+        Only the affected sheets and ``styles.xml`` are rewritten through the
+        zip patch, so macros and everything else in the package are kept.
+        Raises :class:`~core.xlsx_package.PatchError` when the package
+        cannot be patched; ``path`` is then left as it was.
+        """
+        if not mismatches:
+            return
+        with zipfile.ZipFile(path) as archive:
+            appender = style_appender(archive)
+        restyle = Restyle(lambda style: appender.derive_xf(style or 0, fill=MISMATCH_FILL))
+        patches: Dict[str, Dict[int, Dict[int, Restyle]]] = {}
+        for sheet, row, col in mismatches:
+            patches.setdefault(sheet, {}).setdefault(row, {})[col] = restyle
+        write_patched_workbook(path, path, patches, appender=appender)
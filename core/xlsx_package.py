@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Low-level helpers for the xlsx zip package.
+
+openpyxl always parses and re-serializes a whole workbook. The helpers
+here work on the package parts directly: they map sheet names to their
+``xl/worksheets/*.xml`` parts and copy members between archives.
+"""
+import posixpath
+import re
+import shutil
+import zipfile
+from typing import Dict
+from xml.etree import ElementTree
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+WORKBOOK_PART = "xl/workbook.xml"
+WORKBOOK_RELS_PART = "xl/_rels/workbook.xml.rels"
+
+class PatchError(Exception):
+    """The package contains a construct that cannot be patched safely."""
+
+
+def _resolve_target(base_part: str, target: str) -> str:
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base_part), target))
+
+
+def sheet_parts(archive: zipfile.ZipFile) -> Dict[str, str]:
+    """Return ``{sheet name: worksheet part}`` in workbook order.
+
+    Only worksheets are returned; chartsheets and dialog sheets are skipped.
+    """
+    workbook = ElementTree.fromstring(archive.read(WORKBOOK_PART))
+    rels = ElementTree.fromstring(archive.read(WORKBOOK_RELS_PART))
+    targets = {
+        rel.get("Id"): _resolve_target(WORKBOOK_PART, rel.get("Target"))
+        for rel in rels.iter(f"{{{NS_PKG_REL}}}Relationship")
+        if rel.get("Type", "").endswith("/worksheet")
+    }
+    parts = {}
+    sheets = workbook.find(f"{{{NS_MAIN}}}sheets")
+    for sheet in sheets if sheets is not None else []:
+        rel_id = sheet.get(f"{{{NS_REL}}}id")
+        if rel_id in targets:
+            parts[sheet.get("name")] = targets[rel_id]
+    return parts
+
+
+def copy_member(src: zipfile.ZipFile, dst: zipfile.ZipFile, info: zipfile.ZipInfo,
+                compress_type: int = zipfile.ZIP_DEFLATED, chunk_size: int = 1024 * 1024) -> None:
+    """Stream one archive member from ``src`` to ``dst`` unchanged."""
+    with src.open(info) as fin, dst.open(_output_info(info, compress_type), "w") as fout:
+        shutil.copyfileobj(fin, fout, chunk_size)
+
+
+def _output_info(info: zipfile.ZipInfo, compress_type: int = zipfile.ZIP_DEFLATED) -> zipfile.ZipInfo:
+    out = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    out.compress_type = compress_type
+    out.external_attr = info.external_attr
+    return out
+
+
+_CALC_CHAIN_OVERRIDE_RE = re.compile(r'<Override\b[^>]*PartName="/xl/calcChain\.xml"[^>]*/>')
+_CALC_CHAIN_REL_RE = re.compile(r'<Relationship\b[^>]*Target="[^"]*calcChain\.xml"[^>]*/>')
+
+
+def strip_calc_chain(part: str, data: bytes) -> bytes:
+    """Remove references to ``xl/calcChain.xml`` from a package part.
+
+    Excel rebuilds the calculation chain on load; a stale chain that points
+    at cells which no longer hold formulas makes it repair the file.
+    """
+    if part == "[Content_Types].xml":
+        return _CALC_CHAIN_OVERRIDE_RE.sub("", data.decode("utf-8")).encode("utf-8")
+    if part == WORKBOOK_RELS_PART:
+        return _CALC_CHAIN_REL_RE.sub("", data.decode("utf-8")).encode("utf-8")
+    return data
@@ -0,0 +1,466 @@
+# -*- coding: utf-8 -*-
+"""Write edited cells back into an xlsx package without openpyxl.
+
+Only the worksheet parts that contain edits are rewritten; they are read
+row by row and cells listed in the patch are replaced or inserted. Every
+other member of the archive is copied unchanged, so untouched sheets keep
+their original bytes and keep pointing at the original sharedStrings and
+styles tables.
+
+Edits are passed per column (:func:`save_column_edits`): a
+``{col: {row: value}}`` lookup per sheet costs one dict entry per copied
+cell, and the rows are assembled only while the sheet XML streams past.
+Memory then depends on the copied cells, not on the size of the sheet.
+"""
+import codecs
+import datetime
+import math
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from contextlib import ExitStack
+from decimal import Decimal
+from typing import Callable, Dict, Iterator, Mapping, Tuple
+from xml.sax.saxutils import escape
+
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.utils.datetime import to_excel
+
+from core.xlsx_package import (
+    WORKBOOK_RELS_PART, PatchError, _output_info, copy_member, sheet_parts, strip_calc_chain,
+)
+from core.xlsx_styles import STYLES_PART, StyleAppender, column_xf_ids, style_appender
+
+# {row: {col: value}} — правки одного листа
+RowPatches = Dict[int, Dict[int, object]]
+# {col: {row: value}} — те же правки по столбцам
+ColumnPatches = Dict[int, Dict[int, object]]
+# (индекс стиля ячейки или None, дата) -> индекс стиля с форматом даты
+DateStyle = Callable[[str | None, object], str]
+
+_DATE_TYPES = (datetime.datetime, datetime.date, datetime.time, datetime.timedelta)
+
+# Переписанный лист держится в памяти до этого размера, дальше — во временном файле.
+_SPOOL_SIZE = 16 * 1024 * 1024
+
+_ROW_NUMBER_RE = re.compile(r'\sr="(\d+)"')
+_SPANS_RE = re.compile(r'\sspans="[^"]*"')
+_CELL_RE = re.compile(r'<c\b[^>]*?/>|<c\b[^>]*>.*?</c>', re.DOTALL)
+_CELL_REF_RE = re.compile(r'\sr="([A-Z]+)\d+"')
+_CELL_STYLE_RE = re.compile(r'\ss="(\d+)"')
+_DIMENSION_RE = re.compile(r'(<dimension\b[^>]*\bref=")([^"]*)(")')
+_REF_RE = re.compile(r'([A-Z]+)(\d+)')
+
+
+class _Reader:
+    """Incremental UTF-8 text reader with token search over a moving buffer."""
+
+    def __init__(self, stream, chunk_size: int = 256 * 1024):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _more(self) -> bool:
+        if self.eof:
+            return False
+        data = self.stream.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            self.buf += self.decoder.decode(b"", final=True)
+            return False
+        if self.pos > len(self.buf) // 2:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += self.decoder.decode(data)
+        return True
+
+    def find(self, token: str) -> int:
+        """Return the absolute index of ``token`` at or after ``pos``, or -1."""
+        offset = 0  # относительно pos: _more() может сдвинуть буфер
+        while True:
+            idx = self.buf.find(token, self.pos + offset)
+            if idx != -1:
+                return idx
+            offset = max(0, len(self.buf) - self.pos - len(token) + 1)
+            if not self._more():
+                return -1
+
+    def take(self, end: int) -> str:
+        text = self.buf[self.pos:end]
+        self.pos = end
+        return text
+
+    def startswith(self, token: str) -> bool:
+        while len(self.buf) - self.pos < len(token) and self._more():
+            pass
+        return self.buf.startswith(token, self.pos)
+
+    def rest(self) -> Iterator[str]:
+        yield self.take(len(self.buf))
+        while self._more():
+            yield self.take(len(self.buf))
+
+
+def render_cell(ref: str, value, style: str | None = None) -> str:
+    """Return the ``<c>`` element for ``value`` using inline strings.
+
+    Inline strings keep the sharedStrings table of the package untouched.
+    Strings starting with ``=`` are written as formulas, like openpyxl does.
+    """
+    s_attr = f' s="{style}"' if style is not None else ""
+    if value is None:
+        return f'<c r="{ref}"{s_attr}/>'
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{s_attr} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        # NaN и бесконечность Excel не примет; такую книгу сохраняет openpyxl.
+        if not math.isfinite(value):
+            raise PatchError(f"Нечисловое значение {value!r} для {ref}")
+        return f'<c r="{ref}"{s_attr}><v>{value if isinstance(value, Decimal) else repr(value)}</v></c>'
+    if isinstance(value, _DATE_TYPES):
+        # Без формата даты в styles.xml Excel покажет число.
+        if style is None:
+            raise PatchError(f"Для даты в {ref} нужен стиль с форматом даты")
+        return f'<c r="{ref}"{s_attr}><v>{to_excel(value)!r}</v></c>'
+    text = str(value)
+    if ILLEGAL_CHARACTERS_RE.search(text):
+        raise PatchError(f"Недопустимые символы в значении для {ref}")
+    if text.startswith("=") and len(text) > 1:
+        return f'<c r="{ref}"{s_attr}><f>{escape(text[1:])}</f></c>'
+    return f'<c r="{ref}"{s_attr} t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+class Restyle:
+    """Patch value that keeps a cell's content and only changes its style.
+
+    ``style(index)`` receives the cell's current ``cellXfs`` index (``None``
+    for an unstyled or missing cell) and returns the index to use instead.
+    """
+
+    __slots__ = ("style",)
+
+    def __init__(self, style: Callable[[int | None], int]):
+        self.style = style
+
+    def apply(self, ref: str, cell_xml: str | None) -> str:
+        if cell_xml is None:
+            return render_cell(ref, None, str(self.style(None)))
+        tag_end = cell_xml.index(">") + 1
+        self_closing = cell_xml[tag_end - 2] == "/"
+        tag = cell_xml[:tag_end - (2 if self_closing else 1)].rstrip()
+        own = _CELL_STYLE_RE.search(tag)
+        style = self.style(int(own.group(1)) if own else None)
+        tag = _CELL_STYLE_RE.sub(f' s="{style}"', tag, count=1) if own else f'{tag} s="{style}"'
+        return tag + ("/>" if self_closing else ">") + cell_xml[tag_end:]
+
+
+class ColumnLookup(Mapping):
+    """Read-only ``{row: {col: item}}`` view of :data:`ColumnPatches`.
+
+    Row dicts are built on access, so :func:`rewrite_sheet` can take
+    per-column edits without a per-row copy of them.
+    """
+
+    def __init__(self, columns: ColumnPatches):
+        self.columns = {col: rows for col, rows in columns.items() if rows}
+        self._rows = None
+
+    def __getitem__(self, row):
+        cells = {col: rows[row] for col, rows in self.columns.items() if row in rows}
+        if not cells:
+            raise KeyError(row)
+        return cells
+
+    def __contains__(self, row):
+        return any(row in rows for rows in self.columns.values())
+
+    def __iter__(self):
+        if self._rows is None:
+            self._rows = sorted(set().union(*self.columns.values()))
+        return iter(self._rows)
+
+    def __len__(self):
+        return sum(1 for _row in self)
+
+    def __bool__(self):
+        return bool(self.columns)
+
+    def bounds(self) -> Tuple[int, int]:
+        """``(max_row, max_col)`` of the edits."""
+        return max(max(rows) for rows in self.columns.values()), max(self.columns)
+
+
+def _render(ref: str, value, style, date_style: DateStyle | None) -> str:
+    if isinstance(value, Restyle):
+        return value.apply(ref, None)
+    if date_style is not None and isinstance(value, _DATE_TYPES):
+        style = date_style(style, value)
+    return render_cell(ref, value, style)
+
+
+def _patch_row(row_xml: str, row_number: int, cells: Dict[int, object], styles: Dict[int, str] | None,
+               date_style: DateStyle | None = None):
+    """Return ``(new_row_xml, removed_formula)`` with ``cells`` applied."""
+    if row_xml.endswith("/>") and not row_xml.endswith("</row>"):
+        start_tag, inner = row_xml[:-2] + ">", ""
+    else:
+        tag_end = row_xml.index(">") + 1
+        start_tag, inner = row_xml[:tag_end], row_xml[tag_end:-len("</row>")]
+    start_tag = _SPANS_RE.sub("", start_tag)
+
+    existing = []
+    column = 0
+    for match in _CELL_RE.finditer(inner):
+        cell_xml = match.group(0)
+        ref = _CELL_REF_RE.search(cell_xml[:cell_xml.find(">") + 1])
+        column = column_index_from_string(ref.group(1)) if ref else column + 1
+        existing.append((column, cell_xml))
+
+    removed_formula = False
+    result = []
+    pending = sorted(cells.items())
+    i = 0
+    for column, cell_xml in existing:
+        while i < len(pending) and pending[i][0] < column:
+            col, value = pending[i]
+            result.append(_render(f"{get_column_letter(col)}{row_number}", value, (styles or {}).get(col), date_style))
+            i += 1
+        if i < len(pending) and pending[i][0] == column:
+            col, value = pending[i]
+            if isinstance(value, Restyle):
+                result.append(value.apply(f"{get_column_letter(col)}{row_number}", cell_xml))
+                i += 1
+                continue
+            if "<f" in cell_xml:
+                if 'ref="' in cell_xml.split("</f>")[0] or "<f t=\"array\"" in cell_xml:
+                    raise PatchError(f"Ячейка {get_column_letter(col)}{row_number} — главная ячейка общей формулы")
+                removed_formula = True
+            style = (styles or {}).get(col)
+            if style is None:
+                own = _CELL_STYLE_RE.search(cell_xml[:cell_xml.find(">") + 1])
+                style = own.group(1) if own else None
+            result.append(_render(f"{get_column_letter(col)}{row_number}", value, style, date_style))
+            i += 1
+        else:
+            result.append(cell_xml)
+    for col, value in pending[i:]:
+        result.append(_render(f"{get_column_letter(col)}{row_number}", value, (styles or {}).get(col), date_style))
+    return start_tag + "".join(result) + "</row>", removed_formula
+
+
+def _new_row(row_number: int, cells: Dict[int, object], styles: Dict[int, str] | None,
+             date_style: DateStyle | None = None) -> str:
+    return _patch_row(f'<row r="{row_number}"/>', row_number, cells, styles, date_style)[0]
+
+
+def _patch_dimension(head: str, patches: RowPatches) -> str:
+    match = _DIMENSION_RE.search(head)
+    if not match or not patches:
+        return head
+    if isinstance(patches, ColumnLookup):
+        max_row, max_col = patches.bounds()
+    else:
+        max_row = max(patches)
+        max_col = max(max(cols) for cols in patches.values() if cols) if any(patches.values()) else 1
+    refs = _REF_RE.findall(match.group(2))
+    if not refs:
+        return head
+    first_col, first_row = refs[0]
+    last_col, last_row = refs[-1]
+    new_last_col = max(column_index_from_string(last_col), max_col)
+    new_last_row = max(int(last_row), max_row)
+    new_ref = f"{first_col}{first_row}:{get_column_letter(new_last_col)}{new_last_row}"
+    return head[:match.start(2)] + new_ref + head[match.end(2):]
+
+
+def rewrite_sheet(src, dst, patches: RowPatches, styles: Dict[int, Dict[int, str]] | None = None,
+                  date_style: DateStyle | None = None) -> bool:
+    """Stream a worksheet part from ``src`` to ``dst`` applying ``patches``.
+
+    Untouched rows are copied as text without being parsed. Memory use is
+    bounded by the chunk size plus the patches themselves.
+
+    Args:
+        src: Binary stream with the original worksheet XML.
+        dst: Binary stream for the rewritten XML.
+        patches: ``{row: {col: value}}`` or a :class:`ColumnLookup`.
+        styles: Optional ``{row: {col: xf index}}`` (or a
+            :class:`ColumnLookup`); cells without an entry keep the style
+            index they already had.
+        date_style: Optional ``date_style(style, value)`` returning the style
+            index to use for a date or time ``value`` in a cell styled
+            ``style``; without it a date needs a date-formatted style.
+
+    Returns:
+        ``True`` if a formula was replaced (the calc chain must be dropped).
+    """
+    reader = _Reader(src)
+    write = lambda text: dst.write(text.encode("utf-8"))  # noqa: E731
+    styles = styles or {}
+    pending = sorted(patches)
+    next_new = 0
+    removed_formula = False
+
+    def flush_until(limit):
+        nonlocal next_new
+        while next_new < len(pending) and (limit is None or pending[next_new] < limit):
+            row_number = pending[next_new]
+            write(_new_row(row_number, patches[row_number], styles.get(row_number), date_style))
+            next_new += 1
+
+    idx = reader.find("<sheetData")
+    if idx < 0:
+        raise PatchError("В листе нет элемента sheetData")
+    write(_patch_dimension(reader.take(idx), patches))
+    tag_end = reader.find(">")
+    tag = reader.take(tag_end + 1)
+    if tag.endswith("/>"):
+        write(tag[:-2] + ">")
+        flush_until(None)
+        write("</sheetData>")
+    else:
+        write(tag)
+        row_number = 0
+        while True:
+            lt = reader.find("<")
+            if lt < 0:
+                raise PatchError("Неожиданный конец листа")
+            write(reader.take(lt))
+            if reader.startswith("</sheetData"):
+                flush_until(None)
+                break
+            if not reader.startswith("<row"):
+                raise PatchError("Неожиданный элемент в sheetData")
+            start_end = reader.find(">")
+            if reader.buf[start_end - 1] == "/":
+                row_xml = reader.take(start_end + 1)
+            else:
+                close = reader.find("</row>")
+                if close < 0:
+                    raise PatchError("Незакрытая строка в листе")
+                row_xml = reader.take(close + len("</row>"))
+            number = _ROW_NUMBER_RE.search(row_xml[:row_xml.find(">") + 1])
+            row_number = int(number.group(1)) if number else row_number + 1
+            flush_until(row_number)
+            if row_number in patches:
+                if next_new < len(pending) and pending[next_new] == row_number:
+                    next_new += 1
+                row_xml, removed = _patch_row(row_xml, row_number, patches[row_number], styles.get(row_number),
+                                              date_style)
+                removed_formula = removed_formula or removed
+            write(row_xml)
+    for text in reader.rest():
+        write(text)
+    return removed_formula
+
+
+def write_patched_workbook(
+    src_path: str,
+    dst_path: str,
+    patches: Dict[str, RowPatches],
+    styles: Dict[str, Dict[int, Dict[int, str]]] | None = None,
+    replace_parts: Dict[str, bytes] | None = None,
+    appender: StyleAppender | None = None,
+) -> str:
+    """Copy ``src_path`` to ``dst_path`` rewriting only the patched sheets.
+
+    Unchanged members are streamed across without being parsed, and every
+    member keeps its position in the package, so ``[Content_Types].xml``
+    stays the first entry.
+
+    Args:
+        src_path: Original workbook.
+        dst_path: Output path; written through a temporary file and renamed.
+        patches: ``{sheet name: {row: {col: value}}}``; a sheet's patches
+            may also be a :class:`ColumnLookup`.
+        styles: Optional ``{sheet name: {row: {col: xf index}}}``, same
+            forms as ``patches``.
+        replace_parts: Optional ``{part name: new bytes}`` for other members
+            that changed, e.g. ``xl/styles.xml`` from
+            :class:`core.xlsx_styles.StyleAppender`.
+        appender: Optional :class:`~core.xlsx_styles.StyleAppender` of the
+            package. Dates written into cells without a date format get a
+            date-formatted copy of the cell's style from it, and its
+            ``styles.xml`` is written when entries were added.
+
+    Raises:
+        PatchError: if a patched sheet cannot be rewritten safely; the
+            caller should fall back to a full openpyxl save.
+    """
+    styles = styles or {}
+    replace_parts = dict(replace_parts or {})
+    date_style = None
+    if appender is not None:
+        def date_style(style, value):
+            return str(appender.date_xf(int(style) if style is not None else None, value))
+    tmp_path = f"{dst_path}.tmp"
+    try:
+        with zipfile.ZipFile(src_path) as src:
+            parts = sheet_parts(src)
+            missing = [name for name in patches if name not in parts]
+            if missing:
+                raise PatchError(f"Листы не найдены в пакете: {', '.join(missing)}")
+            targets = {parts[name]: name for name, rows in patches.items() if rows}
+            with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as dst, ExitStack() as stack:
+                # Листы переписываются до записи пакета: от того, заменены ли формулы,
+                # зависит [Content_Types].xml, который в пакете идёт первым.
+                rewritten = {}
+                removed_formula = False
+                for info in src.infolist():
+                    if info.filename in targets:
+                        name = targets[info.filename]
+                        buffer = stack.enter_context(tempfile.SpooledTemporaryFile(max_size=_SPOOL_SIZE))
+                        with src.open(info) as fin:
+                            removed = rewrite_sheet(fin, buffer, patches[name], styles.get(name), date_style)
+                        removed_formula = removed_formula or removed
+                        rewritten[info.filename] = buffer
+                if appender is not None and appender.changed:
+                    replace_parts[STYLES_PART] = appender.to_bytes()
+                # calcChain ссылается на заменённые формулы — Excel пересоберёт его сам.
+                drop_calc_chain = removed_formula and "xl/calcChain.xml" in src.NameToInfo
+                for info in src.infolist():
+                    if info.filename in rewritten:
+                        buffer = rewritten[info.filename]
+                        buffer.seek(0)
+                        with dst.open(_output_info(info), "w") as fout:
+                            shutil.copyfileobj(buffer, fout, 1024 * 1024)
+                        continue
+                    if info.filename in replace_parts:
+                        dst.writestr(_output_info(info), replace_parts[info.filename])
+                        continue
+                    if drop_calc_chain and info.filename == "xl/calcChain.xml":
+                        continue
+                    if drop_calc_chain and info.filename in ("[Content_Types].xml", WORKBOOK_RELS_PART):
+                        dst.writestr(_output_info(info), strip_calc_chain(info.filename, src.read(info)))
+                        continue
+                    copy_member(src, dst, info, info.compress_type)
+        os.replace(tmp_path, dst_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return dst_path
+
+
+def save_column_edits(src_path: str, dst_path: str, edits, cell_styles=None) -> str:
+    """Write ``{sheet: {col: {row: value}}}`` edits of ``src_path`` to ``dst_path``.
+
+    ``cell_styles`` has the same shape with
+    :class:`~core.source_reader.CellStyle` values; missing formats are
+    appended to ``styles.xml``. Dates keep the style of their cell and get
+    a date number format when that style has none. Raises
+    :class:`PatchError` when the package cannot be patched.
+    """
+    styles = None
+    with zipfile.ZipFile(src_path) as archive:
+        appender = style_appender(archive)
+    if cell_styles and any(any(rows.values()) for rows in cell_styles.values()):
+        styles = {sheet: ColumnLookup(columns) for sheet, columns in column_xf_ids(appender, cell_styles).items()}
+    patches = {sheet: ColumnLookup(columns) for sheet, columns in edits.items()}
+    return write_patched_workbook(src_path, dst_path, patches, styles, appender=appender)
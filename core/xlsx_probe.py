@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""Read sheet names and header rows without building an openpyxl workbook.
+
+Opening a workbook with openpyxl, even in read-only mode, parses the whole
+shared string table and the stylesheet. The mapping pages only need the
+sheet names and one header row per sheet, so :func:`probe_workbook` reads
+``xl/workbook.xml``, streams each requested worksheet up to its header row
+and then resolves just the shared strings that those cells reference.
+"""
+import zipfile
+from collections import namedtuple
+from typing import Dict, List
+from xml.etree import ElementTree
+
+from openpyxl.utils import column_index_from_string
+
+from core.xlsx_package import NS_MAIN, WORKBOOK_PART, sheet_parts
+
+WorkbookProbe = namedtuple("WorkbookProbe", ["sheet_names", "headers"])
+
+_SHARED_STRINGS_PART = "xl/sharedStrings.xml"
+_TAG_ROW = f"{{{NS_MAIN}}}row"
+_TAG_CELL = f"{{{NS_MAIN}}}c"
+_TAG_VALUE = f"{{{NS_MAIN}}}v"
+_TAG_FORMULA = f"{{{NS_MAIN}}}f"
+_TAG_INLINE = f"{{{NS_MAIN}}}is"
+_TAG_TEXT = f"{{{NS_MAIN}}}t"
+_TAG_PHONETIC = f"{{{NS_MAIN}}}rPh"
+_TAG_DIMENSION = f"{{{NS_MAIN}}}dimension"
+_TAG_SHARED_ITEM = f"{{{NS_MAIN}}}si"
+
+
+class _SharedRef:
+    """Placeholder for a shared string index, resolved after all sheets."""
+
+    __slots__ = ("index",)
+
+    def __init__(self, index: int):
+        self.index = index
+
+
+def read_sheet_names(archive) -> List[str]:
+    """Return every sheet name from ``xl/workbook.xml``, in workbook order."""
+    workbook = ElementTree.fromstring(archive.read(WORKBOOK_PART))
+    sheets = workbook.find(f"{{{NS_MAIN}}}sheets")
+    return [sheet.get("name") for sheet in (sheets if sheets is not None else [])]
+
+
+def _text(element) -> str:
+    """Concatenate the ``<t>`` runs of a string item, skipping phonetic hints."""
+    parts = []
+
+    def walk(node):
+        for child in node:
+            if child.tag == _TAG_PHONETIC:
+                continue
+            if child.tag == _TAG_TEXT:
+                parts.append(child.text or "")
+            else:
+                walk(child)
+
+    walk(element)
+    return "".join(parts)
+
+
+def _cell_value(cell):
+    data_type = cell.get("t", "n")
+    if data_type == "inlineStr":
+        inline = cell.find(_TAG_INLINE)
+        return _text(inline) if inline is not None else None
+    formula = cell.find(_TAG_FORMULA)
+    if formula is not None and formula.text:
+        # Как openpyxl без data_only: вместо значения возвращается формула.
+        return "=" + formula.text
+    value = cell.find(_TAG_VALUE)
+    if value is None or value.text is None:
+        return None
+    text = value.text
+    if data_type == "s":
+        return _SharedRef(int(text))
+    if data_type == "b":
+        return text == "1"
+    if data_type in ("str", "e", "d"):
+        return text
+    if "." in text or "E" in text or "e" in text:
+        return float(text)
+    return int(text)
+
+
+def _read_row(stream, row_number: int) -> List[object]:
+    """Return the values of ``row_number`` padded to the sheet's used width."""
+    max_col = 0
+    values: Dict[int, object] = {}
+    column = 0
+    current = 0
+    for _event, element in ElementTree.iterparse(stream, events=("end",)):
+        if element.tag == _TAG_DIMENSION:
+            ref = element.get("ref", "")
+            last = ref.split(":")[-1].rstrip("0123456789")
+            if last:
+                max_col = column_index_from_string(last)
+        elif element.tag == _TAG_ROW:
+            current = int(element.get("r", current + 1))
+            if current == row_number:
+                for cell in element.iter(_TAG_CELL):
+                    ref = cell.get("r")
+                    column = column_index_from_string(ref.rstrip("0123456789")) if ref else column + 1
+                    values[column] = _cell_value(cell)
+            element.clear()
+            if current >= row_number:
+                break
+    width = max([max_col, *values]) if values or max_col else 0
+    return [values.get(col) for col in range(1, width + 1)]
+
+
+def _resolve_shared_strings(archive, refs: List[_SharedRef]) -> Dict[int, str]:
+    """Stream ``sharedStrings.xml`` and keep only the indices in ``refs``."""
+    wanted = {ref.index for ref in refs}
+    if not wanted or _SHARED_STRINGS_PART not in archive.NameToInfo:
+        return {}
+    last = max(wanted)
+    strings: Dict[int, str] = {}
+    index = 0
+    with archive.open(_SHARED_STRINGS_PART) as stream:
+        for _event, element in ElementTree.iterparse(stream, events=("end",)):
+            if element.tag != _TAG_SHARED_ITEM:
+                continue
+            if index in wanted:
+                strings[index] = _text(element)
+            element.clear()
+            if index >= last:
+                break
+            index += 1
+    return strings
+
+
+def probe_workbook(path: str, header_rows: Dict[str, int] | None = None) -> WorkbookProbe:
+    """Return sheet names and header rows of ``path`` with one archive open.
+
+    Args:
+        path: ``.xlsx``/``.xlsm`` workbook.
+        header_rows: ``{sheet name: header row index}``; the index is
+            0-based like ``sheet_to_header_row`` in the GUI.
+
+    Returns:
+        ``WorkbookProbe(sheet_names, headers)`` where ``headers`` maps each
+        requested sheet to its header values, padded with ``None`` to the
+        used width of the sheet like openpyxl read-only rows.
+
+    Raises:
+        KeyError: if a requested sheet does not exist.
+    """
+    header_rows = header_rows or {}
+    with zipfile.ZipFile(path) as archive:
+        names = read_sheet_names(archive)
+        parts = sheet_parts(archive) if header_rows else {}
+        headers: Dict[str, list] = {}
+        for sheet_name, header_row in header_rows.items():
+            if sheet_name not in parts:
+                raise KeyError(f"Worksheet {sheet_name} does not exist.")
+            with archive.open(parts[sheet_name]) as stream:
+                headers[sheet_name] = _read_row(stream, header_row + 1)
+        refs = [value for row in headers.values() for value in row if isinstance(value, _SharedRef)]
+        strings = _resolve_shared_strings(archive, refs)
+    for sheet_name, row in headers.items():
+        headers[sheet_name] = [
+            strings.get(value.index) if isinstance(value, _SharedRef) else value for value in row
+        ]
+    return WorkbookProbe(names, headers)
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""Append cell formats to an existing ``xl/styles.xml``.
+
+When edited cells need a style that the target workbook does not have yet,
+the new font, fill, border, number format and ``cellXfs`` entry are added
+at the end of their tables. Existing entries are never touched, so every
+style index already used by the workbook stays valid and only
+``styles.xml`` itself has to be rewritten. Entries that are already present
+verbatim (for example, added by an earlier incremental run) are reused
+instead of being appended again.
+"""
+import re
+from typing import Dict, Tuple
+from xml.sax.saxutils import quoteattr
+
+from openpyxl.cell.cell import TIME_FORMATS
+from openpyxl.styles.numbers import BUILTIN_FORMATS, BUILTIN_FORMATS_REVERSE, is_date_format
+from openpyxl.xml.functions import tostring
+
+from core.source_reader import CellStyle
+from core.xlsx_package import PatchError
+
+STYLES_PART = "xl/styles.xml"
+
+# Порядок разделов в styles.xml задан схемой; numFmts идёт первым.
+_SECTIONS = {
+    "numFmts": "numFmt",
+    "fonts": "font",
+    "fills": "fill",
+    "borders": "border",
+    "cellXfs": "xf",
+}
+_NUM_FMT_RE = re.compile(r'<numFmt\b[^>]*?numFmtId="(\d+)"[^>]*?formatCode=("[^"]*"|\'[^\']*\')')
+_COUNT_RE = re.compile(r'\scount="\d+"')
+_NUM_FMT_ID_RE = re.compile(r'\snumFmtId="(\d+)"')
+
+
+def _child_re(child: str):
+    return re.compile(rf'<{child}(?=[\s>/])[^>]*?/>|<{child}(?=[\s>/])[^>]*>.*?</{child}>', re.S)
+
+
+def _section_span(xml: str, section: str):
+    """Return ``(start, inner_start, inner_end, end)`` of ``<section>`` or ``None``."""
+    match = re.search(rf'<{section}\b[^>]*?(/?)>', xml)
+    if match is None:
+        return None
+    if match.group(1):
+        return match.start(), match.end(), match.end(), match.end()
+    close = xml.find(f"</{section}>", match.end())
+    if close < 0:
+        raise PatchError(f"Повреждён раздел {section} в styles.xml")
+    return match.start(), match.end(), close, close + len(f"</{section}>")
+
+
+def _unescape_attr(value: str) -> str:
+    value = value[1:-1]
+    for entity, char in (("&quot;", '"'), ("&apos;", "'"), ("&lt;", "<"), ("&gt;", ">"), ("&amp;", "&")):
+        value = value.replace(entity, char)
+    return value
+
+
+class StyleAppender:
+    """Collect new cell formats for one target ``styles.xml``.
+
+    :meth:`xf_index` returns the ``cellXfs`` index for a :class:`CellStyle`,
+    reusing the entry created for an equal style earlier in the run.
+    :meth:`derive_xf` and :meth:`date_xf` return a copy of an existing
+    ``cellXfs`` entry with another number format or fill.
+    """
+
+    def __init__(self, styles_xml: bytes):
+        self.xml = styles_xml.decode("utf-8")
+        if "<styleSheet" not in self.xml:
+            raise PatchError("styles.xml без элемента styleSheet")
+        self.counts: Dict[str, int] = {}
+        self.added: Dict[str, list] = {section: [] for section in _SECTIONS}
+        # Разметка записи -> индекс первой такой же записи в исходном styles.xml.
+        self.existing: Dict[str, Dict[str, int]] = {section: {} for section in _SECTIONS}
+        # Разметка исходных записей cellXfs по индексу; None, если раздел разобрать не удалось.
+        self.xf_entries = None
+        for section, child in _SECTIONS.items():
+            span = _section_span(self.xml, section)
+            if span is None:
+                if section != "numFmts":
+                    raise PatchError(f"В styles.xml нет раздела {section}")
+                self.counts[section] = 0
+                continue
+            inner = self.xml[span[1]:span[2]]
+            self.counts[section] = len(re.findall(rf'<{child}[\s>/]', inner))
+            entries = _child_re(child).findall(inner)
+            if len(entries) == self.counts[section]:
+                for index, entry in enumerate(entries):
+                    self.existing[section].setdefault(entry, index)
+                if section == "cellXfs":
+                    self.xf_entries = entries
+        self.num_fmt_ids: Dict[str, int] = {}
+        self.next_num_fmt_id = 164
+        span = _section_span(self.xml, "numFmts")
+        if span is not None:
+            for fmt_id, code in _NUM_FMT_RE.findall(self.xml[span[1]:span[2]]):
+                self.num_fmt_ids[_unescape_attr(code)] = int(fmt_id)
+                self.next_num_fmt_id = max(self.next_num_fmt_id, int(fmt_id) + 1)
+        self._components: Dict[Tuple[str, object], int] = {}
+        self._xfs: Dict[CellStyle, int] = {}
+        # id(style) -> (style, index): хэш CellStyle считается один раз на объект, а не на ячейку.
+        self._xfs_by_identity: Dict[int, Tuple[CellStyle, int]] = {}
+        self._date_xfs: Dict[Tuple[int, type], int] = {}
+
+    @property
+    def changed(self) -> bool:
+        return any(self.added.values())
+
+    def _entry(self, section: str, markup: str) -> int:
+        index = self.existing[section].get(markup)
+        if index is None:
+            index = self.counts[section] + len(self.added[section])
+            self.added[section].append(markup)
+            self.existing[section][markup] = index
+        return index
+
+    def _component(self, section: str, obj) -> int:
+        key = (section, obj)
+        index = self._components.get(key)
+        if index is None:
+            index = self._entry(section, tostring(obj.to_tree()).decode("utf-8"))
+            self._components[key] = index
+        return index
+
+    def _num_fmt_id(self, number_format: str) -> int:
+        builtin = BUILTIN_FORMATS_REVERSE.get(number_format)
+        if builtin is not None:
+            return builtin
+        fmt_id = self.num_fmt_ids.get(number_format)
+        if fmt_id is None:
+            fmt_id = self.next_num_fmt_id
+            self.next_num_fmt_id += 1
+            self.num_fmt_ids[number_format] = fmt_id
+            self.added["numFmts"].append(f'<numFmt numFmtId="{fmt_id}" formatCode={quoteattr(number_format)}/>')
+        return fmt_id
+
+    def xf_index(self, style: CellStyle) -> int:
+        """Return the ``cellXfs`` index that renders cells with ``style``."""
+        entry = self._xfs_by_identity.get(id(style))
+        if entry is not None and entry[0] is style:
+            return entry[1]
+        index = self._xfs.get(style)
+        if index is not None:
+            self._xfs_by_identity[id(style)] = (style, index)
+            return index
+        num_fmt_id = self._num_fmt_id(style.number_format or "General")
+        font_id = self._component("fonts", style.font)
+        fill_id = self._component("fills", style.fill)
+        border_id = self._component("borders", style.border)
+        alignment = tostring(style.alignment.to_tree()).decode("utf-8")
+        protection = tostring(style.protection.to_tree()).decode("utf-8")
+        index = self._entry(
+            "cellXfs",
+            f'<xf numFmtId="{num_fmt_id}" fontId="{font_id}" fillId="{fill_id}" borderId="{border_id}" xfId="0"'
+            f' applyNumberFormat="1" applyFont="1" applyFill="1" applyBorder="1" applyAlignment="1"'
+            f' applyProtection="1">{alignment}{protection}</xf>',
+        )
+        self._xfs[style] = index
+        self._xfs_by_identity[id(style)] = (style, index)
+        return index
+
+    def _xf_markup(self, index: int) -> str:
+        if index >= self.counts["cellXfs"]:
+            return self.added["cellXfs"][index - self.counts["cellXfs"]]
+        if self.xf_entries is None or index < 0:
+            raise PatchError("Не удалось разобрать раздел cellXfs в styles.xml")
+        return self.xf_entries[index]
+
+    def number_format(self, index: int) -> str:
+        """Return the number format code of ``cellXfs`` entry ``index``."""
+        match = _NUM_FMT_ID_RE.search(self._xf_markup(index).split(">", 1)[0])
+        fmt_id = int(match.group(1)) if match else 0
+        if fmt_id in BUILTIN_FORMATS:
+            return BUILTIN_FORMATS[fmt_id]
+        for code, custom_id in self.num_fmt_ids.items():
+            if custom_id == fmt_id:
+                return code
+        return "General"
+
+    def derive_xf(self, index: int, number_format: str | None = None, fill=None) -> int:
+        """Return a ``cellXfs`` entry equal to ``index`` but with another number format or fill."""
+        markup = self._xf_markup(index)
+        tag_end = markup.index(">") + 1
+        self_closing = markup[tag_end - 2] == "/"
+        tag = markup[:tag_end - (2 if self_closing else 1)].rstrip()
+        attributes = {}
+        if number_format is not None:
+            attributes.update(numFmtId=self._num_fmt_id(number_format), applyNumberFormat=1)
+        if fill is not None:
+            attributes.update(fillId=self._component("fills", fill), applyFill=1)
+        for name, value in attributes.items():
+            tag, found = re.subn(rf'\s{name}="[^"]*"', f' {name}="{value}"', tag, count=1)
+            if not found:
+                tag += f' {name}="{value}"'
+        return self._entry("cellXfs", tag + ("/>" if self_closing else ">") + markup[tag_end:])
+
+    def date_xf(self, index: int | None, value) -> int:
+        """Return the ``cellXfs`` index that shows the date/time ``value`` in a cell styled ``index``.
+
+        ``index`` itself is kept when it already has a date format; otherwise
+        a copy with openpyxl's default format for the value's type is used.
+        """
+        index = index or 0
+        key = (index, type(value))
+        result = self._date_xfs.get(key)
+        if result is None:
+            if is_date_format(self.number_format(index)):
+                result = index
+            else:
+                result = self.derive_xf(index, number_format=TIME_FORMATS[type(value)])
+            self._date_xfs[key] = result
+        return result
+
+    def to_bytes(self) -> bytes:
+        """Return ``styles.xml`` with the collected entries appended."""
+        xml = self.xml
+        # Разделы правятся с конца, чтобы найденные позиции не сдвигались.
+        for section in reversed(list(_SECTIONS)):
+            added = self.added[section]
+            if not added:
+                continue
+            total = self.counts[section] + len(added)
+            span = _section_span(xml, section)
+            if span is None:
+                root = re.search(r'<styleSheet\b[^>]*>', xml)
+                insert = f'<{section} count="{total}">{"".join(added)}</{section}>'
+                xml = xml[:root.end()] + insert + xml[root.end():]
+                continue
+            start, inner_start, inner_end, end = span
+            tag = xml[start:inner_start]
+            tag = tag[:-2].rstrip() + ">" if tag.endswith("/>") else tag
+            if _COUNT_RE.search(tag):
+                tag = _COUNT_RE.sub(f' count="{total}"', tag, count=1)
+            else:
+                tag = tag[:-1] + f' count="{total}">'
+            xml = xml[:start] + tag + xml[inner_start:inner_end] + "".join(added) + f"</{section}>" + xml[end:]
+        return xml.encode("utf-8")
+
+
+def column_xf_ids(appender: StyleAppender, column_styles: Dict[str, Dict[int, Dict[int, CellStyle]]]):
+    """Map ``{sheet: {col: {row: CellStyle}}}`` to the same shape of ``cellXfs`` indexes."""
+    return {
+        sheet: {
+            col: {row: appender.xf_index(style) for row, style in rows.items()}
+            for col, rows in columns.items()
+        }
+        for sheet, columns in column_styles.items()
+    }
+
+
+def style_appender(archive) -> StyleAppender:
+    """Return a :class:`StyleAppender` for the ``styles.xml`` of ``archive``."""
+    if STYLES_PART not in archive.NameToInfo:
+        raise PatchError("В пакете нет xl/styles.xml")
+    return StyleAppender(archive.read(STYLES_PART))
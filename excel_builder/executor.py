@@ -8,16 +8,23 @@ import pandas as pd
 from openpyxl import load_workbook
 from openpyxl.utils import column_index_from_string
 
+from core.publisher import Publisher
 from utils.logger import logger
 
 LogFn = Callable[[str], None]
 
 
 class ExcelBuilderExecutor:
-    """Applies planned operations and saves Excel files."""
+    """Applies planned operations and saves Excel files.
 
-    def __init__(self, log_callback: LogFn | None = None):
+    With a ``publisher`` every file is saved to a local temporary path and
+    moved to the output folder in the background; :meth:`process_file`
+    then returns the upload future.
+    """
+
+    def __init__(self, log_callback: LogFn | None = None, publisher: Publisher | None = None):
         self.log_callback = log_callback or logger.info
+        self.publisher = publisher
 
     def read_sheets(self, path: str, preview: bool = False) -> Dict[str, pd.DataFrame]:
         try:
@@ -33,9 +40,22 @@ class ExcelBuilderExecutor:
     def process_file(self, file_info: Dict[str, str], output_root: str, operations: List[Dict]):
         ext = os.path.splitext(file_info["path"])[1].lower()
         if ext in (".xlsx", ".xlsm", ".xltx", ".xltm"):
-            self._process_with_openpyxl(file_info, output_root, operations)
-        else:
-            self._process_with_pandas(file_info, output_root, operations)
+            return self._process_with_openpyxl(file_info, output_root, operations)
+        return self._process_with_pandas(file_info, output_root, operations)
+
+    def _save(self, dest_path: str, writer: Callable[[str], None]):
+        """Run ``writer(path)`` for ``dest_path``, through the publisher if set."""
+        if self.publisher is None:
+            writer(dest_path)
+            return None
+        local_path = self.publisher.local_path(dest_path)
+        try:
+            writer(local_path)
+        except BaseException:
+            if os.path.exists(local_path):
+                os.remove(local_path)
+            raise
+        return self.publisher.publish(local_path, dest_path)
 
     def _process_with_pandas(self, file_info: Dict[str, str], output_root: str, operations: List[Dict]):
         sheets = self.read_sheets(file_info["path"])
@@ -45,17 +65,20 @@ class ExcelBuilderExecutor:
         os.makedirs(os.path.dirname(dest_path), exist_ok=True)
         if dest_path.lower().endswith(".xls"):
             dest_path = dest_path + "x"  # normalize to xlsx for writer
-        with pd.ExcelWriter(dest_path, engine="xlsxwriter") as writer:
-            for name, df in sheets.items():
-                df.to_excel(writer, sheet_name=name, index=False, header=False)
+
+        def write(path: str):
+            with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
+                for name, df in sheets.items():
+                    df.to_excel(writer, sheet_name=name, index=False, header=False)
+
+        return self._save(dest_path, write)
 
     def _process_with_openpyxl(self, file_info: Dict[str, str], output_root: str, operations: List[Dict]):
         try:
             workbook = load_workbook(file_info["path"])
         except Exception as exc:  # noqa: BLE001
             self._log_line(f"Не удалось открыть {file_info['path']} с сохранением формата: {exc}")
-            self._process_with_pandas(file_info, output_root, operations)
-            return
+            return self._process_with_pandas(file_info, output_root, operations)
 
         rename_ops = [op for op in operations if op["type"] == "rename_sheet" and self._op_matches(op, file_info["path"])]
 
@@ -86,7 +109,7 @@ class ExcelBuilderExecutor:
         os.makedirs(os.path.dirname(dest_path), exist_ok=True)
         if dest_path.lower().endswith(".xls"):
             dest_path = dest_path + "x"
-        workbook.save(dest_path)
+        return self._save(dest_path, workbook.save)
 
     # region operation handling
     def _apply_operations(self, sheets: Dict[str, pd.DataFrame], operations: List[Dict], file_path: str):
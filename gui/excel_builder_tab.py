@@ -33,7 +33,8 @@ from PySide6.QtWidgets import (
 from utils.i18n import tr
 from utils.i18n import i18n
 from utils.logger import logger
-from core.drag_drop import DragDropLineEdit
+from gui.drag_drop import DragDropLineEdit
+from core.publisher import PublishError, default_publisher
 from excel_builder import ExcelBuilderExecutor, ExcelFilesManager
 from .style_system import set_button_variant
 
@@ -42,7 +43,7 @@ class ExcelBuilderTab(QWidget):
     def __init__(self):
         super().__init__()
         self.manager = ExcelFilesManager()
-        self.executor = ExcelBuilderExecutor(log_callback=self._log_line)
+        self.executor = ExcelBuilderExecutor(log_callback=self._log_line, publisher=default_publisher())
         self.operations: List[Dict] = []
         self._last_preview_df = pd.DataFrame()
         self._output_path: str | None = None
@@ -594,20 +595,40 @@ class ExcelBuilderTab(QWidget):
         os.makedirs(output_root, exist_ok=True)
         self._update_output_path_link(output_root)
         logger.info(f"Output root: {output_root}")
+        uploads = []
         for idx, f in enumerate(self.manager.files, start=1):
             progress.setValue(idx - 1)
             progress.setLabelText(self._display_name(f["path"]))
             QApplication.processEvents()
             try:
-                self.executor.process_file(f, output_root, target_ops)
-                self._log_line(f"✓ {f['path']}")
+                upload = self.executor.process_file(f, output_root, target_ops)
             except Exception as exc:  # noqa: BLE001
                 self._log_line(f"✗ {f['path']}: {exc}")
+            else:
+                uploads.append((f, upload))
+            self._report_finished_uploads(uploads)
             if progress.wasCanceled():
                 break
+        # Готово — только когда все файлы легли в папку результата.
+        self._report_finished_uploads(uploads, wait=True)
         progress.setValue(len(self.manager.files))
         QMessageBox.information(self, tr("Готово"), tr("Обработка завершена"))
 
+    def _report_finished_uploads(self, uploads, wait: bool = False):
+        """Log ✓/✗ for files whose upload is done and drop them from ``uploads``."""
+        for item in list(uploads):
+            f, upload = item
+            if upload is not None and not wait and not upload.done():
+                continue
+            uploads.remove(item)
+            try:
+                if upload is not None:
+                    upload.result()
+            except PublishError as exc:
+                self._log_line(f"✗ {f['path']}: {exc}")
+            else:
+                self._log_line(f"✓ {f['path']}")
+
     def _display_name(self, path: str) -> str:
         return os.path.basename(path)
 
@@ -1,13 +1,14 @@
 # -*- coding: utf-8 -*-
 import os
 import json
+import time
 import traceback
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QStackedWidget, QMessageBox,
     QHBoxLayout, QLabel,
     QPushButton, QFileDialog
 )
-from PySide6.QtCore import Signal, QSettings
+from PySide6.QtCore import Qt, Signal, QSettings, QThread
 from PySide6.QtGui import QIcon
 from utils.i18n import tr, i18n
 
@@ -17,9 +18,12 @@ from gui.mapping_settings_dialog import MappingSettingsDialog
 from gui.pages.confirm_page import ConfirmPage
 from gui.pages.progress_page import ProgressPage
 from gui.sheet_mapping_dialog import SheetMappingDialog
-from core.main_page_logic import MainPageLogic
+from gui.main_page_logic import MainPageLogic
+from core.cancel import CancelToken, OperationCancelled
 from core.excel_processor import ExcelProcessor
+from core.publisher import default_publisher
 from gui.pages.header_row_page import HeaderRowPage
+from gui.run_options import load_run_options, save_run_options, staging_for
 
 def short_name_no_ext(name, n=5):
     base, ext = os.path.splitext(name)
@@ -28,6 +32,67 @@ def short_name_no_ext(name, n=5):
     return f"{base[:n]}...{base[-n:]}"
 
 
+def run_option_kwargs(run_options, folder_mode):
+    """``ExcelProcessor`` arguments for the modes ticked on the confirmation page."""
+    return {
+        "workers": min(os.cpu_count() or 1, 8) if folder_mode and run_options.get("parallel") else 0,
+        "selected_sheets_only": run_options.get("selected_sheets_only", False),
+        "use_cache": run_options.get("use_cache", False),
+        "incremental": run_options.get("incremental", False),
+        "staging": staging_for(run_options.get("staging", False)),
+        # Результат всегда сохраняется локально и переносится на место целиком,
+        # как в объединении, Excel Builder и CLI; это не режим ускорения.
+        "publisher": default_publisher(),
+        "checkpoint": run_options.get("checkpoint", False),
+    }
+
+
+class CopyWorker(QThread):
+    """Run ``ExcelProcessor.copy_data`` outside the GUI thread."""
+
+    finished = Signal(str, object)
+    error = Signal(str, str)
+    cancelled = Signal()
+    progress = Signal(int, int)
+    status = Signal(dict)
+
+    # Счётчики отправляются в окно не чаще одного раза за интервал (с).
+    STATUS_INTERVAL = 0.1
+
+    def __init__(self, processor):
+        super().__init__()
+        self.processor = processor
+        self.cancel_token = CancelToken()
+        self._started_at = 0.0
+        self._last_status = 0.0
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def run(self):
+        self._started_at = time.perf_counter()
+        try:
+            output_file, metrics = self.processor.copy_data(
+                progress_callback=self.progress.emit,
+                cancel_token=self.cancel_token,
+                status_callback=self._emit_status,
+                with_metrics=True,
+            )
+        except OperationCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.error.emit(str(e), traceback.format_exc())
+        else:
+            self.finished.emit(output_file, metrics)
+
+    def _emit_status(self, status):
+        now = time.perf_counter()
+        last = status["files_done"] == status["files_total"] and status["step"] == status["steps"]
+        if last or now - self._last_status >= self.STATUS_INTERVAL:
+            self._last_status = now
+            self.status.emit(dict(status, elapsed=now - self._started_at))
+
+
 class FileProcessorApp(QWidget):
     copyingStarted = Signal()
 
@@ -55,11 +120,16 @@ class FileProcessorApp(QWidget):
         self.file_to_sheet_map = {}
         self.skip_first_row = False
         self.copy_by_row_number = False
+        self.key_column = None
+        self.source_key_column = "A"
         self.preserve_formatting = False
+        self.verify_mode = "off"
         self.progress_bar = None
+        self.copy_worker = None
 
         self.settings = QSettings('xlMerger', 'xlMerger')
         self.last_mapping_path = self.settings.value('mapping_path', '')
+        self.run_options = load_run_options(key for key, _title in ConfirmPage.RUN_OPTIONS)
 
         i18n.language_changed.connect(self.retranslate_ui)
         
@@ -85,6 +155,11 @@ class FileProcessorApp(QWidget):
         self.excel_file_path = self.main_page_logic.excel_file_path
         self.skip_first_row = self.page_main.skip_first_row_checkbox.isChecked()
         self.copy_by_row_number = self.page_main.copy_by_row_number_radio.isChecked()
+        if self.page_main.copy_by_key_radio.isChecked():
+            self.key_column = self.page_main.key_column_entry.text().strip()
+            self.source_key_column = self.page_main.source_key_column_entry.text().strip().upper()
+        else:
+            self.key_column = None
 
         if not self.check_sheet_mapping():
             return
@@ -109,9 +184,8 @@ class FileProcessorApp(QWidget):
     # === Sheet-Column Page ===
     def load_columns_and_go_to_sheet_column(self):
         try:
-            self.columns = {}
-            for sheet, header_row in self.header_row.items():
-                self.columns[sheet] = ExcelProcessor.get_sheet_columns(self.excel_file_path, sheet, header_row)
+            # Все заголовки читаются за одно открытие файла.
+            self.columns = ExcelProcessor.get_sheet_headers(self.excel_file_path, self.header_row)
             self.go_to_sheet_column_page()
         except Exception as e:
             self.log_error(e)
@@ -161,6 +235,9 @@ class FileProcessorApp(QWidget):
             else:
                 self.folder_to_column = mapping
             self.preserve_formatting = self.page_confirmation.is_format_preserved()
+            self.verify_mode = self.page_confirmation.get_verify_mode()
+            self.run_options = self.page_confirmation.get_run_options()
+            save_run_options(self.run_options)
 
     # === Confirmation Page ===
     def get_sorted_items(self):
@@ -177,7 +254,7 @@ class FileProcessorApp(QWidget):
             if isinstance(col, str) and col.strip()
         ]
         available = sorted(set(all_columns))
-        self.page_confirmation = ConfirmPage(items, available, self.preserve_formatting)
+        self.page_confirmation = ConfirmPage(items, available, self.preserve_formatting, self.verify_mode, self.run_options)
         self.page_confirmation.backClicked.connect(self.go_to_match_page)
         self.page_confirmation.startClicked.connect(self.start_copying)
         self.stack.addWidget(self.page_confirmation)
@@ -191,11 +268,18 @@ class FileProcessorApp(QWidget):
         self.stack.setCurrentWidget(self.page_progress)
 
     # === Completion Page ===
-    def create_completion_page(self):
+    def create_completion_page(self, metrics=None):
         page = QWidget()
         page.setWindowTitle("Копирование завершено")
         layout = QVBoxLayout()
         layout.addWidget(QLabel("Файлы успешно сохранены."))
+        if metrics is not None:
+            # Фазы, скорость, объём прочитанного и пиковая память (core.run_metrics).
+            metrics_label = QLabel("\n".join(metrics.summary_lines()))
+            metrics_label.setObjectName("runMetrics")
+            metrics_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+            metrics_label.setWordWrap(True)
+            layout.addWidget(metrics_label)
         button_layout = QHBoxLayout()
         close_button = QPushButton("Закрыть приложение")
         restart_button = QPushButton("Вернуться на главный экран")
@@ -207,8 +291,8 @@ class FileProcessorApp(QWidget):
         page.setLayout(layout)
         return page
 
-    def go_to_completion_page(self):
-        self.page_completion = self.create_completion_page()
+    def go_to_completion_page(self, metrics=None):
+        self.page_completion = self.create_completion_page(metrics)
         self.stack.addWidget(self.page_completion)
         self.stack.setCurrentWidget(self.page_completion)
 
@@ -312,32 +396,54 @@ class FileProcessorApp(QWidget):
                 file_to_sheet_map=self.file_to_sheet_map,
                 skip_first_row=self.skip_first_row,
                 copy_by_row_number=self.copy_by_row_number,
-                preserve_formatting=self.preserve_formatting
+                preserve_formatting=self.preserve_formatting,
+                verify_mode=self.verify_mode,
+                key_column=self.key_column,
+                source_key_column=self.source_key_column,
+                **run_option_kwargs(self.run_options, bool(folder_to_column)),
             )
-
-            def progress_callback(progress, total):
-                if hasattr(self, 'progress_bar') and self.progress_bar:
-                    self.progress_bar.setMaximum(total)
-                    self.progress_bar.setValue(progress)
-                    QApplication.processEvents()
-
-            output_file = processor.copy_data(progress_callback=progress_callback)
-            self.finalize_copying_process(output_file)
-
         except Exception as e:
             self.log_error(e)
             QMessageBox.critical(self, tr("Error"), tr("Произошла ошибка при запуске процесса копирования: {e}").format(e=e))
+            return
 
-    def finalize_copying_process(self, output_file):
-        self.go_to_completion_page()
+        # Копирование идёт в отдельном потоке, окно остаётся отзывчивым.
+        self.copy_worker = CopyWorker(processor)
+        self.copy_worker.progress.connect(self.update_copy_progress)
+        self.copy_worker.status.connect(self.update_copy_status)
+        self.copy_worker.finished.connect(self.finalize_copying_process)
+        self.copy_worker.error.connect(self.handle_copy_error)
+        self.copy_worker.cancelled.connect(self.handle_copy_cancelled)
+        self.page_progress.cancelClicked.connect(self.copy_worker.cancel)
+        self.copy_worker.start()
+
+    def update_copy_progress(self, progress, total):
+        if self.progress_bar:
+            self.progress_bar.setMaximum(total)
+            self.progress_bar.setValue(progress)
+
+    def update_copy_status(self, status):
+        self.page_progress.set_stats(status, status.get("elapsed", 0.0))
+
+    def handle_copy_error(self, message, details):
+        self.log_error(message, details)
+        QMessageBox.critical(self, tr("Error"), tr("Произошла ошибка при запуске процесса копирования: {e}").format(e=message))
+
+    def handle_copy_cancelled(self):
+        self.page_progress.set_cancelled()
+        QMessageBox.information(self, tr("Копирование отменено"), tr("Копирование отменено. Результат не сохранён."))
+        self.return_to_main_screen()
+
+    def finalize_copying_process(self, output_file, metrics=None):
+        self.go_to_completion_page(metrics)
         QMessageBox.information(self, tr("Success"), tr("Файлы успешно сохранены как {output_file}.").format(output_file=output_file))
 
     # === Error Logging & Center Window ===
-    def log_error(self, error):
+    def log_error(self, error, details=None):
         log_file_path = os.path.join(os.path.dirname(__file__), 'error_log.txt')
         with open(log_file_path, 'a', encoding='utf-8') as log_file:
             log_file.write("Ошибка: " + str(error) + "\n")
-            log_file.write(traceback.format_exc())
+            log_file.write(details if details is not None else traceback.format_exc())
             log_file.write("\n")
 
     def center_window(self, window=None):
@@ -4,7 +4,7 @@ from PySide6.QtWidgets import (
     QPushButton
 )
 from PySide6.QtCore import Signal
-from core.drag_drop import DragDropLineEdit
+from gui.drag_drop import DragDropLineEdit
 from utils.i18n import tr
 from gui.style_system import set_button_variant
 
@@ -11,7 +11,7 @@ from PySide6.QtCore import Qt, Signal
 from PySide6.QtGui import QStandardItemModel, QStandardItem, QColor, QBrush
 from openpyxl import load_workbook
 
-from core.drag_drop import DragDropLineEdit
+from gui.drag_drop import DragDropLineEdit
 from core.limit_auto import check_limits_auto
 from core.limit_manual import check_limits_manual
 from utils.i18n import tr
@@ -8,7 +8,7 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, Signal
 from utils.i18n import tr, i18n
 
-from core.drag_drop import DragDropLineEdit
+from gui.drag_drop import DragDropLineEdit
 from .style_system import set_button_variant
 
 class MainPageWidget(QWidget):
@@ -33,6 +33,7 @@ class MainPageWidget(QWidget):
         layout.addLayout(self.create_copy_column_layout())
         layout.addWidget(self.create_skip_first_row_checkbox())
         layout.addLayout(self.create_copy_method_selection_layout())
+        layout.addLayout(self.create_key_columns_layout())
         layout.addWidget(self.create_preview_button(), alignment=Qt.AlignRight)
         layout.addWidget(self.create_process_button(), alignment=Qt.AlignCenter)
         self.setLayout(layout)
@@ -40,7 +41,9 @@ class MainPageWidget(QWidget):
         # --- ВАЖНО: Связываем переключатели ---
         self.copy_by_matching_radio.toggled.connect(self.toggle_skip_first_row_checkbox)
         self.copy_by_row_number_radio.toggled.connect(self.toggle_skip_first_row_checkbox)
+        self.copy_by_key_radio.toggled.connect(self.toggle_key_columns)
         self.toggle_skip_first_row_checkbox()  # выставить корректное состояние при старте
+        self.toggle_key_columns()
 
     def create_folder_selection_layout(self):
         layout = QHBoxLayout()
@@ -108,10 +111,32 @@ class MainPageWidget(QWidget):
         self.copy_by_matching_radio = QRadioButton(tr("Нет пустых/скрытых строк в xlsx"), self)
         self.copy_by_matching_radio.setChecked(True)
         self.copy_by_row_number_radio = QRadioButton(tr("Есть пустые/скрытые строки в xlsx"), self)
+        self.copy_by_key_radio = QRadioButton(tr("Сопоставлять строки по ключу (ID)"), self)
         layout.addWidget(self.copy_by_matching_radio)
         layout.addWidget(self.copy_by_row_number_radio)
+        layout.addWidget(self.copy_by_key_radio)
         return layout
 
+    def create_key_columns_layout(self):
+        layout = QHBoxLayout()
+        self.key_column_label = QLabel()
+        self.key_column_entry = QLineEdit(self)
+        self.key_column_entry.setMaximumWidth(100)
+        self.source_key_column_label = QLabel()
+        self.source_key_column_entry = QLineEdit("A", self)
+        self.source_key_column_entry.setMaximumWidth(60)
+        layout.addWidget(self.key_column_label)
+        layout.addWidget(self.key_column_entry)
+        layout.addWidget(self.source_key_column_label)
+        layout.addWidget(self.source_key_column_entry)
+        layout.addStretch()
+        return layout
+
+    def toggle_key_columns(self):
+        enabled = self.copy_by_key_radio.isChecked()
+        self.key_column_entry.setEnabled(enabled)
+        self.source_key_column_entry.setEnabled(enabled)
+
     def toggle_skip_first_row_checkbox(self):
         """
         Деактивирует чекбокс 'Первая строка — заголовок в переводах'
@@ -142,6 +167,8 @@ class MainPageWidget(QWidget):
         self.copy_column_entry.clear()
         self.skip_first_row_checkbox.setChecked(False)
         self.copy_by_matching_radio.setChecked(True)
+        self.key_column_entry.clear()
+        self.source_key_column_entry.setText("A")
         self.sheet_list.clear()
 
     def retranslate_ui(self):
@@ -153,6 +180,9 @@ class MainPageWidget(QWidget):
         self.skip_first_row_checkbox.setText(tr("Первая строка — заголовок в переводах"))
         self.copy_by_matching_radio.setText(tr("Нет пустых/скрытых строк в xlsx"))
         self.copy_by_row_number_radio.setText(tr("Есть пустые/скрытые строки в xlsx"))
+        self.copy_by_key_radio.setText(tr("Сопоставлять строки по ключу (ID)"))
+        self.key_column_label.setText(tr("Ключ в целевом (буква или заголовок):"))
+        self.source_key_column_label.setText(tr("Ключ в переводах (буква):"))
         self.deselect_all_button.setText(tr("Не выбрать все"))
         self.select_all_button.setText(tr("Выбрать все"))
         self.sheet_label.setText(tr("Выберите листы:"))
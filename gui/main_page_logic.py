@@ -3,10 +3,12 @@ import os
 import traceback
 from PySide6.QtWidgets import QMessageBox, QListWidgetItem
 from PySide6.QtCore import Qt, QObject, Signal
+from openpyxl.utils import column_index_from_string
 
 from core.excel_processor import ExcelProcessor
 from gui.excel_previewer import ExcelPreviewer
 from gui.excel_file_selector import ExcelFileSelector
+from utils.i18n import tr
 
 class MainPageLogic(QObject):
     proceed_to_next = Signal()  # Сигнал для перехода на следующий шаг
@@ -179,6 +181,16 @@ class MainPageLogic(QObject):
         if not selected_sheets:
             QMessageBox.critical(self.ui, "Ошибка", "Выбери хотя бы один лист.")
             return False
+        key_radio = getattr(self.ui, "copy_by_key_radio", None)
+        if key_radio is not None and key_radio.isChecked():
+            if not self.ui.key_column_entry.text().strip() or not self.ui.source_key_column_entry.text().strip():
+                QMessageBox.critical(self.ui, "Ошибка", "Укажи ключевые столбцы для сопоставления по ID.")
+                return False
+            try:
+                column_index_from_string(self.ui.source_key_column_entry.text().strip())
+            except ValueError:
+                QMessageBox.critical(self.ui, tr("Ошибка"), tr("Ключ в переводах укажи буквой столбца, например A."))
+                return False
         return True
 
     def log_error(self, error):
@@ -7,55 +7,77 @@ import subprocess
 import platform
 
 from PySide6.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QMessageBox, QLabel, QGroupBox, QProgressBar
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QMessageBox, QLabel, QGroupBox, QProgressBar, QCheckBox
 )
 
 from PySide6.QtCore import Qt, QThread, Signal, QUrl
 
 from utils.i18n import tr, i18n
-from core.drag_drop import DragDropLineEdit
-from core.merge_columns import merge_excel_columns
+from gui.drag_drop import DragDropLineEdit
+from core.cancel import CancelToken, OperationCancelled
+from core.merge_columns import merge_targets
+from core.publisher import default_publisher
+from core.source_cache import SourceColumnCache
+from gui.run_options import STAGING_TITLE, staging_checkbox, staging_for
 from .multi_merge_mapping_dialog import MultiMergeMappingDialog
 from .style_system import set_button_variant, set_label_role, set_label_state
 
 
 class MergeWorker(QThread):
-    finished = Signal(list)
+    finished = Signal(list, list)
     error = Signal(str)
+    cancelled = Signal()
     progress = Signal(int, str)
 
-    def __init__(self, tasks):
+    def __init__(self, tasks, copy_styles=True, workers=None, staging=None):
         super().__init__()
         self.tasks = tasks
+        self.copy_styles = copy_styles
+        self.workers = workers
+        self.staging = staging
+        self.cancel_token = CancelToken()
         self.outputs = []
+        self.failed = []
+
+    def cancel(self):
+        self.cancel_token.cancel()
 
     def run(self):
-        try:
-            total_steps = sum(len(task.get("mappings", [])) for task in self.tasks) or 1
-            completed = 0
-            for idx_task, task in enumerate(self.tasks):
-                main_file = task.get("target")
-                mappings = task.get("mappings", [])
-                self.progress.emit(1, tr("Подготовка {file}").format(file=os.path.basename(main_file)))
-
-                def progress_callback(idx, total, mapping):
-                    source_file = os.path.basename(mapping.get("source", ""))
-                    target_sheet = mapping.get("target_sheet", "")
-                    step = int(((completed + idx) / total_steps) * 99) + 1
-                    message = tr("{file}: лист {sheet}, источник {src}").format(
-                        file=os.path.basename(main_file),
-                        sheet=target_sheet,
-                        src=source_file
-                    )
-                    self.progress.emit(step, message)
-
-                output = merge_excel_columns(main_file, mappings, progress_callback=progress_callback)
-                completed += len(mappings)
-                self.outputs.append((main_file, output))
+        publisher = default_publisher()
+        # Один разбор каждого файла перевода на весь запуск, сколько бы листов и книг он ни заполнял.
+        source_cache = SourceColumnCache()
+        for task in self.tasks:
+            for mapping in task.get("mappings", []):
+                source_cache.expect(mapping.get("source", ""), mapping.get("source_columns", []))
+
+        def progress_callback(done, total, task, mapping):
+            step = int((done / total) * 99) + 1
+            message = tr("{file}: лист {sheet}, источник {src}").format(
+                file=os.path.basename(task.get("target", "")),
+                sheet=mapping.get("target_sheet", ""),
+                src=os.path.basename(mapping.get("source", ""))
+            )
+            self.progress.emit(step, message)
 
+        try:
+            self.progress.emit(1, tr("Начинаем объединение..."))
+            # Каждая целевая книга объединяется в своём процессе; ошибка в одной не останавливает остальные.
+            for task, output, error in merge_targets(
+                self.tasks, workers=self.workers, progress_callback=progress_callback,
+                cancel_token=self.cancel_token, staging=self.staging, publisher=publisher,
+                source_cache=source_cache, copy_styles=self.copy_styles,
+            ):
+                if error is not None:
+                    self.failed.append((task.get("target"), str(error)))
+                else:
+                    self.outputs.append((task.get("target"), output))
+
+            publisher.wait([output for _, output in self.outputs])
             self.progress.emit(100, tr("Объединение завершено!"))
-            self.finished.emit(self.outputs)
+            self.finished.emit(self.outputs, self.failed)
 
+        except OperationCancelled:
+            self.cancelled.emit()
         except Exception as e:
             self.error.emit(str(e))
 
@@ -98,6 +120,13 @@ class MergeTab(QWidget):
         sources_group.setLayout(sources_layout)
         layout.addWidget(sources_group)
 
+        # Без форматирования источники читаются потоково, а ячейки цели сохраняют свой формат.
+        self.copy_styles_checkbox = QCheckBox()
+        self.copy_styles_checkbox.setChecked(True)
+        layout.addWidget(self.copy_styles_checkbox)
+        self.staging_checkbox = staging_checkbox()
+        layout.addWidget(self.staging_checkbox)
+
         button_layout = QVBoxLayout()
 
         self.configure_btn = QPushButton()
@@ -143,6 +172,14 @@ class MergeTab(QWidget):
         action_row.setSpacing(10)
         action_row.addWidget(self.configure_btn)
         action_row.addWidget(self.merge_btn)
+
+        self.cancel_btn = QPushButton()
+        self.cancel_btn.clicked.connect(self.cancel_merge)
+        self.cancel_btn.setMinimumWidth(120)
+        self.cancel_btn.setMinimumHeight(35)
+        self.cancel_btn.setVisible(False)
+        set_button_variant(self.cancel_btn, "secondary")
+        action_row.addWidget(self.cancel_btn)
         button_layout.addLayout(action_row)
 
         layout.addStretch()
@@ -211,22 +248,37 @@ class MergeTab(QWidget):
         self.progress_bar.setValue(0)
         self.status_label.setText(tr("Начинаем объединение..."))
 
-        self.worker = MergeWorker(self.merge_tasks)
+        self.worker = MergeWorker(self.merge_tasks, copy_styles=self.copy_styles_checkbox.isChecked(),
+                                  staging=staging_for(self.staging_checkbox.isChecked()))
         self.worker.finished.connect(self.on_merge_finished)
         self.worker.error.connect(self.on_merge_error)
+        self.worker.cancelled.connect(self.on_merge_cancelled)
         self.worker.progress.connect(self.on_progress_update)
         self.worker.start()
+        self.cancel_btn.setEnabled(True)
+        self.cancel_btn.setVisible(True)
+
+    def cancel_merge(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.status_label.setText(tr("Отмена..."))
 
     def on_progress_update(self, value, message):
         self.progress_bar.setValue(value)
         self.status_label.setText(message)
 
-    def on_merge_finished(self, outputs):
+    def on_merge_finished(self, outputs, failed):
         self.worker = None
         self.output_files = outputs
         self.progress_bar.setValue(100)
-        self.status_label.setText(tr("Объединение завершено успешно!"))
-        set_label_state(self.status_label, "success")
+        if failed:
+            self.status_label.setText(tr("Объединено файлов: {done} из {total}").format(
+                done=len(outputs), total=len(outputs) + len(failed)))
+            set_label_state(self.status_label, "error")
+        else:
+            self.status_label.setText(tr("Объединение завершено успешно!"))
+            set_label_state(self.status_label, "success")
 
         links = []
         for _, path in outputs:
@@ -237,7 +289,24 @@ class MergeTab(QWidget):
             self.file_link.setText("<br>".join(links))
             self.file_link.setVisible(True)
 
+        self._finish_processing()
+
+        if failed:
+            details = "\n".join(f"{os.path.basename(target)}: {message}" for target, message in failed)
+            QMessageBox.warning(self, tr("Предупреждение"),
+                                tr("Не удалось объединить:\n{details}").format(details=details))
+
+    def on_merge_cancelled(self):
+        self.worker = None
+        self.progress_bar.setVisible(False)
+        self.file_link.setVisible(False)
+        self.status_label.setText(tr("Объединение отменено"))
+        set_label_state(self.status_label, "")
+        self._finish_processing()
+
+    def _finish_processing(self):
         self.is_processing = False
+        self.cancel_btn.setVisible(False)
         self.merge_btn.setEnabled(True)
         self.configure_btn.setEnabled(True)
 
@@ -247,10 +316,7 @@ class MergeTab(QWidget):
         self.file_link.setVisible(False)
         self.status_label.setText(tr("Ошибка при объединении"))
         set_label_state(self.status_label, "error")
-
-        self.is_processing = False
-        self.merge_btn.setEnabled(True)
-        self.configure_btn.setEnabled(True)
+        self._finish_processing()
 
         QMessageBox.critical(self, tr("Ошибка"), error_message)
 
@@ -277,6 +343,9 @@ class MergeTab(QWidget):
         self.sources_input.setPlaceholderText(tr("Перетащи или кликни дважды"))
         self.configure_btn.setText(tr("Настроить"))
         self.merge_btn.setText(tr("Объединить"))
+        self.cancel_btn.setText(tr("Отменить"))
+        self.copy_styles_checkbox.setText(tr("Копировать с сохранением форматирования"))
+        self.staging_checkbox.setText(tr(STAGING_TITLE))
 
         if hasattr(self, 'status_label') and not self.merge_tasks:
             set_label_state(self.status_label, "")
@@ -11,11 +11,35 @@ class ConfirmPage(QWidget):
     backClicked = Signal()
     startClicked = Signal()
 
-    def __init__(self, items, available_columns, preserve_formatting=False, parent=None):
+    VERIFY_MODES = [
+        ("fast", "Быстрая (длина + CRC)"),
+        ("strict", "Строгая (SHA-256)"),
+        ("off", "Выключена"),
+    ]
+
+    # Режимы ускорения; все выключены, пока пользователь не включит их сам.
+    RUN_OPTIONS = [
+        ("selected_sheets_only", "Загружать только выбранные листы"),
+        ("incremental", "Записывать только изменённые ячейки при повторном запуске"),
+        ("use_cache", "Не пересчитывать результат, если файлы и настройки не изменились"),
+        ("checkpoint", "Продолжать прерванное копирование с места остановки"),
+        ("staging", "Копировать сетевые файлы в локальный кэш"),
+        ("parallel", "Разбирать папки с переводами параллельно"),
+    ]
+    # Режим -> режим, без которого он не работает.
+    OPTION_REQUIRES = {
+        "incremental": "selected_sheets_only",
+        "checkpoint": "selected_sheets_only",
+    }
+
+    def __init__(self, items, available_columns, preserve_formatting=False, verify_mode="off",
+                 run_options=None, parent=None):
         super().__init__(parent)
         self.items = items
         self.available_columns = [''] + sorted(set(available_columns))
         self._preserve_formatting = preserve_formatting
+        self._verify_mode = verify_mode
+        self._run_options = dict(run_options or {})
         self._build_ui()
         i18n.language_changed.connect(self.retranslate_ui)
         self.retranslate_ui()
@@ -64,6 +88,27 @@ class ConfirmPage(QWidget):
         self.format_checkbox.setChecked(self._preserve_formatting)
         layout.addWidget(self.format_checkbox)
 
+        verify_layout = QHBoxLayout()
+        self.verify_label = QLabel(tr("Проверка после сохранения:"))
+        self.verify_combo = QComboBox()
+        for mode, title in self.VERIFY_MODES:
+            self.verify_combo.addItem(tr(title), mode)
+        idx = self.verify_combo.findData(self._verify_mode)
+        self.verify_combo.setCurrentIndex(idx if idx != -1 else 0)
+        verify_layout.addWidget(self.verify_label)
+        verify_layout.addWidget(self.verify_combo, 1)
+        layout.addLayout(verify_layout)
+
+        self.option_checkboxes = {}
+        for key, title in self.RUN_OPTIONS:
+            checkbox = QCheckBox(tr(title))
+            checkbox.setChecked(bool(self._run_options.get(key, False)))
+            self.option_checkboxes[key] = checkbox
+            layout.addWidget(checkbox)
+        for required in set(self.OPTION_REQUIRES.values()):
+            self.option_checkboxes[required].toggled.connect(self.update_option_states)
+        self.update_option_states()
+
         # Кнопки
         btn_layout = QHBoxLayout()
         self.btn_back = QPushButton(tr("Назад"))
@@ -93,6 +138,20 @@ class ConfirmPage(QWidget):
         self.summary_label.setText(tr("Всего: {total}. Сопоставлено: {mapped}. Не выбрано: {missing}." ).format(total=total, mapped=total - missing, missing=missing))
         self.btn_back.setText(tr("Назад"))
         self.btn_start.setText(tr("Начать"))
+        self.verify_label.setText(tr("Проверка после сохранения:"))
+        for idx, (_, title) in enumerate(self.VERIFY_MODES):
+            self.verify_combo.setItemText(idx, tr(title))
+        for key, title in self.RUN_OPTIONS:
+            self.option_checkboxes[key].setText(tr(title))
+
+    def update_option_states(self):
+        """Untick and disable the modes whose prerequisite is not ticked."""
+        for key, required in self.OPTION_REQUIRES.items():
+            enabled = self.option_checkboxes[required].isChecked()
+            checkbox = self.option_checkboxes[key]
+            if not enabled:
+                checkbox.setChecked(False)
+            checkbox.setEnabled(enabled)
 
     def get_current_mapping(self):
         mapping = {}
@@ -105,3 +164,8 @@ class ConfirmPage(QWidget):
     def is_format_preserved(self):
         return self.format_checkbox.isChecked()
 
+    def get_verify_mode(self):
+        return self.verify_combo.currentData()
+
+    def get_run_options(self):
+        return {key: checkbox.isChecked() for key, checkbox in self.option_checkboxes.items()}
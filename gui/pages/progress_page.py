@@ -1,11 +1,24 @@
 # -*- coding: utf-8 -*-
 # gui/pages/progress_page.py
 
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QProgressBar
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QProgressBar, QPushButton
+from PySide6.QtCore import Qt, QTimer, Signal
+from utils.i18n import tr
 from ..style_system import set_label_role, set_label_state
 
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
 class ProgressPage(QWidget):
+    cancelClicked = Signal()
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Копирование переводов")
@@ -19,6 +32,13 @@ class ProgressPage(QWidget):
         self.progress_bar = QProgressBar(self)
         self.progress_bar.setAlignment(Qt.AlignCenter)
 
+        # --- Скорость и оставшееся время ---
+        self.label_stats = QLabel("")
+        self.label_stats.setAlignment(Qt.AlignCenter)
+
+        self.cancel_button = QPushButton(tr("Отменить"), self)
+        self.cancel_button.clicked.connect(self._on_cancel_clicked)
+
         # --- Галочка завершения ---
         self.label_done = QLabel("")
         self.label_done.setAlignment(Qt.AlignCenter)
@@ -37,8 +57,10 @@ class ProgressPage(QWidget):
         layout.addWidget(self.label_file_info)
         layout.addSpacing(8)
         layout.addWidget(self.progress_bar)
+        layout.addWidget(self.label_stats)
         layout.addSpacing(10)
         layout.addWidget(self.label_done)
+        layout.addWidget(self.cancel_button, alignment=Qt.AlignCenter)
         self.setLayout(layout)
 
     def set_progress(self, value, maximum=None, file_index=None, file_total=None, filename=None):
@@ -61,7 +83,43 @@ class ProgressPage(QWidget):
         set_label_state(self.label_done, "")
         self.label_done.hide()
 
+    def set_stats(self, status, elapsed):
+        """Show throughput and ETA from the job counters.
+
+        ``status`` is the dict passed to ``ExcelProcessor.copy_data``'s
+        ``status_callback``; ``elapsed`` is the run time in seconds.
+        """
+        files_total = status.get("files_total") or 0
+        if files_total:
+            done, total = status.get("files_done", 0), files_total
+        else:
+            done, total = status.get("step", 0), status.get("steps") or 1
+        cells = status.get("cells", 0)
+        parts = [tr("Файлов: {done} из {total}").format(done=status.get("files_done", 0), total=files_total)]
+        if elapsed > 0:
+            parts.append(tr("{rate} ячеек/с").format(rate=int(cells / elapsed)))
+        if 0 < done < total:
+            parts.append(tr("осталось ~{eta}").format(eta=format_duration(elapsed * (total - done) / done)))
+        self.label_stats.setText(" · ".join(parts))
+
+    def set_cancelling(self):
+        self.cancel_button.setEnabled(False)
+        self.label_file_info.setText(tr("Отмена..."))
+
+    def set_cancelled(self):
+        self._anim_timer.stop()
+        self.cancel_button.hide()
+        self.label_done.setText(tr("Копирование отменено"))
+        set_label_state(self.label_done, "error")
+        self.label_done.show()
+        self.label_file_info.setText(tr("Результат не сохранён"))
+
+    def _on_cancel_clicked(self):
+        self.set_cancelling()
+        self.cancelClicked.emit()
+
     def set_complete(self):
+        self.cancel_button.hide()
         self.label_done.setText("✔ Готово!")
         set_label_state(self.label_done, "success")
         self.label_done.show()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Speed-up modes chosen by the user, remembered between sessions.
+
+Every mode is off until the user ticks it. The values live under the
+``run_options/<name>`` keys of the application's ``QSettings``. The staging
+option is shared by the copy, merge and split windows.
+"""
+from typing import Dict, Iterable
+
+from PySide6.QtCore import QSettings
+from PySide6.QtWidgets import QCheckBox
+
+from core.staging import StagingCache, default_staging
+from utils.i18n import tr
+
+STAGING = "staging"
+STAGING_TITLE = "Копировать сетевые файлы в локальный кэш"
+
+
+def _settings() -> QSettings:
+    return QSettings('xlMerger', 'xlMerger')
+
+
+def load_run_options(keys: Iterable[str]) -> Dict[str, bool]:
+    settings = _settings()
+    return {key: settings.value(f'run_options/{key}', False, type=bool) for key in keys}
+
+
+def save_run_options(options: Dict[str, bool]) -> None:
+    settings = _settings()
+    for key, value in options.items():
+        settings.setValue(f'run_options/{key}', bool(value))
+
+
+def staging_checkbox() -> QCheckBox:
+    """Checkbox for the shared staging option; each toggle is saved at once."""
+    checkbox = QCheckBox(tr(STAGING_TITLE))
+    checkbox.setChecked(load_run_options([STAGING])[STAGING])
+    checkbox.toggled.connect(lambda checked: save_run_options({STAGING: checked}))
+    return checkbox
+
+
+def staging_for(enabled: bool) -> StagingCache | None:
+    """The shared network staging cache when ``enabled``, else ``None``."""
+    return default_staging() if enabled else None
@@ -5,8 +5,9 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt
 from utils.i18n import tr, i18n
-from core.drag_drop import DragDropLineEdit
+from gui.drag_drop import DragDropLineEdit
 from core.split_excel import split_excel_multiple_sheets
+from gui.run_options import STAGING_TITLE, staging_checkbox, staging_for
 from gui.split_mapping_dialog import SplitMappingDialog
 from .style_system import set_button_variant
 from openpyxl import load_workbook
@@ -49,7 +50,10 @@ class SplitTab(QWidget):
         action_row.addWidget(self.config_btn)
         action_row.addWidget(self.split_btn)
 
+        self.staging_checkbox = staging_checkbox()
+
         left.addStretch()
+        left.addWidget(self.staging_checkbox)
         left.addLayout(action_row)
 
         layout.addLayout(left)
@@ -117,6 +121,7 @@ class SplitTab(QWidget):
                 self.excel_path,
                 cfg,
                 progress_callback=cb,
+                staging=staging_for(self.staging_checkbox.isChecked()),
             )
 
             progress.close()
@@ -129,6 +134,7 @@ class SplitTab(QWidget):
         self.split_btn.setText(tr("Разделить"))
         self.config_btn.setText(tr("Настроить"))
         self.file_input.setPlaceholderText(tr("Перетащи сюда эксель"))
+        self.staging_checkbox.setText(tr(STAGING_TITLE))
         self._update_current_label()
         # update labels - they are static but to refresh we need to re-add them? Not necessary
 
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import sys
 import ctypes
+import multiprocessing
 from pathlib import Path
 from PySide6.QtWidgets import QApplication
 from PySide6.QtGui import QIcon
@@ -19,6 +20,8 @@ def _set_windows_app_id():
         pass
 
 if __name__ == "__main__":
+    # Нужен для пула процессов в собранном (PyInstaller) приложении.
+    multiprocessing.freeze_support()
     _set_windows_app_id()
     app = QApplication(sys.argv)
     apply_app_style(app)
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+from openpyxl import Workbook
+from openpyxl.styles import Font
+
+import core.excel_processor as excel_processor
+from core.checkpoint import CHECKPOINT_SUFFIX
+from core.excel_processor import ExcelProcessor
+from utils.logger import Logger
+
+
+def _book(path, rows, bold_row=None):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "S1"
+    for row in rows:
+        ws.append(row)
+    if bold_row:
+        ws.cell(row=bold_row, column=1).font = Font(bold=True)
+    wb.save(path)
+    wb.close()
+
+
+def _processor(tmp_path):
+    return ExcelProcessor(
+        main_excel_path=str(tmp_path / "main.xlsx"),
+        folder_path=str(tmp_path),
+        copy_column="A",
+        selected_sheets=["S1"],
+        sheet_to_header_row={"S1": 0},
+        sheet_to_column={"S1": "A"},
+        file_to_column={"de.xlsx": "de", "fr.xlsx": "fr", "it.xlsx": "it"},
+        copy_by_row_number=True,
+        preserve_formatting=True,
+        selected_sheets_only=True,
+        checkpoint=True,
+        logger=Logger(str(tmp_path / "copy_log.txt")),
+    )
+
+
+@pytest.fixture
+def tree(tmp_path):
+    _book(tmp_path / "main.xlsx", [["ID", "de", "fr", "it"], *[[f"k{i}"] for i in range(1, 6)]])
+    for lang in ("de", "fr", "it"):
+        _book(tmp_path / f"{lang}.xlsx", [[lang], *[[f"{lang}-{i}"] for i in range(1, 6)]], bold_row=3)
+    return tmp_path
+
+
+def test_resumed_run_skips_finished_sources_and_matches_full_run(tree, monkeypatch):
+    good_it = (tree / "it.xlsx").read_bytes()
+    (tree / "it.xlsx").write_bytes(b"locked")
+    with pytest.raises(Exception):
+        _processor(tree).copy_data()
+    output = tree / "main_out.xlsx"
+    assert not output.exists()
+    assert os.path.exists(str(output) + CHECKPOINT_SUFFIX)
+
+    (tree / "it.xlsx").write_bytes(good_it)
+    parsed = []
+    real_read = excel_processor.read_source_columns
+
+    def counting_read(path, *args):
+        parsed.append(os.path.basename(path))
+        return real_read(path, *args)
+
+    monkeypatch.setattr(excel_processor, "read_source_columns", counting_read)
+    processor = _processor(tree)
+    processor.copy_data()
+    resumed_bytes = output.read_bytes()
+
+    assert processor.resumed_files == 2
+    assert parsed == ["it.xlsx"]
+    assert processor.cells_copied == 18
+    assert not os.path.exists(str(output) + CHECKPOINT_SUFFIX)
+
+    output.unlink()
+    _processor(tree).copy_data()
+    assert output.read_bytes() == resumed_bytes
+    assert len(parsed) == 4
+
+
+def test_checkpoint_is_not_reused_after_a_finished_source_changed(tree):
+    good_it = (tree / "it.xlsx").read_bytes()
+    (tree / "it.xlsx").write_bytes(b"locked")
+    with pytest.raises(Exception):
+        _processor(tree).copy_data()
+
+    (tree / "it.xlsx").write_bytes(good_it)
+    _book(tree / "fr.xlsx", [["fr"], ["changed"]])
+    processor = _processor(tree)
+    processor.copy_data()
+
+    assert processor.resumed_files == 1
+
+
+def test_checkpoint_file_is_plain_json_and_round_trips_values_and_styles(tmp_path):
+    import datetime
+    import json
+    import pickle
+
+    from openpyxl.styles import Alignment, Border, PatternFill, Protection
+    from core.checkpoint import RunCheckpoint
+    from core.source_reader import CellStyle
+
+    target = tmp_path / "main.xlsx"
+    source = tmp_path / "de.xlsx"
+    target.write_bytes(b"t")
+    source.write_bytes(b"s")
+    style = CellStyle(Font(b=True), Border(), PatternFill("solid", fgColor="FFFFFF00"), "0.00",
+                      Protection(locked=False), Alignment(wrap_text=True))
+    writes = [
+        ("S1", 2, 2, "text", style),
+        ("S1", 3, 2, datetime.datetime(2024, 1, 2, 3, 4), style),
+        ("S1", 4, 2, 1.5, None),
+    ]
+    checkpoint = RunCheckpoint(str(tmp_path / "out.xlsx"), {"a": 1}, str(target))
+    checkpoint.start([])
+    checkpoint.begin_job(str(source))
+    for write in writes:
+        checkpoint.record(*write)
+    checkpoint.end_job(errors=1)
+    checkpoint.flush()
+
+    with open(checkpoint.path, encoding="utf-8") as f:
+        assert all(json.loads(line) for line in f)
+    records = RunCheckpoint(str(tmp_path / "out.xlsx"), {"a": 1}, str(target)).load([str(source)])
+    assert records[0]["writes"] == writes
+    assert records[0]["errors"] == 1
+
+    with open(checkpoint.path, "wb") as f:
+        pickle.dump({"version": 1}, f)
+    assert RunCheckpoint(str(tmp_path / "out.xlsx"), {"a": 1}, str(target)).load([str(source)]) == []
+
+
+def test_checkpoint_requires_patching_selected_sheets(tmp_path):
+    with pytest.raises(ValueError):
+        ExcelProcessor(
+            main_excel_path=str(tmp_path / "main.xlsx"),
+            folder_path=str(tmp_path),
+            copy_column="A",
+            selected_sheets=["S1"],
+            sheet_to_header_row={"S1": 0},
+            sheet_to_column={"S1": "A"},
+            checkpoint=True,
+        )
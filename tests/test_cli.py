@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import subprocess
+import sys
+
+from openpyxl import Workbook, load_workbook
+
+import cli
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _events(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.strip()]
+
+
+def _json(path, data):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+def test_copy_uses_gui_mapping_and_reports_metrics(tmp_path, capsys):
+    target = tmp_path / "target.xlsx"
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Sheet1"
+    ws.append(["EN", "DE"])
+    ws.append(["Hello", None])
+    wb.save(target)
+
+    folder = tmp_path / "tr"
+    folder.mkdir()
+    src = Workbook()
+    src.active.title = "Sheet1"
+    src.active.append(["x"])
+    src.active.append(["Hallo"])
+    src.save(folder / "de.xlsx")
+
+    code = cli.main([
+        "copy", str(target), "--folder", str(folder), "--mapping", _json(tmp_path / "m.json", {"de": "DE"}),
+        "--by-row-number", "--no-staging", "--log", str(tmp_path / "log.txt"),
+    ])
+    events = _events(capsys)
+
+    assert code == 0
+    done = events[-1]
+    assert done["event"] == "done"
+    assert any(e["event"] == "progress" for e in events)
+    assert done["metrics"]["cells_written"] >= 1 and "phases" in done["metrics"]
+    assert load_workbook(done["outputs"][0])["Sheet1"]["B2"].value == "Hallo"
+
+
+def test_errors_are_reported_as_json(tmp_path, capsys):
+    code = cli.main(["split", str(tmp_path / "missing.xlsx"), _json(tmp_path / "c.json", {"S": ["A", None, None]})])
+    events = _events(capsys)
+
+    assert code == cli.EXIT_ERROR
+    assert events[-1]["event"] == "error" and events[-1]["message"]
+
+
+def test_cli_and_engines_load_without_qt():
+    code = (
+        "import sys, cli, core.excel_processor, core.merge_columns, core.split_excel, "
+        "core.limit_auto, core.limit_manual; cli.build_parser(); "
+        "print(any(m.startswith('PySide6') for m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
+
+
+def test_journal_command_lists_cells(tmp_path, capsys):
+    from utils.logger import Logger
+
+    db = str(tmp_path / "j.sqlite")
+    log = Logger(None, journal=db)
+    run = log.begin_run("t.xlsx")
+    log.log_copy("S", 5, 2, "v")
+    log.end_run("ok")
+
+    assert cli.main(["journal", db, "--target", "t.xlsx", "--row", "5"]) == 0
+    events = _events(capsys)
+    assert [(e["event"], e["run_id"], e["value"]) for e in events] == [("cell", run, "v")]
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import pytest
+
+pytest.importorskip("PySide6.QtWidgets")
+from PySide6.QtWidgets import QApplication
+
+from gui.file_processor_app import run_option_kwargs
+from gui.pages.confirm_page import ConfirmPage
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication(sys.argv)
+    return app
+
+
+def test_run_options_are_off_by_default(qapp):
+    page = ConfirmPage([("de.xlsx", "DE")], ["DE"])
+
+    assert page.get_run_options() == {key: False for key, _title in ConfirmPage.RUN_OPTIONS}
+
+
+def test_folder_process_pool_only_when_ticked():
+    assert run_option_kwargs({}, folder_mode=True)["workers"] == 0
+    assert run_option_kwargs({"parallel": True}, folder_mode=False)["workers"] == 0
+    assert run_option_kwargs({"parallel": True}, folder_mode=True)["workers"] == min(os.cpu_count() or 1, 8)
+
+
+def test_partial_load_only_when_ticked():
+    assert not run_option_kwargs({}, folder_mode=False)["selected_sheets_only"]
+    assert run_option_kwargs({"selected_sheets_only": True}, folder_mode=False)["selected_sheets_only"]
+
+
+def test_run_cache_only_when_ticked():
+    assert not run_option_kwargs({}, folder_mode=False)["use_cache"]
+    assert run_option_kwargs({"use_cache": True}, folder_mode=False)["use_cache"]
+
+
+def test_incremental_writes_only_when_ticked_with_partial_load(qapp):
+    assert not run_option_kwargs({}, folder_mode=False)["incremental"]
+    assert run_option_kwargs({"selected_sheets_only": True, "incremental": True}, folder_mode=False)["incremental"]
+
+    page = ConfirmPage([("de.xlsx", "DE")], ["DE"], run_options={"selected_sheets_only": True, "incremental": True})
+    assert page.get_run_options()["incremental"]
+    page.option_checkboxes["selected_sheets_only"].setChecked(False)
+    assert not page.option_checkboxes["incremental"].isEnabled()
+    assert not page.get_run_options()["incremental"]
+
+
+def test_network_staging_only_when_ticked():
+    from core.staging import StagingCache
+    from gui.run_options import staging_for
+
+    assert run_option_kwargs({}, folder_mode=False)["staging"] is None
+    assert isinstance(run_option_kwargs({"staging": True}, folder_mode=False)["staging"], StagingCache)
+    assert staging_for(False) is None
+
+
+def test_results_are_always_published_from_a_local_file():
+    from core.publisher import Publisher
+
+    for options in ({}, {"staging": True}, {key: True for key, _title in ConfirmPage.RUN_OPTIONS}):
+        assert isinstance(run_option_kwargs(options, folder_mode=False)["publisher"], Publisher)
+
+
+def test_checkpoint_only_when_ticked_with_partial_load(qapp):
+    assert not run_option_kwargs({}, folder_mode=False)["checkpoint"]
+
+    page = ConfirmPage([("de.xlsx", "DE")], ["DE"], run_options={"checkpoint": True})
+    assert not page.option_checkboxes["checkpoint"].isEnabled()
+    assert not page.get_run_options()["checkpoint"]
+    page.option_checkboxes["selected_sheets_only"].setChecked(True)
+    page.option_checkboxes["checkpoint"].setChecked(True)
+    assert page.get_run_options()["checkpoint"]
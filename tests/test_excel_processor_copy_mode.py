@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
+import pytest
 from openpyxl import Workbook, load_workbook
 from openpyxl.styles import PatternFill
 
 from core.excel_processor import ExcelProcessor
+from core.verification import VERIFY_FAST
 
 
 class _DummyLogger:
@@ -120,6 +122,45 @@ def test_copy_data_row_number_mode_without_skip_keeps_absolute_row_numbers(tmp_p
     wb.close()
 
 
+def test_copy_data_preserve_formatting_handles_blank_cells_in_source_column(tmp_path):
+    from openpyxl.styles import Font
+
+    main = tmp_path / "main_gap.xlsx"
+    src = tmp_path / "src_gap.xlsx"
+    _create_main_book(main)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Sheet1"
+    ws["A1"] = "SRC"
+    ws["A2"] = "de 1"
+    ws["A3"] = "de 2"
+    ws["A3"].font = Font(bold=True)
+    ws["A4"] = "de 3"
+    ws["A6"] = "de 5"
+    wb.save(src)
+    wb.close()
+
+    processor = ExcelProcessor(
+        main_excel_path=str(main),
+        folder_path="",
+        copy_column="A",
+        selected_sheets=["Sheet1"],
+        sheet_to_header_row={"Sheet1": 0},
+        sheet_to_column={"Sheet1": "A"},
+        file_to_column={str(src): "Target"},
+        copy_by_row_number=True,
+        preserve_formatting=True,
+        logger=_DummyLogger(),
+    )
+    output = processor.copy_data()
+    assert processor.source_errors == 0
+    wb = load_workbook(output)
+    ws = wb["Sheet1"]
+    assert [ws.cell(row=row, column=2).value for row in range(2, 7)] == ["de 1", "de 2", "de 3", None, "de 5"]
+    assert ws["B3"].font.b
+    wb.close()
+
+
 def test_get_data_max_row_ignores_style_only_rows(tmp_path):
     src = tmp_path / "style_only.xlsx"
     wb = Workbook()
@@ -132,3 +173,299 @@ def test_get_data_max_row_ignores_style_only_rows(tmp_path):
     ws = wb.active
     assert ExcelProcessor._get_data_max_row(ws) == 0
     wb.close()
+
+
+def _create_multi_sheet_book(path, sheets):
+    wb = Workbook()
+    wb.remove(wb.active)
+    for title, rows in sheets.items():
+        ws = wb.create_sheet(title)
+        for row in rows:
+            ws.append(row)
+    wb.save(path)
+    wb.close()
+
+
+def test_copy_data_folder_mode_opens_each_source_once(tmp_path, monkeypatch):
+    import core.source_reader as source_reader
+
+    main = tmp_path / "main_multi.xlsx"
+    _create_multi_sheet_book(main, {
+        "S1": [["ID", "DE"], ["k1", None]],
+        "S2": [["ID", "DE"], ["k2", None]],
+    })
+    lang_dir = tmp_path / "langs" / "de"
+    lang_dir.mkdir(parents=True)
+    src = lang_dir / "de.xlsx"
+    _create_multi_sheet_book(src, {"S1": [["v1"]], "S2": [["v2"]]})
+
+    opened = []
+    real_load = source_reader.load_workbook
+
+    def counting_load(path, *args, **kwargs):
+        opened.append(str(path))
+        return real_load(path, *args, **kwargs)
+
+    monkeypatch.setattr(source_reader, "load_workbook", counting_load)
+
+    processor = ExcelProcessor(
+        main_excel_path=str(main),
+        folder_path=str(tmp_path / "langs"),
+        copy_column="A",
+        selected_sheets=["S1", "S2"],
+        sheet_to_header_row={"S1": 0, "S2": 0},
+        sheet_to_column={"S1": "A", "S2": "A"},
+        folder_to_column={"de": "DE"},
+        logger=_DummyLogger(),
+    )
+    calls = []
+    output = processor.copy_data(progress_callback=lambda done, total: calls.append((done, total)))
+
+    assert opened.count(str(src)) == 1
+    assert calls == [(1, 2), (2, 2)]
+    wb = load_workbook(output)
+    assert wb["S1"]["B2"].value == "v1"
+    assert wb["S2"]["B2"].value == "v2"
+    wb.close()
+
+
+def test_read_column_values_streams_single_column(tmp_path):
+    src = tmp_path / "stream.xlsx"
+    wb = Workbook()
+    ws = wb.active
+    ws["A1"] = "skip"
+    ws["B1"] = "h"
+    ws["B3"] = "v3"
+    ws["B4"] = 4
+    ws["B9000"].fill = PatternFill(start_color="EEEEEE", end_color="EEEEEE", fill_type="solid")
+    wb.save(src)
+    wb.close()
+
+    wb = load_workbook(src, read_only=True)
+    try:
+        assert ExcelProcessor._read_column_values(wb.active, 2) == ["h", None, "v3", 4]
+    finally:
+        wb.close()
+
+
+def test_copy_data_values_only_opens_sources_read_only(tmp_path, monkeypatch):
+    import core.excel_processor as excel_processor
+    import core.source_reader as source_reader
+
+    real_load = excel_processor.load_workbook
+    modes = {}
+
+    def recording_load(path, *args, **kwargs):
+        modes[str(path)] = kwargs.get("read_only", False)
+        return real_load(path, *args, **kwargs)
+
+    monkeypatch.setattr(excel_processor, "load_workbook", recording_load)
+    monkeypatch.setattr(source_reader, "load_workbook", recording_load)
+    values = _run_copy(tmp_path, copy_by_row_number=False)
+
+    assert values == ["v1", "v3", None]
+    assert modes[str(tmp_path / "src_seq.xlsx")] is True
+    assert modes[str(tmp_path / "main_seq.xlsx")] is False
+
+
+class _WarningLogger(_DummyLogger):
+    def __init__(self):
+        self.warnings = []
+
+    def log_warning(self, text):
+        self.warnings.append(text)
+
+
+@pytest.mark.parametrize("preserve_formatting", [False, True])
+def test_copy_data_key_mode_matches_rows_by_id(tmp_path, preserve_formatting):
+    main = tmp_path / "main_key.xlsx"
+    _create_multi_sheet_book(main, {
+        "Sheet1": [["ID", "Target"], ["k1", None], ["k2", None], [3, None], ["k2", None]],
+    })
+    src = tmp_path / "src_key.xlsx"
+    _create_multi_sheet_book(src, {
+        "Sheet1": [["ID", "Text"], [3.0, "v3"], ["k1", "v1"], ["gone", "vx"], ["k2 ", "v2"]],
+    })
+
+    logger = _WarningLogger()
+    processor = ExcelProcessor(
+        main_excel_path=str(main),
+        folder_path="",
+        copy_column="B",
+        selected_sheets=["Sheet1"],
+        sheet_to_header_row={"Sheet1": 0},
+        sheet_to_column={"Sheet1": "B"},
+        file_to_column={str(src): "Target"},
+        skip_first_row=True,
+        preserve_formatting=preserve_formatting,
+        logger=logger,
+        key_column="ID",
+        source_key_column="A",
+    )
+    output = processor.copy_data()
+
+    wb = load_workbook(output)
+    ws = wb["Sheet1"]
+    assert [ws.cell(row=r, column=2).value for r in range(2, 6)] == ["v1", "v2", "v3", None]
+    wb.close()
+    assert any("Дубликат ключа 'k2'" in w for w in logger.warnings)
+    assert any("Ключ 'gone' не найден" in w for w in logger.warnings)
+
+
+@pytest.mark.parametrize("source_key_column", ["1", "A1", ""])
+def test_key_mode_rejects_source_key_that_is_not_a_column_letter(tmp_path, source_key_column):
+    with pytest.raises(ValueError, match="буквой столбца"):
+        ExcelProcessor(
+            main_excel_path=str(tmp_path / "main.xlsx"),
+            folder_path=str(tmp_path),
+            copy_column="A",
+            selected_sheets=["Sheet1"],
+            sheet_to_header_row={"Sheet1": 0},
+            sheet_to_column={"Sheet1": "A"},
+            logger=_DummyLogger(),
+            key_column="ID",
+            source_key_column=source_key_column,
+        )
+
+
+@pytest.mark.parametrize("preserve_formatting", [False, True])
+def test_copy_data_selected_sheets_only_keeps_other_sheets_byte_identical(tmp_path, preserve_formatting):
+    import zipfile
+    from core.xlsx_package import sheet_parts
+
+    main = tmp_path / "main_partial.xlsx"
+    _create_multi_sheet_book(main, {
+        "S1": [["ID", "DE"], ["k1", None], ["k2", None]],
+        "Big": [["untouched", n] for n in range(50)],
+    })
+    src = tmp_path / "de.xlsx"
+    _create_multi_sheet_book(src, {"S1": [["v1"], ["v2"]]})
+
+    processor = ExcelProcessor(
+        main_excel_path=str(main),
+        folder_path=str(tmp_path),
+        copy_column="A",
+        selected_sheets=["S1"],
+        sheet_to_header_row={"S1": 0},
+        sheet_to_column={"S1": "A"},
+        file_to_column={"de.xlsx": "DE"},
+        logger=_DummyLogger(),
+        preserve_formatting=preserve_formatting,
+        selected_sheets_only=True,
+        verify_mode=VERIFY_FAST,
+    )
+    output = processor.copy_data()
+
+    assert processor.verification_mismatches == []
+    with zipfile.ZipFile(main) as a, zipfile.ZipFile(output) as b:
+        part = sheet_parts(a)["Big"]
+        assert a.read(part) == b.read(part)
+    wb = load_workbook(output)
+    assert [wb["S1"]["B2"].value, wb["S1"]["B3"].value] == ["v1", "v2"]
+    assert wb["Big"]["B50"].value == 49
+    wb.close()
+
+
+def test_copy_data_cancel_stops_between_files_without_output(tmp_path):
+    from core.cancel import CancelToken, OperationCancelled
+
+    main = tmp_path / "main_cancel.xlsx"
+    _create_multi_sheet_book(main, {"S1": [["ID", "DE"], ["k1", None]]})
+    lang_dir = tmp_path / "langs" / "de"
+    lang_dir.mkdir(parents=True)
+    for name in ("a.xlsx", "b.xlsx"):
+        _create_multi_sheet_book(lang_dir / name, {"S1": [["v"]]})
+
+    token = CancelToken()
+    statuses = []
+
+    def on_status(status):
+        statuses.append(status)
+        token.cancel()
+
+    processor = ExcelProcessor(
+        main_excel_path=str(main),
+        folder_path=str(tmp_path / "langs"),
+        copy_column="A",
+        selected_sheets=["S1"],
+        sheet_to_header_row={"S1": 0},
+        sheet_to_column={"S1": "A"},
+        folder_to_column={"de": "DE"},
+        logger=_DummyLogger(),
+        prefetch_depth=0,
+    )
+    with pytest.raises(OperationCancelled):
+        processor.copy_data(cancel_token=token, status_callback=on_status)
+
+    assert statuses == [{"step": 0, "steps": 1, "files_done": 1, "files_total": 2, "cells": 1}]
+    assert not (tmp_path / "main_cancel_out.xlsx").exists()
+
+
+def test_style_mapper_matches_apply_cell_style_and_interns_once():
+    from openpyxl.styles import Alignment, Font, PatternFill
+
+    from core.source_reader import CellStyleMapper, apply_cell_style, capture_cell_style
+
+    src = Workbook().active
+    src["A1"].font = Font(bold=True)
+    src["A1"].fill = PatternFill(fill_type="solid", fgColor="FFFF00")
+    src["A2"].number_format = "0.00"
+    src["A2"].alignment = Alignment(wrap_text=True)
+    styles = [capture_cell_style(src["A1"]), capture_cell_style(src["A2"])]
+
+    expected, actual = Workbook().active, Workbook().active
+    mapper = CellStyleMapper()
+    for row in range(1, 201):
+        style = styles[row % 2]
+        apply_cell_style(expected.cell(row=row, column=1), style)
+        mapper.apply(actual.cell(row=row, column=1), style)
+    # Равный, но другой объект стиля (например, из другой книги-источника).
+    mapper.apply(actual.cell(row=201, column=1), capture_cell_style(src["A1"]))
+    apply_cell_style(expected.cell(row=201, column=1), styles[0])
+
+    assert mapper.translated == 2
+    for row in range(1, 202):
+        e, a = expected.cell(row=row, column=1), actual.cell(row=row, column=1)
+        assert capture_cell_style(a) == capture_cell_style(e)
+
+
+@pytest.mark.parametrize("selected_sheets_only", [False, True])
+def test_copy_data_writes_dates_into_cells_without_date_format(tmp_path, selected_sheets_only):
+    import datetime
+    from openpyxl.styles import Border, Side
+    from openpyxl.styles.numbers import is_date_format
+
+    main = tmp_path / "main_dates.xlsx"
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "S1"
+    ws.append(["ID", "DE"])
+    for row in (2, 3):
+        ws.cell(row=row, column=1, value=f"k{row}")
+        ws.cell(row=row, column=2).border = Border(left=Side("thin"))
+    wb.save(main)
+    wb.close()
+    stamp = datetime.datetime(2024, 1, 2, 3, 4, 5)
+    _create_multi_sheet_book(tmp_path / "de.xlsx", {"S1": [[stamp], [datetime.date(2024, 2, 3)]]})
+
+    processor = ExcelProcessor(
+        main_excel_path=str(main),
+        folder_path=str(tmp_path),
+        copy_column="A",
+        selected_sheets=["S1"],
+        sheet_to_header_row={"S1": 0},
+        sheet_to_column={"S1": "A"},
+        file_to_column={"de.xlsx": "DE"},
+        logger=_DummyLogger(),
+        selected_sheets_only=selected_sheets_only,
+    )
+    output = processor.copy_data()
+
+    wb = load_workbook(output)
+    b2, b3 = wb["S1"]["B2"], wb["S1"]["B3"]
+    assert b2.value == stamp
+    assert b3.value == datetime.datetime(2024, 2, 3)
+    assert is_date_format(b2.number_format) and is_date_format(b3.number_format)
+    assert b2.border.left.style == "thin"
+    wb.close()
+
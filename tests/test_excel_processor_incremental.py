@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+import os
+
+from openpyxl import Workbook, load_workbook
+
+from core.excel_processor import ExcelProcessor
+
+
+class _CopyLogger:
+    def __init__(self):
+        self.copies = []
+
+    def log_error(self, *args, **kwargs):
+        return None
+
+    def log_info(self, *args, **kwargs):
+        return None
+
+    def log_copy(self, sheet, row, col, value):
+        self.copies.append((sheet, row, col, value))
+
+    def save(self):
+        return None
+
+
+def _save_book(path, rows, title="S1"):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = title
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+    wb.close()
+
+
+def _run(tmp_path, **kwargs):
+    logger = _CopyLogger()
+    processor = ExcelProcessor(
+        main_excel_path=str(tmp_path / "main.xlsx"),
+        folder_path=str(tmp_path),
+        copy_column="A",
+        selected_sheets=["S1"],
+        sheet_to_header_row={"S1": 0},
+        sheet_to_column={"S1": "A"},
+        file_to_column={"de.xlsx": "DE"},
+        copy_by_row_number=True,
+        logger=logger,
+        selected_sheets_only=True,
+        incremental=True,
+        **kwargs,
+    )
+    output = processor.copy_data()
+    wb = load_workbook(output)
+    values = [row[1] for row in wb["S1"].iter_rows(min_row=2, values_only=True)]
+    wb.close()
+    return processor, logger.copies, values
+
+
+def test_incremental_run_writes_and_logs_only_changed_rows(tmp_path):
+    rows = [[f"k{i}", "orig"] for i in range(1, 6)]
+    _save_book(tmp_path / "main.xlsx", [["ID", "DE"], *rows])
+    _save_book(tmp_path / "de.xlsx", [["x"], *[[f"v{i}"] for i in range(1, 6)]])
+
+    _, copies, values = _run(tmp_path)
+    assert len(copies) == 6
+    assert os.path.exists(tmp_path / "main_out.xlsx.delta.json")
+
+    _save_book(tmp_path / "de.xlsx", [["x"], ["v1"], ["v2 new"], ["v3"], ["v4"], ["v5"]])
+    processor, copies, values = _run(tmp_path)
+    assert copies == [("S1", 3, 2, "v2 new")]
+    assert processor.cells_unchanged == 5
+    assert values == ["v1", "v2 new", "v3", "v4", "v5"]
+
+    # Строка исчезла из перевода: в ячейке снова исходное значение цели.
+    _save_book(tmp_path / "de.xlsx", [["x"], ["v1"], ["v2 new"], ["v3"], ["v4"]])
+    _, copies, values = _run(tmp_path)
+    assert copies == []
+    assert values == ["v1", "v2 new", "v3", "v4", "orig"]
+
+
+def test_incremental_run_rebuilds_when_target_changes(tmp_path):
+    _save_book(tmp_path / "main.xlsx", [["ID", "DE"], ["k1", None], ["k2", None]])
+    _save_book(tmp_path / "de.xlsx", [["x"], ["v1"], ["v2"]])
+    _run(tmp_path)
+
+    _save_book(tmp_path / "main.xlsx", [["ID", "DE"], ["k1", None], ["k2", None], ["k3", "t3"]])
+    _, copies, values = _run(tmp_path)
+
+    assert len(copies) == 3
+    assert values == ["v1", "v2", "t3"]
+
+
+def test_incremental_run_clears_stale_rows_past_the_target_end(tmp_path):
+    _save_book(tmp_path / "main.xlsx", [["ID", "DE"], ["k1", "orig"]])
+    _save_book(tmp_path / "de.xlsx", [["x"], ["v1"], ["v2"], ["v3"]])
+    _, _, values = _run(tmp_path, preserve_formatting=True)
+    assert values == ["v1", "v2", "v3"]
+
+    _save_book(tmp_path / "de.xlsx", [["x"], ["v1"]])
+    _, copies, values = _run(tmp_path, preserve_formatting=True)
+    assert copies == []
+    assert values == ["v1", None, None]
+
+
+def test_repeated_incremental_runs_reuse_appended_styles(tmp_path):
+    import re
+    import zipfile
+
+    from openpyxl.styles import Font
+
+    def save_source(second):
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "S1"
+        for row in [["x"], ["v1"], [second], ["v3"]]:
+            ws.append(row)
+        for cell in ws["A"]:
+            cell.font = Font(bold=True, color="FFFF0000")
+        wb.save(tmp_path / "de.xlsx")
+        wb.close()
+
+    def xf_count():
+        with zipfile.ZipFile(tmp_path / "main_out.xlsx") as archive:
+            styles = archive.read("xl/styles.xml").decode("utf-8")
+        return len(re.findall(r"<xf[\s>/]", re.search(r"<cellXfs.*?</cellXfs>", styles, re.S).group(0)))
+
+    _save_book(tmp_path / "main.xlsx", [["ID", "DE"], *[[f"k{i}", "orig"] for i in range(1, 4)]])
+    save_source("v2")
+    _run(tmp_path, preserve_formatting=True)
+    first = xf_count()
+
+    for second in ("v2 new", "v2 newer"):
+        save_source(second)
+        _, copies, values = _run(tmp_path, preserve_formatting=True)
+        assert copies == [("S1", 3, 2, second)]
+        assert values == ["v1", second, "v3"]
+        assert xf_count() == first
+
+    wb = load_workbook(tmp_path / "main_out.xlsx")
+    assert wb["S1"]["B3"].font.b
+    wb.close()
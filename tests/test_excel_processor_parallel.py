@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import pickle
+
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font
+
+from core.excel_processor import ExcelProcessor
+from core.source_reader import SheetNotFoundError
+
+
+class _RecordingLogger:
+    def __init__(self):
+        self.entries = []
+
+    def log_error(self, *args):
+        self.entries.append(("ERROR",) + tuple(str(a) for a in args))
+
+    def log_info(self, text):
+        self.entries.append(("INFO", text))
+
+    def log_copy(self, *args):
+        self.entries.append(("COPY",) + tuple(str(a) for a in args))
+
+    def save(self):
+        return None
+
+
+def _build_tree(tmp_path):
+    main = tmp_path / "main.xlsx"
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "S1"
+    ws.append(["ID", "de", "fr", "it"])
+    for i in range(1, 4):
+        ws.append([f"k{i}"])
+    wb.create_sheet("S2").append(["ID", "de", "fr", "it"])
+    wb.save(main)
+    wb.close()
+
+    langs = tmp_path / "langs"
+    for lang in ("de", "fr", "it"):
+        folder = langs / lang
+        folder.mkdir(parents=True)
+        if lang == "it":
+            (folder / "broken.xlsx").write_bytes(b"not a zip")
+            continue
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "S1"
+        for i in range(1, 4):
+            ws.append([f"{lang}-{i}"])
+        ws["A2"].font = Font(bold=True)
+        wb.create_sheet("Other")
+        wb.save(folder / f"{lang}.xlsx")
+        wb.close()
+    return main, langs
+
+
+def _run(main, langs, workers):
+    logger = _RecordingLogger()
+    processor = ExcelProcessor(
+        main_excel_path=str(main),
+        folder_path=str(langs),
+        copy_column="A",
+        selected_sheets=["S1", "S2"],
+        sheet_to_header_row={"S1": 0, "S2": 0},
+        sheet_to_column={"S1": "A", "S2": "A"},
+        folder_to_column={"de": "de", "fr": "fr", "it": "it"},
+        preserve_formatting=True,
+        logger=logger,
+        workers=workers,
+    )
+    output = processor.copy_data()
+    wb = load_workbook(output)
+    ws = wb["S1"]
+    cells = [(c.value, bool(c.font.b)) for row in ws.iter_rows(min_row=2, min_col=2, max_col=4) for c in row]
+    wb.close()
+    # Время и память отличаются от запуска к запуску.
+    entries = [e for e in logger.entries if not e[-1].startswith("Метрики:")]
+    return cells, entries
+
+
+def test_parallel_folder_mode_matches_sequential(tmp_path):
+    main, langs = _build_tree(tmp_path)
+    sequential = _run(main, langs, workers=0)
+    parallel = _run(main, langs, workers=2)
+
+    assert parallel == sequential
+    cells, entries = parallel
+    assert cells[:3] == [("de-1", False), ("fr-1", False), (None, False)]
+    assert cells[3] == ("de-2", True)
+    errors = [e for e in entries if e[0] == "ERROR"]
+    assert any("broken.xlsx" in e[1] for e in errors)
+    assert any("Не найден лист 'S2'" in e[1] for e in errors)
+
+
+def test_sheet_not_found_error_survives_pickling():
+    error = pickle.loads(pickle.dumps(SheetNotFoundError("S2", ["A", "B"])))
+    assert error.sheetnames == ["A", "B"]
+    with pytest.raises(SheetNotFoundError, match="S2"):
+        raise error
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+import core.excel_processor as excel_processor
+from core.run_metrics import RunMetrics
+from utils.log_transport import LogCollector, WorkerLog, run_logged, worker_log
+from utils.logger import logger
+
+
+class _Logger:
+    def __init__(self):
+        self.entries = []
+
+    def log_copy(self, *args):
+        self.entries.append(("COPY",) + args)
+
+    def log_error(self, *args):
+        self.entries.append(("ERROR",) + args)
+
+    def log_info(self, text):
+        self.entries.append(("INFO", text))
+
+
+def _job(name, rows, delay):
+    log = worker_log()
+    time.sleep(delay)
+    log.log_info(f"start {name}")
+    for row in range(rows):
+        log.log_copy(name, row, 1, f"{name}{row}")
+    log.metric("cell_writes", 0.5)
+    if name == "bad":
+        raise ValueError("boom")
+    return rows
+
+
+def test_records_arrive_in_job_order_with_batching(tmp_path):
+    logger, metrics = _Logger(), RunMetrics()
+    collector = LogCollector(logger=logger, metrics=metrics)
+    jobs = [("a", 1200, 0.3), ("bad", 3, 0.0), ("c", 5, 0.0)]
+    with ProcessPoolExecutor(max_workers=3, **collector.pool_kwargs()) as pool:
+        futures = [pool.submit(run_logged, collector.start(job), _job, *args) for job, args in enumerate(jobs)]
+        assert collector.wait(len(jobs) - 1, timeout=30)
+    collector.close()
+
+    assert futures[0].result() == 1200 and isinstance(futures[1].exception(), ValueError)
+    # Первое задание закончилось последним, но его записи идут первыми.
+    names = [entry[1] for entry in logger.entries if entry[0] == "COPY"]
+    assert names == ["a"] * 1200 + ["bad"] * 3 + ["c"] * 5
+    assert [entry[1] for entry in logger.entries if entry[0] == "INFO"] == ["start a", "start bad", "start c"]
+    assert [entry[2] for entry in logger.entries if entry[1] == "a"] == list(range(1200))
+    assert metrics.phases["cell_writes"] == 1.5
+
+
+def test_records_of_a_dead_attempt_are_dropped():
+    sink = _Logger()
+    collector = LogCollector(logger=sink)
+    dead = WorkerLog(collector.start(0), collector.queue)
+    dead.log_info("first try")
+    dead.flush()
+    retry = WorkerLog(collector.start(0), collector.queue)
+    dead.log_info("late record of the first try")
+    dead.close()
+    retry.log_info("second try")
+
+    # Без метки конца задания ничего не выдаётся.
+    assert not collector.wait(0, timeout=0.3)
+    retry.close()
+    assert collector.wait(0, timeout=5)
+    collector.close()
+
+    assert sink.entries == [("INFO", "second try")]
+
+
+_original_read_source_columns = excel_processor.read_source_columns
+
+
+def _logging_read_source_columns(file_path, requests, preserve_formatting=False):
+    logger.warning("parsing %s", file_path.rsplit("/", 1)[-1])
+    return _original_read_source_columns(file_path, requests, preserve_formatting)
+
+
+class _CopyLogger:
+    def log_info(self, text):
+        pass
+
+    def log_error(self, *args):
+        pass
+
+    def log_warning(self, text):
+        pass
+
+    def log_copy(self, *args):
+        pass
+
+    def save(self):
+        pass
+
+
+def test_processor_workers_forward_app_logger_messages_in_file_order(tmp_path, monkeypatch):
+    if multiprocessing.get_start_method() != "fork":
+        pytest.skip("подмена функции видна только дочерним процессам fork")
+    monkeypatch.setattr(excel_processor, "read_source_columns", _logging_read_source_columns)
+    main = tmp_path / "main.xlsx"
+    wb = Workbook()
+    wb.active.title = "S"
+    wb.active.append(["ID", "DE", "FR", "IT"])
+    wb.active.append(["k1", None, None, None])
+    wb.save(main)
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    for lang in ("de", "fr", "it"):
+        wb = Workbook()
+        wb.active.title = "S"
+        wb.active.append([lang])
+        wb.save(sources / f"{lang}.xlsx")
+
+    lines = []
+    handler = logging.Handler()
+    handler.emit = lambda record: lines.append(record.getMessage())
+    logger.addHandler(handler)
+    try:
+        processor = excel_processor.ExcelProcessor(
+            main_excel_path=str(main),
+            folder_path=str(sources),
+            copy_column="A",
+            selected_sheets=["S"],
+            sheet_to_header_row={"S": 0},
+            sheet_to_column={"S": "A"},
+            file_to_column={"de.xlsx": "DE", "fr.xlsx": "FR", "it.xlsx": "IT"},
+            logger=_CopyLogger(),
+            workers=2,
+        )
+        output = processor.copy_data()
+    finally:
+        logger.removeHandler(handler)
+
+    assert [line for line in lines if line.startswith("parsing")] == [
+        "parsing de.xlsx", "parsing fr.xlsx", "parsing it.xlsx"]
+    wb = load_workbook(output)
+    assert [cell.value for cell in wb["S"][2]] == ["k1", "de", "fr", "it"]
+    wb.close()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+
+from utils.logger import Logger, logger
+
+
+def test_copy_entries_stay_off_console_and_reach_the_file(tmp_path, caplog):
+    log = Logger(str(tmp_path / "log.txt"))
+    with caplog.at_level(logging.DEBUG, logger=logger.name):
+        log.log_copy("Sheet", 2, 3, "Hallo")
+        log.log_info("done")
+        log.save()
+
+    assert [r.getMessage() for r in caplog.records] == ["INFO: done"]
+    lines = (tmp_path / "log.txt").read_text(encoding="utf-8").splitlines()
+    assert lines[0].endswith("COPY: Sheet R2C3 -> 'Hallo'")
+    assert lines[1].endswith("INFO: done")
+
+
+def test_json_lines_and_size_rotation(tmp_path):
+    path = tmp_path / "log.jsonl"
+    log = Logger(str(path), fmt="json", max_bytes=1000, backup_count=2, queue_size=10)
+    for row in range(30):
+        log.log_copy("Sheet", row, 1, f"value {row}")
+        if row % 5 == 4:
+            log.save()  # каждая партия — отдельная запись на диск
+    log.save()
+
+    records = []
+    for name in (f"{path}.2", f"{path}.1", str(path)):
+        with open(name, encoding="utf-8") as f:
+            records += [json.loads(line) for line in f]
+    assert not (tmp_path / "log.jsonl.3").exists()
+    assert all(r["level"] == "COPY" and r["sheet"] == "Sheet" for r in records)
+    # Шесть партий по ~800 байт: файл и две копии хранят последние три.
+    assert [r["row"] for r in records] == list(range(15, 30))
+
+
+def test_journal_records_runs_and_cells(tmp_path):
+    from utils.journal import CopyJournal
+
+    db = str(tmp_path / "journal.sqlite")
+    log = Logger(str(tmp_path / "log.txt"), file_level=logging.INFO, journal=db)
+    first = log.begin_run(str(tmp_path / "target.xlsx"))
+    log.log_copy("1.83.0", 1532, 2, "Hallo")
+    log.log_info("not a cell")
+    log.end_run("ok", "target_out.xlsx")
+    second = log.begin_run(str(tmp_path / "target.xlsx"))
+    log.log_copy("1.83.0", 1532, 2, "Hi")
+    log.log_error("1.83.0", 1533, 2, None)
+    log.end_run("failed")
+
+    journal = CopyJournal(db)
+    hits = journal.events(target=str(tmp_path / "target.xlsx"), sheet="1.83.0", row=1532, col=2)
+    assert [(h["run_id"], h["value"], h["run_status"]) for h in hits] == [(second, "Hi", "failed"),
+                                                                        (first, "Hallo", "ok")]
+    runs = journal.runs()
+    assert [(r["id"], r["copies"], r["errors"]) for r in runs] == [(second, 1, 1), (first, 1, 0)]
+    assert runs[1]["output"] == "target_out.xlsx"
+    # COPY не попал в текстовый журнал (file_level=INFO), но есть в SQLite.
+    assert "COPY" not in (tmp_path / "log.txt").read_text(encoding="utf-8")
@@ -10,7 +10,8 @@ pytest.importorskip("PySide6")
 
 from PySide6.QtCore import Signal
 from PySide6.QtWidgets import QApplication, QWidget, QMessageBox
-from core.main_page_logic import MainPageLogic
+from gui.main_page_logic import MainPageLogic
+from utils.i18n import tr
 
 @pytest.fixture(scope="session")
 def qapp():
@@ -86,3 +87,26 @@ def test_main_page_logic_validation(qapp, monkeypatch, tmp_path):
     ui.sheet_list = DummySheetList(count=1, checked=True, names=["Sheet1"])
 
     assert logic.validate_inputs()
+
+
+def test_key_mode_requires_source_key_letter(qapp, monkeypatch, tmp_path):
+    messages = []
+    monkeypatch.setattr(QMessageBox, "critical", lambda _parent, _title, text: messages.append(text))
+
+    ui = DummyUI()
+    logic = MainPageLogic(ui)
+    file_path = tmp_path / "file.xlsx"
+    file_path.write_bytes(b"")
+    ui.folder_entry.setText(str(tmp_path))
+    ui.excel_file_entry.setText(str(file_path))
+    ui.copy_column_entry.setText("A")
+    ui.sheet_list = DummySheetList(count=1, checked=True, names=["Sheet1"])
+    ui.copy_by_key_radio = type("Radio", (), {"isChecked": lambda self: True})()
+    ui.key_column_entry = DummyEntry("ID")
+    ui.source_key_column_entry = DummyEntry("1")
+
+    assert not logic.validate_inputs()
+    assert messages == [tr("Ключ в переводах укажи буквой столбца, например A.")]
+
+    ui.source_key_column_entry.setText("B")
+    assert logic.validate_inputs()
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import os
 from openpyxl import Workbook, load_workbook
 from openpyxl.styles import PatternFill
 from core.merge_columns import merge_excel_columns, _get_data_max_row
@@ -109,3 +110,231 @@ def test_merge_excel_columns_handles_style_only_source_sheet(tmp_path):
     assert ws["B2"].value is None
     assert ws["B3"].value is None
     wb.close()
+
+
+def test_merge_excel_columns_keeps_untouched_sheets_and_copies_styles(tmp_path):
+    import zipfile
+    from core.xlsx_package import sheet_parts
+
+    main_path = tmp_path / "main.xlsx"
+    src_path = tmp_path / "src.xlsx"
+    wb = Workbook()
+    wb.active.title = "Main"
+    wb.active["A1"] = "h1"
+    other = wb.create_sheet("Other")
+    other["A1"] = "keep"
+    wb.save(main_path)
+    wb.close()
+    wb_src = Workbook()
+    wb_src.active["A1"] = "x"
+    wb_src.active["A1"].fill = PatternFill(start_color="FF00FF00", end_color="FF00FF00", fill_type="solid")
+    wb_src.save(src_path)
+    wb_src.close()
+
+    output = merge_excel_columns(str(main_path), [{
+        "source": str(src_path),
+        "source_columns": ["A"],
+        "target_sheet": "Main",
+        "target_columns": ["B"],
+    }])
+
+    with zipfile.ZipFile(main_path) as a, zipfile.ZipFile(output) as b:
+        part = sheet_parts(a)["Other"]
+        assert a.read(part) == b.read(part)
+    wb = load_workbook(output)
+    assert wb["Main"]["B1"].value == "x"
+    assert wb["Main"]["B1"].fill.fgColor.rgb == "FF00FF00"
+    assert wb["Main"]["A1"].value == "h1"
+    wb.close()
+
+
+def test_merge_excel_columns_values_only_keeps_target_formatting(tmp_path):
+    main_path = tmp_path / "main.xlsx"
+    src_path = tmp_path / "src.xlsx"
+    wb = Workbook()
+    wb.active.title = "Main"
+    wb.active["B1"] = "old"
+    wb.active["B1"].fill = PatternFill(start_color="FFFF0000", end_color="FFFF0000", fill_type="solid")
+    wb.save(main_path)
+    wb.close()
+    wb_src = Workbook()
+    wb_src.active["A1"] = "x"
+    wb_src.active["A1"].fill = PatternFill(start_color="FF00FF00", end_color="FF00FF00", fill_type="solid")
+    wb_src.active["A3"] = 7
+    wb_src.save(src_path)
+    wb_src.close()
+
+    output = merge_excel_columns(str(main_path), [{
+        "source": str(src_path),
+        "source_columns": ["A"],
+        "target_sheet": "Main",
+        "target_columns": ["B"],
+    }], copy_styles=False)
+
+    wb = load_workbook(output)
+    ws = wb["Main"]
+    assert ws["B1"].value == "x"
+    assert ws["B1"].fill.fgColor.rgb == "FFFF0000"
+    assert ws["B2"].value is None
+    assert ws["B3"].value == 7
+    wb.close()
+
+
+def test_source_cache_parses_each_source_once_per_session(tmp_path, monkeypatch):
+    import core.source_cache as source_cache_module
+    from core.source_cache import SourceColumnCache
+
+    src_path = tmp_path / "src.xlsx"
+    create_wb(src_path, {"A": ["x", "y"], "B": ["1", "2"]})
+    targets = []
+    for name in ("t1", "t2"):
+        path = tmp_path / f"{name}.xlsx"
+        create_wb(path, {"A": ["h1", "h2"]}, sheet_name="Main")
+        targets.append(path)
+    parsed = []
+    real_read = source_cache_module.read_columns
+    monkeypatch.setattr(source_cache_module, "read_columns",
+                        lambda path, columns, sheet=None, **kw: parsed.append(sorted(columns)) or real_read(path, columns, sheet, **kw))
+
+    cache = SourceColumnCache()
+    tasks = [
+        (targets[0], [{"source": str(src_path), "source_columns": ["A"], "target_sheet": "Main", "target_columns": ["B"]}]),
+        (targets[1], [{"source": str(src_path), "source_columns": ["B"], "target_sheet": "Main", "target_columns": ["C"]}]),
+    ]
+    for _target, mappings in tasks:
+        for mp in mappings:
+            cache.expect(mp["source"], mp["source_columns"])
+    outputs = [merge_excel_columns(str(target), mappings, source_cache=cache) for target, mappings in tasks]
+
+    assert parsed == [["A", "B"]] and cache.hits == 1
+    assert [c.value for c in load_workbook(outputs[0])["Main"]["B"]] == ["x", "y"]
+    assert [c.value for c in load_workbook(outputs[1])["Main"]["C"]] == ["1", "2"]
+
+
+def test_source_cache_evicts_least_recently_used_sources(tmp_path):
+    from core.source_cache import SourceColumnCache
+
+    paths = []
+    for name in ("a", "b", "c"):
+        path = tmp_path / f"{name}.xlsx"
+        create_wb(path, {"A": [name * 100] * 10})
+        paths.append(str(path))
+    cache = SourceColumnCache()
+    cache.columns(paths[0], ["A"])
+    cache.max_bytes = cache.size * 2 + 1  # помещаются два файла
+
+    cache.columns(paths[1], ["A"])
+    cache.columns(paths[0], ["A"])  # «a» использован позже «b»
+    cache.columns(paths[2], ["A"])
+    assert cache.parses == 3
+    cache.columns(paths[0], ["A"])
+    cache.columns(paths[1], ["A"])
+    assert cache.parses == 4 and cache.hits == 2
+
+
+def test_merge_targets_isolates_failing_targets_in_worker_processes(tmp_path):
+    from core.merge_columns import merge_targets
+
+    src_path = tmp_path / "src.xlsx"
+    create_wb(src_path, {"A": ["x", "y"]})
+    tasks = []
+    for idx, sheet in enumerate(["Main", "Missing", "Main"]):
+        target = tmp_path / f"t{idx}.xlsx"
+        create_wb(target, {"A": ["h1", "h2"]}, sheet_name="Main")
+        tasks.append({"target": str(target), "mappings": [{
+            "source": str(src_path),
+            "source_columns": ["A"],
+            "target_sheet": sheet,
+            "target_columns": ["B"],
+        }]})
+    progress = []
+
+    results = list(merge_targets(tasks, workers=2,
+                                 progress_callback=lambda done, total, task, mp: progress.append((done, total))))
+
+    assert [task["target"] for task, _output, _error in results] == [task["target"] for task in tasks]
+    assert isinstance(results[1][2], KeyError)
+    for _task, output, error in (results[0], results[2]):
+        assert error is None
+        wb = load_workbook(output)
+        assert [wb["Main"][f"B{i}"].value for i in (1, 2)] == ["x", "y"]
+        wb.close()
+    assert sorted(progress) == [(1, 3), (2, 3)]
+
+
+def test_merge_targets_stops_when_cancelled(tmp_path):
+    import pytest
+    from core.cancel import CancelToken, OperationCancelled
+    from core.merge_columns import merge_targets
+
+    src_path = tmp_path / "src.xlsx"
+    create_wb(src_path, {"A": ["x"]})
+    tasks = []
+    for idx in range(2):
+        target = tmp_path / f"t{idx}.xlsx"
+        create_wb(target, {"A": ["h1"]}, sheet_name="Main")
+        tasks.append({"target": str(target), "mappings": [{
+            "source": str(src_path),
+            "source_columns": ["A"],
+            "target_sheet": "Main",
+            "target_columns": ["B"],
+        }]})
+    token = CancelToken()
+    results = merge_targets(tasks, workers=1, cancel_token=token)
+
+    task, output, error = next(results)
+    assert error is None and os.path.exists(output)
+    token.cancel()
+    with pytest.raises(OperationCancelled):
+        next(results)
+    assert not (tmp_path / "t1_merged.xlsx").exists()
+
+
+def test_merge_targets_reruns_targets_after_a_worker_crash(tmp_path, monkeypatch):
+    import logging
+    import multiprocessing
+    import pytest
+    from concurrent.futures.process import BrokenProcessPool
+    import core.merge_columns as merge_columns
+
+    if multiprocessing.get_start_method() != "fork":
+        pytest.skip("подмена функции видна только дочерним процессам fork")
+    original = merge_columns.merge_excel_columns
+
+    def crashing_merge(main_file, *args, **kwargs):
+        merge_columns.logger.info("merging %s", os.path.basename(main_file))
+        if "crash" in os.path.basename(main_file):
+            os._exit(1)
+        return original(main_file, *args, **kwargs)
+
+    monkeypatch.setattr(merge_columns, "merge_excel_columns", crashing_merge)
+    src_path = tmp_path / "src.xlsx"
+    create_wb(src_path, {"A": ["x"]})
+    tasks = []
+    for name in ("a", "crash", "b", "c"):
+        target = tmp_path / f"{name}.xlsx"
+        create_wb(target, {"A": ["h1"]}, sheet_name="Main")
+        tasks.append({"target": str(target), "mappings": [{
+            "source": str(src_path),
+            "source_columns": ["A"],
+            "target_sheet": "Main",
+            "target_columns": ["B"],
+        }]})
+
+    lines = []
+    handler = logging.Handler()
+    handler.emit = lambda record: lines.append(record.getMessage())
+    merge_columns.logger.addHandler(handler)
+    try:
+        results = list(merge_columns.merge_targets(tasks, workers=2))
+    finally:
+        merge_columns.logger.removeHandler(handler)
+
+    assert [os.path.basename(task["target"]) for task, _output, _error in results] == [
+        "a.xlsx", "crash.xlsx", "b.xlsx", "c.xlsx"]
+    # Записи упавших попыток отброшены: каждая цель в логе один раз и по порядку.
+    merged = [line for line in lines if line.startswith("merging") and "crash" not in line]
+    assert merged == ["merging a.xlsx", "merging b.xlsx", "merging c.xlsx"]
+    assert isinstance(results[1][2], BrokenProcessPool)
+    for _task, output, error in (results[0], results[2], results[3]):
+        assert error is None and os.path.exists(output)
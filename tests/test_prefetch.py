@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from core.prefetch import Prefetcher
+
+
+def test_prefetcher_keeps_order_and_reports_errors():
+    def loader(item):
+        if item == 3:
+            raise ValueError("bad file")
+        return item * 10
+
+    results = list(Prefetcher(range(5), loader, depth=2))
+
+    assert [r[0] for r in results] == [0, 1, 2, 3, 4]
+    assert [r[1] for r in results] == [0, 10, 20, None, 40]
+    assert isinstance(results[3][2], ValueError)
+
+
+def test_prefetcher_stays_within_queue_depth():
+    loaded = []
+    lock = threading.Lock()
+
+    def loader(item):
+        with lock:
+            loaded.append(item)
+        return item
+
+    prefetcher = Prefetcher(range(20), loader, depth=2)
+    iterator = iter(prefetcher)
+    next(iterator)
+    time.sleep(0.2)
+    # одна отданная запись + очередь глубины 2 + одна, ждущая места в очереди
+    assert len(loaded) <= 4
+    prefetcher.close()
+
+
+def test_prefetcher_measures_consumer_wait_inline():
+    prefetcher = Prefetcher([1, 2], lambda item: time.sleep(0.05) or item, depth=0)
+    assert [r[1] for r in prefetcher] == [1, 2]
+    assert prefetcher.wait_seconds >= 0.1
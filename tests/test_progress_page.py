@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import sys
+import pytest
+
+pytest.importorskip("PySide6.QtWidgets")
+from PySide6.QtWidgets import QApplication
+
+from gui.pages.progress_page import ProgressPage, format_duration
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    app = QApplication.instance()
+    if app is None:
+        app = QApplication(sys.argv)
+    return app
+
+
+def test_set_stats_shows_rate_and_eta_from_counters(qapp):
+    page = ProgressPage()
+    page.set_stats({"step": 1, "steps": 4, "files_done": 2, "files_total": 8, "cells": 500}, 10.0)
+
+    text = page.label_stats.text()
+    assert "2" in text and "8" in text
+    assert "50" in text
+    assert format_duration(30) in text
+
+
+def test_cancel_button_emits_once_and_disables(qapp):
+    page = ProgressPage()
+    calls = []
+    page.cancelClicked.connect(lambda: calls.append(True))
+
+    page.cancel_button.click()
+
+    assert calls == [True]
+    assert not page.cancel_button.isEnabled()
+    assert format_duration(3725) == "1:02:05"
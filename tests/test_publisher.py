@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from core import publisher as publisher_module
+from core.merge_columns import merge_excel_columns
+from core.publisher import PublishError, Publisher
+
+
+def _publisher(tmp_path, **kwargs):
+    return Publisher(remote_only=False, temp_dir=str(tmp_path / "local"), retry_delay=0, **kwargs)
+
+
+def test_publish_moves_local_file_to_destination(tmp_path):
+    share = tmp_path / "share"
+    share.mkdir()
+    dest = str(share / "main_out.xlsx")
+    pub = _publisher(tmp_path)
+
+    local = pub.local_path(dest)
+    assert os.path.dirname(local) == str(tmp_path / "local")
+    with open(local, "wb") as f:
+        f.write(b"data")
+
+    assert pub.publish(local, dest).result() == dest
+    assert pub.wait() == [dest]
+    assert pub.wait() == []
+    assert open(dest, "rb").read() == b"data"
+    assert not os.path.exists(local)
+    assert os.listdir(share) == ["main_out.xlsx"]
+
+
+def test_publish_retries_and_never_leaves_partial_files(tmp_path, monkeypatch):
+    share = tmp_path / "share"
+    share.mkdir()
+    dest = share / "main_out.xlsx"
+    dest.write_bytes(b"old")
+    pub = _publisher(tmp_path, retries=2)
+    real_replace = os.replace
+    calls = []
+
+    def flaky_replace(src, dst):
+        calls.append(dst)
+        if len(calls) < 3:
+            raise PermissionError("file is locked")
+        real_replace(src, dst)
+
+    local = pub.local_path(str(dest))
+    with open(local, "wb") as f:
+        f.write(b"new")
+    monkeypatch.setattr(publisher_module.os, "replace", flaky_replace)
+    pub.publish(local, str(dest))
+
+    assert pub.wait([str(dest)]) == [str(dest)]
+    assert len(calls) == 3
+    assert dest.read_bytes() == b"new"
+    assert os.listdir(share) == ["main_out.xlsx"]
+
+
+def test_publish_failure_keeps_previous_output_and_local_copy(tmp_path, monkeypatch):
+    share = tmp_path / "share"
+    share.mkdir()
+    dest = share / "main_out.xlsx"
+    dest.write_bytes(b"old")
+    pub = _publisher(tmp_path, retries=1)
+
+    def broken_replace(src, dst):
+        raise PermissionError("share is read-only")
+
+    local = pub.local_path(str(dest))
+    with open(local, "wb") as f:
+        f.write(b"new")
+    monkeypatch.setattr(publisher_module.os, "replace", broken_replace)
+    pub.publish(local, str(dest))
+
+    with pytest.raises(PublishError, match="Результат остался"):
+        pub.wait()
+    assert dest.read_bytes() == b"old"
+    assert os.listdir(share) == ["main_out.xlsx"]
+    assert open(local, "rb").read() == b"new"
+
+
+def test_merge_saves_locally_and_publishes(tmp_path):
+    main, source = tmp_path / "main.xlsx", tmp_path / "src.xlsx"
+    for path, rows in ((main, [["ID", "DE"], ["k1"]]), (source, [["a"], ["b"]])):
+        wb = Workbook()
+        for row in rows:
+            wb.active.append(row)
+        wb.save(path)
+        wb.close()
+    pub = _publisher(tmp_path)
+
+    output = merge_excel_columns(
+        str(main),
+        [{"source": str(source), "source_columns": ["A"], "target_sheet": "Sheet", "target_columns": ["B"]}],
+        publisher=pub,
+    )
+    pub.wait([output])
+
+    wb = load_workbook(output)
+    assert [c.value for c in wb.active["B"]] == ["a", "b"]
+    wb.close()
+    assert os.listdir(tmp_path / "local") == []
+    assert sorted(os.listdir(tmp_path)) == ["local", "main.xlsx", "main_merged.xlsx", "src.xlsx"]
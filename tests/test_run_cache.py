@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+import os
+
+from openpyxl import Workbook, load_workbook
+
+from core.excel_processor import ExcelProcessor
+from core.run_cache import RunCache
+
+
+class _DummyLogger:
+    def log_error(self, *args, **kwargs):
+        return None
+
+    def log_info(self, *args, **kwargs):
+        return None
+
+    def log_copy(self, *args, **kwargs):
+        return None
+
+    def save(self):
+        return None
+
+
+def _save_book(path, rows, title="S1"):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = title
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+    wb.close()
+
+
+def _processor(tmp_path, **kwargs):
+    return ExcelProcessor(
+        main_excel_path=str(tmp_path / "main.xlsx"),
+        folder_path=str(tmp_path),
+        copy_column="A",
+        selected_sheets=["S1"],
+        sheet_to_header_row={"S1": 0},
+        sheet_to_column={"S1": "A"},
+        file_to_column={"de.xlsx": "DE"},
+        logger=_DummyLogger(),
+        use_cache=True,
+        **kwargs,
+    )
+
+
+def test_copy_data_reuses_output_until_inputs_change(tmp_path):
+    _save_book(tmp_path / "main.xlsx", [["ID", "DE"], ["k1", None]])
+    _save_book(tmp_path / "de.xlsx", [["v1"]])
+
+    first = _processor(tmp_path)
+    output = first.copy_data()
+    assert not first.cache_hit
+    assert os.path.exists(output + ".cache.json")
+
+    second = _processor(tmp_path)
+    assert second.copy_data() == output
+    assert second.cache_hit
+
+    # Другое время изменения при том же содержимом кэш не сбрасывает.
+    stat = os.stat(tmp_path / "de.xlsx")
+    os.utime(tmp_path / "de.xlsx", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    touched = _processor(tmp_path)
+    touched.copy_data()
+    assert touched.cache_hit
+
+    _save_book(tmp_path / "de.xlsx", [["v2 changed"]])
+    third = _processor(tmp_path)
+    third.copy_data()
+    assert not third.cache_hit
+    wb = load_workbook(output)
+    assert wb["S1"]["B2"].value == "v2 changed"
+    wb.close()
+
+    changed_settings = _processor(tmp_path, skip_first_row=True)
+    changed_settings.copy_data()
+    assert not changed_settings.cache_hit
+
+
+def test_run_cache_rejects_modified_output(tmp_path):
+    source = tmp_path / "src.bin"
+    output = tmp_path / "out.bin"
+    source.write_bytes(b"abc")
+    output.write_bytes(b"result")
+
+    cache = RunCache(str(output), {"a": 1}, [str(source)])
+    assert not cache.lookup()
+    cache.begin()
+    assert cache.store()
+    assert RunCache(str(output), {"a": 1}, [str(source)]).lookup()
+    assert not RunCache(str(output), {"a": 2}, [str(source)]).lookup()
+
+    output.write_bytes(b"edited")
+    assert not RunCache(str(output), {"a": 1}, [str(source)]).lookup()
+
+
+def test_run_cache_skips_store_when_input_changes_during_run(tmp_path):
+    source = tmp_path / "src.bin"
+    output = tmp_path / "out.bin"
+    source.write_bytes(b"abc")
+    output.write_bytes(b"result")
+
+    cache = RunCache(str(output), {}, [str(source)])
+    cache.begin()
+    source.write_bytes(b"abcd")
+
+    assert not cache.store()
+    assert not os.path.exists(str(output) + ".cache.json")
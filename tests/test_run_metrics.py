@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import os
+
+from openpyxl import Workbook
+
+from core.excel_processor import ExcelProcessor
+from core.run_metrics import PHASES, RunMetrics
+
+
+class _Logger:
+    def __init__(self):
+        self.infos = []
+
+    def log_error(self, *args, **kwargs):
+        return None
+
+    def log_info(self, text):
+        self.infos.append(text)
+
+    def log_copy(self, *args, **kwargs):
+        return None
+
+    def save(self):
+        return None
+
+
+def _save_book(path, rows):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "S1"
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+    wb.close()
+
+
+def test_copy_data_returns_metrics_alongside_output(tmp_path):
+    _save_book(tmp_path / "main.xlsx", [["ID", "DE"], ["k1"], ["k2"], ["k3"]])
+    source = tmp_path / "de.xlsx"
+    _save_book(source, [["x"], ["a"], ["b"], ["c"]])
+    logger = _Logger()
+    processor = ExcelProcessor(
+        main_excel_path=str(tmp_path / "main.xlsx"),
+        folder_path=str(tmp_path),
+        copy_column="A",
+        selected_sheets=["S1"],
+        sheet_to_header_row={"S1": 0},
+        sheet_to_column={"S1": "A"},
+        file_to_column={"de.xlsx": "DE"},
+        copy_by_row_number=True,
+        logger=logger,
+    )
+
+    output, metrics = processor.copy_data(with_metrics=True)
+
+    assert output == str(tmp_path / "main_out.xlsx")
+    assert metrics is processor.metrics
+    assert metrics.rows_read == 4
+    assert metrics.cells_written == 4
+    assert metrics.sources == [
+        {"path": str(source), "bytes": os.path.getsize(source), "rows": 4, "seconds": metrics.sources[0]["seconds"]}
+    ]
+    for phase in ("target_load", "source_parse", "sheet_matching", "cell_writes", "save", "verify"):
+        assert metrics.phases[phase] >= 0
+    assert set(metrics.phases) <= set(PHASES)
+    report = [line for line in logger.infos if line.startswith("Метрики:")]
+    assert len(report) == len(metrics.summary_lines()) + 1
+
+
+def test_summary_lines_report_throughput_and_memory():
+    metrics = RunMetrics()
+    metrics.record_source("a.xlsx", 2048, 500, {"parse": 0.5, "match": 0.01})
+    metrics.cells_written = 400
+    metrics.finish()
+    metrics.total_seconds = 2.0
+    metrics.peak_memory_bytes = 50 * 1024 * 1024
+
+    lines = metrics.summary_lines()
+
+    assert "250 строк/с" in lines[0]
+    assert "Разбор источников 0.50 с" in lines[1]
+    assert "2.0 КБ" in lines[2]
+    assert lines[3] == "Пиковая память: 50.0 МБ"
+    assert metrics.to_dict()["bytes_read"] == 2048
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+import os
+
+from openpyxl import Workbook, load_workbook
+
+from core.excel_processor import ExcelProcessor
+from core.merge_columns import merge_excel_columns
+from core.staging import StagingCache, is_remote_path
+from utils.logger import Logger
+
+
+def _write(path, payload):
+    with open(path, "wb") as f:
+        f.write(payload)
+
+
+def test_stage_reuses_valid_copies_and_refreshes_stale_ones(tmp_path):
+    source = tmp_path / "share" / "a.xlsx"
+    source.parent.mkdir()
+    _write(source, b"x" * 100)
+    cache = StagingCache(str(tmp_path / "cache"), remote_only=False)
+
+    local = cache.local_path(str(source))
+    assert local != str(source) and open(local, "rb").read() == b"x" * 100
+    assert cache.copied_bytes == 100
+
+    # Новый экземпляр (следующий запуск) берёт копию из индекса.
+    again = StagingCache(str(tmp_path / "cache"), remote_only=False)
+    assert again.local_path(str(source)) == local
+    assert again.hits == 1 and again.copied_bytes == 0
+
+    _write(source, b"y" * 120)
+    assert open(again.local_path(str(source)), "rb").read() == b"y" * 120
+    assert again.copied_bytes == 120
+
+
+def test_stage_evicts_least_recently_used_copies(tmp_path):
+    cache = StagingCache(str(tmp_path / "cache"), max_bytes=250, remote_only=False)
+    paths = []
+    for name in ("a", "b", "c"):
+        path = tmp_path / f"{name}.xlsx"
+        _write(path, name.encode() * 100)
+        paths.append(str(path))
+
+    cache.stage(paths[:2])
+    cache.stage(paths[:1])  # «a» использован позже «b»
+    staged = cache.stage(paths[2:])
+
+    assert os.path.isfile(staged[paths[2]])
+    names = {entry["source"] for entry in cache._load_index().values()}
+    assert names == {paths[0], paths[2]}
+    assert len([n for n in os.listdir(tmp_path / "cache") if n.endswith(".xlsx")]) == 2
+
+
+def test_local_inputs_are_used_in_place_by_default(tmp_path):
+    path = tmp_path / "a.xlsx"
+    _write(path, b"x")
+    cache = StagingCache(str(tmp_path / "cache"))
+
+    assert cache.stage([str(path)]) == {str(path): str(path)}
+    assert not os.path.exists(tmp_path / "cache")
+    assert is_remote_path(r"\\srv-nt\share\a.xlsx")
+    assert is_remote_path("//srv-nt/share/a.xlsx")
+
+
+def _book(path, rows):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "S1"
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+    wb.close()
+
+
+def test_copy_and_merge_parse_staged_copies(tmp_path):
+    main, source = tmp_path / "main.xlsx", tmp_path / "de.xlsx"
+    _book(main, [["ID", "DE"], ["k1"], ["k2"]])
+    _book(source, [["x"], ["a"], ["b"]])
+    cache = StagingCache(str(tmp_path / "cache"), remote_only=False)
+
+    processor = ExcelProcessor(
+        main_excel_path=str(main),
+        folder_path=str(tmp_path),
+        copy_column="A",
+        selected_sheets=["S1"],
+        sheet_to_header_row={"S1": 0},
+        sheet_to_column={"S1": "A"},
+        file_to_column={"de.xlsx": "DE"},
+        copy_by_row_number=True,
+        staging=cache,
+        logger=Logger(str(tmp_path / "copy_log.txt")),
+    )
+    output = processor.copy_data()
+    assert output == str(tmp_path / "main_out.xlsx")
+    assert processor.metrics.phases["staging"] >= 0
+    wb = load_workbook(output)
+    assert [c.value for c in wb["S1"]["B"]] == ["x", "a", "b"]
+    wb.close()
+
+    merged = merge_excel_columns(
+        str(main),
+        [{"source": str(source), "source_columns": ["A"], "target_sheet": "S1", "target_columns": ["C"]}],
+        staging=cache,
+    )
+    assert merged == str(tmp_path / "main_merged.xlsx")
+    wb = load_workbook(merged)
+    assert [c.value for c in wb["S1"]["C"]] == ["x", "a", "b"]
+    wb.close()
+    assert cache.hits == 2
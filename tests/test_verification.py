@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from core.verification import (
+    CopyVerifier, VERIFY_FAST, VERIFY_OFF, VERIFY_STRICT, value_checksum,
+)
+
+
+def _save_book(path, values):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Sheet1"
+    for (row, col), value in values.items():
+        ws.cell(row=row, column=col, value=value)
+    wb.save(path)
+    wb.close()
+
+
+@pytest.mark.parametrize("mode", [VERIFY_FAST, VERIFY_STRICT])
+def test_verify_reports_only_changed_cells(tmp_path, mode):
+    path = tmp_path / "out.xlsx"
+    verifier = CopyVerifier(mode)
+    verifier.record("Sheet1", 2, 2, "line1\r\nline2")
+    verifier.record("Sheet1", 3, 2, 42)
+    verifier.record("Sheet1", 4, 3, "expected")
+    verifier.record("Sheet1", 9, 3, "missing row")
+    _save_book(path, {(2, 2): "line1\r\nline2", (3, 2): 42, (4, 3): "tampered"})
+
+    assert verifier.verify(str(path)) == [("Sheet1", 4, 3), ("Sheet1", 9, 3)]
+
+
+def test_mark_fills_mismatched_cells(tmp_path):
+    path = tmp_path / "out.xlsx"
+    _save_book(path, {(1, 1): "a"})
+
+    CopyVerifier.mark(str(path), [("Sheet1", 1, 1)])
+
+    wb = load_workbook(path)
+    assert wb["Sheet1"]["A1"].fill.fgColor.rgb.endswith("FF0000")
+    wb.close()
+
+
+def test_mark_keeps_other_package_members(tmp_path):
+    import zipfile
+
+    path = tmp_path / "out.xlsm"
+    _save_book(path, {(1, 1): "a", (2, 1): 5})
+    with zipfile.ZipFile(path, "a") as archive:
+        archive.writestr("xl/vbaProject.bin", b"macro bytes")
+
+    CopyVerifier.mark(str(path), [("Sheet1", 2, 1), ("Sheet1", 3, 2)])
+
+    with zipfile.ZipFile(path) as archive:
+        assert archive.read("xl/vbaProject.bin") == b"macro bytes"
+    wb = load_workbook(path)
+    ws = wb["Sheet1"]
+    assert ws["A2"].value == 5
+    assert ws["A2"].fill.fgColor.rgb.endswith("FF0000")
+    assert ws["B3"].fill.fgColor.rgb.endswith("FF0000")
+    assert ws["A1"].fill.fill_type is None
+    wb.close()
+
+
+def test_checksum_matches_values_as_openpyxl_reads_them():
+    import datetime
+
+    assert value_checksum(1.0) == value_checksum(1)
+    assert value_checksum(0.1 + 0.2) == value_checksum(0.3)
+    assert value_checksum(datetime.date(2024, 2, 3)) == value_checksum(datetime.datetime(2024, 2, 3))
+    assert value_checksum(datetime.datetime(2024, 1, 2, 3, 4, 5, 123456)) == value_checksum(
+        datetime.datetime(2024, 1, 2, 3, 4, 5, 123000))
+
+
+@pytest.mark.parametrize("patch_save", [False, True])
+def test_verify_accepts_floats_and_dates_on_both_save_paths(tmp_path, patch_save):
+    import datetime
+    from core.xlsx_patch import save_column_edits
+
+    values = [1.0, 0.1 + 0.2, 2 ** 60, datetime.datetime(2024, 1, 2, 3, 4, 5, 123456),
+              datetime.date(2024, 2, 3), datetime.time(12, 30)]
+    src = tmp_path / "main.xlsx"
+    out = tmp_path / "out.xlsx"
+    _save_book(src, {(1, 1): "header"})
+    verifier = CopyVerifier(VERIFY_FAST)
+    for row, value in enumerate(values, start=2):
+        verifier.record("Sheet1", row, 1, value)
+    if patch_save:
+        save_column_edits(str(src), str(out), {"Sheet1": {1: dict(enumerate(values, start=2))}})
+    else:
+        _save_book(out, {(1, 1): "header", **{(row, 1): v for row, v in enumerate(values, start=2)}})
+
+    assert verifier.verify(str(out)) == []
+
+
+def test_off_mode_records_nothing(tmp_path):
+    verifier = CopyVerifier(VERIFY_OFF)
+    verifier.record("Sheet1", 1, 1, "x")
+    assert verifier.expected == {}
+    assert verifier.verify(str(tmp_path / "not_read.xlsx")) == []
+
+
+def test_checksum_modes_differ_and_unknown_mode_rejected():
+    assert value_checksum("abc", VERIFY_FAST) == (3, value_checksum("abc")[1])
+    assert len(value_checksum("abc", VERIFY_STRICT)) == 32
+    with pytest.raises(ValueError):
+        CopyVerifier("paranoid")
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+import datetime
+import zipfile
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from core.xlsx_package import sheet_parts
+from core.xlsx_patch import PatchError, write_patched_workbook
+
+
+def _create_book(path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Edit"
+    ws.append(["ID", "DE", "Formula"])
+    ws.append(["k1", None, "=1+1"])
+    ws.append(["k2", "old", None])
+    ws["A10"] = "tail"
+    other = wb.create_sheet("Other")
+    other.append(["keep", 1, 2.5])
+    wb.save(path)
+    wb.close()
+
+
+def _content_types_first(path):
+    # Excel пишет [Content_Types].xml первым, openpyxl — последним.
+    with zipfile.ZipFile(path) as archive:
+        members = {info.filename: archive.read(info) for info in archive.infolist()}
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", members.pop("[Content_Types].xml"))
+        for name, data in members.items():
+            archive.writestr(name, data)
+
+
+def test_patch_rewrites_only_edited_sheet(tmp_path):
+    src = tmp_path / "main.xlsx"
+    out = tmp_path / "main_out.xlsx"
+    _create_book(src)
+    _content_types_first(src)
+
+    write_patched_workbook(str(src), str(out), {"Edit": {
+        2: {2: "новое <&>"},
+        3: {2: 7, 3: "=2+2"},
+        5: {4: 1.5},
+        12: {2: True},
+    }})
+
+    with zipfile.ZipFile(src) as a, zipfile.ZipFile(out) as b:
+        part = sheet_parts(a)["Other"]
+        assert a.read(part) == b.read(part)
+        assert a.read("xl/styles.xml") == b.read("xl/styles.xml")
+        assert b.namelist() == a.namelist()
+        assert b.namelist()[0] == "[Content_Types].xml"
+
+    wb = load_workbook(out)
+    ws = wb["Edit"]
+    assert ws["B2"].value == "новое <&>"
+    assert ws["C2"].value == "=1+1"
+    assert ws["B3"].value == 7
+    assert ws["C3"].value == "=2+2"
+    assert ws["D5"].value == 1.5
+    assert ws["A10"].value == "tail"
+    assert ws["B12"].value is True
+    assert ws.max_row == 12
+    assert [row[0] for row in wb["Other"].iter_rows(values_only=True)] == ["keep"]
+    wb.close()
+
+
+def test_patch_refuses_shared_formula_master(tmp_path):
+    src = tmp_path / "shared.xlsx"
+    _create_book(src)
+    part = "xl/worksheets/sheet1.xml"
+    with zipfile.ZipFile(src) as archive:
+        members = {info.filename: archive.read(info) for info in archive.infolist()}
+    members[part] = members[part].replace(
+        b"<f>1+1</f>", b'<f t="shared" ref="C2:C3" si="0">1+1</f>'
+    )
+    with zipfile.ZipFile(src, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+
+    with pytest.raises(PatchError):
+        write_patched_workbook(str(src), str(tmp_path / "out.xlsx"), {"Edit": {2: {3: "x"}}})
+    assert not (tmp_path / "out.xlsx.tmp").exists()
+
+
+def test_patch_refuses_unstyled_dates(tmp_path):
+    src = tmp_path / "main.xlsx"
+    _create_book(src)
+
+    with pytest.raises(PatchError):
+        write_patched_workbook(str(src), str(tmp_path / "out.xlsx"), {"Edit": {4: {2: datetime.date(2024, 1, 2)}}})
+
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), float("-inf")])
+def test_patch_refuses_non_finite_numbers(tmp_path, value):
+    src = tmp_path / "main.xlsx"
+    _create_book(src)
+
+    with pytest.raises(PatchError):
+        write_patched_workbook(str(src), str(tmp_path / "out.xlsx"), {"Edit": {4: {2: value}}})
+
+
+def test_patch_writes_decimals_as_numbers(tmp_path):
+    from decimal import Decimal
+
+    src = tmp_path / "main.xlsx"
+    out = tmp_path / "out.xlsx"
+    _create_book(src)
+
+    write_patched_workbook(str(src), str(out), {"Edit": {4: {2: Decimal("12.50"), 3: Decimal("-3")}}})
+
+    wb = load_workbook(out)
+    assert wb["Edit"]["B4"].value == 12.5
+    assert wb["Edit"]["C4"].value == -3
+    wb.close()
+
+
+def test_patch_appends_styles_and_keeps_other_members_valid(tmp_path):
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Protection, Side
+    from core.source_reader import CellStyle
+    from core.xlsx_patch import save_column_edits
+
+    src = tmp_path / "main.xlsx"
+    out = tmp_path / "main_out.xlsx"
+    _create_book(src)
+    style = CellStyle(
+        Font(b=True, color="FFFF0000"),
+        Border(left=Side("thin")),
+        PatternFill("solid", fgColor="FFFFFF00"),
+        "0.000%",
+        Protection(locked=False),
+        Alignment(wrap_text=True),
+    )
+
+    save_column_edits(str(src), str(out), {"Edit": {2: {2: 0.5, 3: 0.25}, 4: {12: "new"}}},
+                      {"Edit": {2: {2: style, 3: style}}})
+
+    with zipfile.ZipFile(out) as archive:
+        assert archive.testzip() is None
+    wb = load_workbook(out)
+    cell = wb["Edit"]["B2"]
+    assert cell.value == 0.5
+    assert cell.font.b and cell.font.color.rgb == "FFFF0000"
+    assert cell.fill.fgColor.rgb == "FFFFFF00"
+    assert cell.border.left.style == "thin"
+    assert cell.number_format == "0.000%"
+    assert cell.alignment.wrap_text and not cell.protection.locked
+    assert wb["Edit"]["B3"].style_id == cell.style_id
+    assert wb["Edit"]["C2"].value == "=1+1"
+    assert wb["Edit"]["D12"].value == "new"
+    assert wb["Edit"].max_row == 12
+    wb.close()
+
+
+def test_patch_reuses_styles_already_in_the_package(tmp_path):
+    import re
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Protection
+    from core.source_reader import CellStyle
+    from core.xlsx_patch import save_column_edits
+
+    def xf_count(path):
+        with zipfile.ZipFile(path) as archive:
+            styles = archive.read("xl/styles.xml").decode("utf-8")
+        return len(re.findall(r"<xf[\s>/]", re.search(r"<cellXfs.*?</cellXfs>", styles, re.S).group(0)))
+
+    src = tmp_path / "main.xlsx"
+    _create_book(src)
+    style = CellStyle(Font(i=True), Border(), PatternFill("solid", fgColor="FF00FF00"), "0.0",
+                      Protection(), Alignment())
+
+    first = tmp_path / "first.xlsx"
+    second = tmp_path / "second.xlsx"
+    save_column_edits(str(src), str(first), {"Edit": {2: {2: 1.5}}}, {"Edit": {2: {2: style}}})
+    save_column_edits(str(first), str(second), {"Edit": {2: {3: 2.5}}}, {"Edit": {2: {3: style}}})
+
+    assert xf_count(second) == xf_count(first) == xf_count(src) + 1
+    wb = load_workbook(second)
+    assert wb["Edit"]["B3"].style_id == wb["Edit"]["B2"].style_id
+    assert wb["Edit"]["B3"].font.i
+    wb.close()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import zipfile
+
+import pytest
+from openpyxl import load_workbook
+
+from core.xlsx_probe import probe_workbook
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet2.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/sharedStrings.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+    'officeDocument" Target="xl/workbook.xml"/></Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+    '<sheet name="Тексты" sheetId="1" r:id="rId1"/><sheet name="Second" sheetId="2" r:id="rId2"/>'
+    '</sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+    'worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+    'worksheet" Target="/xl/worksheets/sheet2.xml"/>'
+    '<Relationship Id="rId3" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+    'sharedStrings" Target="sharedStrings.xml"/></Relationships>'
+)
+_SHEET = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<dimension ref="A1:F3"/><sheetData>{rows}</sheetData></worksheet>'
+)
+_SHARED = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" count="5" uniqueCount="5">'
+    '<si><t>unused</t></si><si><t>ID</t></si>'
+    '<si><r><t>Rich </t></r><r><t>text</t></r><rPh sb="0" eb="1"><t>ignored</t></rPh></si>'
+    '<si><t>EN</t></si><si><t>never read</t></si></sst>'
+)
+
+
+def _write_package(path):
+    sheet1 = _SHEET.format(rows=(
+        '<row r="1"><c r="A1"><v>0</v></c></row>'
+        '<row r="2"><c r="A2" t="s"><v>1</v></c><c r="B2" t="s"><v>2</v></c>'
+        '<c r="D2" t="inlineStr"><is><t>inline</t></is></c><c r="E2"><v>1.5</v></c>'
+        '<c r="F2"><f>1+1</f><v>2</v></c></row>'
+        '<row r="3"><c r="A3" t="s"><v>3</v></c></row>'
+    ))
+    sheet2 = _SHEET.format(rows='<row r="1"><c r="A1" t="s"><v>3</v></c><c r="B1" t="b"><v>1</v></c></row>')
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _ROOT_RELS)
+        archive.writestr("xl/workbook.xml", _WORKBOOK)
+        archive.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        archive.writestr("xl/worksheets/sheet1.xml", sheet1)
+        archive.writestr("xl/worksheets/sheet2.xml", sheet2)
+        archive.writestr("xl/sharedStrings.xml", _SHARED)
+
+
+def test_probe_matches_openpyxl_read_only_rows(tmp_path):
+    path = tmp_path / "probe.xlsx"
+    _write_package(path)
+
+    probe = probe_workbook(str(path), {"Тексты": 1, "Second": 0})
+
+    wb = load_workbook(path, read_only=True)
+    assert probe.sheet_names == wb.sheetnames == ["Тексты", "Second"]
+    expected = {name: [cell.value for cell in wb[name][row + 1]] for name, row in (("Тексты", 1), ("Second", 0))}
+    wb.close()
+    assert probe.headers == expected
+    assert probe.headers["Тексты"] == ["ID", "Rich text", None, "inline", 1.5, "=1+1"]
+
+
+def test_probe_reads_only_referenced_shared_strings(tmp_path, monkeypatch):
+    import core.xlsx_probe as xlsx_probe
+
+    path = tmp_path / "probe.xlsx"
+    _write_package(path)
+    resolved = []
+    real_text = xlsx_probe._text
+    monkeypatch.setattr(xlsx_probe, "_text", lambda element: resolved.append(element.tag) or real_text(element))
+
+    probe = probe_workbook(str(path), {"Second": 0})
+
+    assert probe.headers["Second"][:2] == ["EN", True]
+    assert sum(tag.endswith("}si") for tag in resolved) == 1
+
+
+def test_probe_missing_sheet_raises_key_error(tmp_path):
+    path = tmp_path / "probe.xlsx"
+    _write_package(path)
+
+    assert probe_workbook(str(path)).headers == {}
+    with pytest.raises(KeyError):
+        probe_workbook(str(path), {"Missing": 0})
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""SQLite journal of copy runs and the cells they wrote.
+
+A :class:`CopyJournal` keeps one row per run and one row per ``COPY`` or
+``ERROR`` entry of :class:`~utils.logger.Logger`, indexed by
+``(target, sheet, row, col)`` and by run, so "which run wrote row 1532 of
+sheet 1.83.0" is a single query instead of a grep through ``copy_log.txt``.
+The logger's writer thread inserts events in batches, one transaction per
+batch, so the copy loop itself never touches the database.
+"""
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    target TEXT,
+    output TEXT,
+    started REAL,
+    finished REAL,
+    status TEXT,
+    info TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER REFERENCES runs(id),
+    time REAL,
+    level TEXT,
+    target TEXT,
+    sheet TEXT,
+    row INTEGER,
+    col INTEGER,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS events_cell ON events (target, sheet, row, col);
+CREATE INDEX IF NOT EXISTS events_run ON events (run_id);
+CREATE INDEX IF NOT EXISTS runs_target ON runs (target);
+"""
+
+RUN_RUNNING = "running"
+RUN_OK = "ok"
+RUN_FAILED = "failed"
+RUN_CANCELLED = "cancelled"
+
+
+def _norm_target(path: Optional[str]) -> Optional[str]:
+    return os.path.normcase(os.path.abspath(path)) if path else None
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class CopyJournal:
+    """Runs and cell events of copy runs in one SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection with the schema in place.
+
+        Connections are not shared between threads: the logger's writer
+        and the code starting runs each open their own.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        # WAL: запросы и запись идущего запуска не мешают друг другу.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    # --- запись -----------------------------------------------------------
+
+    def begin_run(self, target: str, info: Optional[Dict[str, object]] = None) -> int:
+        with self.connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO runs (target, started, status, info) VALUES (?, ?, ?, ?)",
+                (_norm_target(target), time.time(), RUN_RUNNING,
+                 json.dumps(info or {}, ensure_ascii=False, default=str)),
+            )
+            run_id = cursor.lastrowid
+        conn.close()
+        return run_id
+
+    def end_run(self, run_id: int, status: str, output: Optional[str] = None) -> None:
+        with self.connect() as conn:
+            conn.execute(
+                "UPDATE runs SET finished = ?, status = ?, output = ? WHERE id = ?",
+                (time.time(), status, output, run_id),
+            )
+        conn.close()
+
+    @staticmethod
+    def insert_events(conn: sqlite3.Connection, events: Iterable[tuple]) -> None:
+        """Insert ``(run_id, time, level, target, sheet, row, col, value)`` rows in one transaction."""
+        with conn:
+            conn.executemany(
+                "INSERT INTO events (run_id, time, level, target, sheet, row, col, value) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (run_id, stamp, level, target, None if sheet is None else str(sheet),
+                     _int_or_none(row), _int_or_none(col), None if value is None else str(value))
+                    for run_id, stamp, level, target, sheet, row, col, value in events
+                ),
+            )
+
+    # --- запросы ----------------------------------------------------------
+
+    def events(self, target: Optional[str] = None, sheet: Optional[str] = None, row: Optional[int] = None,
+               col: Optional[int] = None, run_id: Optional[int] = None, level: Optional[str] = None,
+               limit: Optional[int] = 1000) -> List[Dict[str, object]]:
+        """Return matching events, newest first, with their run's status and output."""
+        clauses, params = [], []
+        for column, value in (
+            ("e.target", _norm_target(target)),
+            ("e.sheet", sheet),
+            ("e.row", row),
+            ("e.col", col),
+            ("e.run_id", run_id),
+            ("e.level", level),
+        ):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        sql = (
+            "SELECT e.id, e.run_id, e.time, e.level, e.target, e.sheet, e.row, e.col, e.value, "
+            "r.status AS run_status, r.output AS run_output "
+            "FROM events e LEFT JOIN runs r ON r.id = e.run_id"
+        )
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY e.id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self._query(sql, params)
+
+    def runs(self, target: Optional[str] = None, limit: Optional[int] = 50) -> List[Dict[str, object]]:
+        """Return runs, newest first, with their number of COPY and ERROR events."""
+        sql = (
+            "SELECT r.*, "
+            "(SELECT COUNT(*) FROM events e WHERE e.run_id = r.id AND e.level = 'COPY') AS copies, "
+            "(SELECT COUNT(*) FROM events e WHERE e.run_id = r.id AND e.level = 'ERROR') AS errors "
+            "FROM runs r"
+        )
+        params = []
+        if target:
+            sql += " WHERE r.target = ?"
+            params.append(_norm_target(target))
+        sql += " ORDER BY r.id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self._query(sql, params)
+        for row in rows:
+            row["info"] = json.loads(row["info"] or "{}")
+        return rows
+
+    def _query(self, sql, params) -> List[Dict[str, object]]:
+        if not os.path.exists(self.path):
+            return []
+        conn = self.connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
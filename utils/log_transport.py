@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""Log records from worker processes to one collector in the parent.
+
+A :class:`~utils.logger.Logger`, a Qt log pane or a
+:class:`~core.run_metrics.RunMetrics` only live in the parent process. A
+worker started with :meth:`LogCollector.pool_kwargs` logs through
+:func:`worker_log` instead. Records are small tuples buffered in the worker
+and sent through a ``multiprocessing`` queue in batches; ``COPY`` records,
+the hot path, are sent only every ``batch_size`` records, the rest right away.
+
+Every record belongs to a job, numbered by the parent in submission order,
+and to one attempt at it: :meth:`LogCollector.start` hands out a new attempt
+each time a job is submitted, so a job resubmitted after its worker died
+does not log twice. :meth:`LogCollector.poll` runs in the caller's thread,
+which for the GUI is the thread owning the widgets. It passes the records
+of job ``n`` on to the sinks once job ``n`` has sent its end marker and job
+``n - 1`` has been delivered, so the log reads as if the jobs ran one after
+another. ``PROGRESS`` records are the exception: they are not log entries
+and reach ``progress_callback`` as soon as they arrive.
+Messages of a ``logging`` logger named in :meth:`LogCollector.pool_kwargs`
+travel as ``LINE`` records of the job that emitted them.
+"""
+import logging
+import multiprocessing
+import queue as queue_module
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+COPY = "COPY"
+ERROR = "ERROR"
+INFO = "INFO"
+WARNING = "WARNING"
+LINE = "LINE"
+METRIC = "METRIC"
+SOURCE = "SOURCE"
+PROGRESS = "PROGRESS"
+
+DEFAULT_BATCH_SIZE = 500
+
+# (номер задания, номер попытки)
+JobId = Tuple[int, int]
+
+_queue = None
+_current: Optional["WorkerLog"] = None
+
+
+def init_worker(log_queue, forward_logger: str | None = None) -> None:
+    """Pool initializer: remember the collector's queue in the worker.
+
+    With ``forward_logger`` the handlers of that ``logging`` logger are
+    replaced by a :class:`WorkerLogHandler`.
+    """
+    global _queue
+    _queue = log_queue
+    if forward_logger is not None:
+        logging.getLogger(forward_logger).handlers[:] = [WorkerLogHandler()]
+
+
+def worker_log() -> "WorkerLog":
+    """The log of the job running in this worker (see :func:`run_logged`)."""
+    if _current is None:
+        raise RuntimeError("worker_log() вызван вне run_logged()")
+    return _current
+
+
+def run_logged(job: JobId, fn: Callable, *args, **kwargs):
+    """Run ``fn`` in a worker as attempt ``job`` and always close its log.
+
+    Submit this instead of ``fn``:
+    ``pool.submit(run_logged, collector.start(n), fn, ...)``.
+    """
+    global _current
+    _current = WorkerLog(job, _queue)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        log, _current = _current, None
+        log.close()
+
+
+class WorkerLogHandler(logging.Handler):
+    """Sends ``logging`` messages of a worker process to the parent as log lines."""
+
+    def emit(self, record):
+        try:
+            worker_log().line(self.format(record))
+        except RuntimeError:
+            pass
+
+
+class WorkerLog:
+    """Worker-side logger with the :class:`~utils.logger.Logger` cell API."""
+
+    def __init__(self, job: JobId, log_queue, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.job = job
+        self.batch_size = batch_size
+        self._queue = log_queue
+        self._buffer: List[tuple] = []
+
+    def log_copy(self, sheet, row, col, value):
+        self._buffer.append((COPY, sheet, row, col, value))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def log_error(self, sheet, row, col, value):
+        self._send(ERROR, sheet, row, col, value)
+
+    def log_info(self, text):
+        self._send(INFO, text)
+
+    def log_warning(self, text):
+        self._send(WARNING, text)
+
+    def line(self, text):
+        """A line for a log pane (the ``log_callback`` of the GUI tools)."""
+        self._send(LINE, text)
+
+    def metric(self, phase, seconds):
+        self._send(METRIC, phase, seconds)
+
+    def source(self, path, bytes_read, rows, timings=None):
+        self._send(SOURCE, path, bytes_read, rows, timings)
+
+    def progress(self, done, total):
+        self._send(PROGRESS, done, total)
+
+    def flush(self, ended=False):
+        if self._buffer or ended:
+            batch, self._buffer = self._buffer, []
+            if self._queue is not None:
+                self._queue.put((self.job, batch, ended))
+
+    def close(self):
+        self.flush(ended=True)
+
+    def _send(self, *record):
+        self._buffer.append(record)
+        self.flush()
+
+
+class LogCollector:
+    """Parent-side end of the transport.
+
+    Args:
+        logger: Gets ``COPY``/``ERROR``/``INFO``/``WARNING`` records.
+        line_callback: Gets ``LINE`` records, e.g. a log pane's ``append``.
+        metrics: :class:`~core.run_metrics.RunMetrics` fed by ``METRIC`` and
+            ``SOURCE`` records.
+        progress_callback: Gets ``(job, done, total)`` of ``PROGRESS``
+            records, in arrival order.
+    """
+
+    def __init__(self, logger=None, line_callback: Callable[[str], None] | None = None, metrics=None,
+                 mp_context=None, progress_callback: Callable[[int, int, int], None] | None = None):
+        self.logger = logger
+        self.line_callback = line_callback
+        self.metrics = metrics
+        self.progress_callback = progress_callback
+        self._mp_context = mp_context or multiprocessing
+        self.queue = self._mp_context.Queue()
+        self._next = 0
+        self._attempts: Dict[int, int] = {}
+        self._held: Dict[int, List[tuple]] = {}
+        self._ended = set()
+
+    def start(self, job: int) -> JobId:
+        """Return the id for a new attempt at ``job``, to pass to :func:`run_logged`.
+
+        Records of earlier attempts, held or still in the queue, are dropped.
+        """
+        attempt = self._attempts.get(job, -1) + 1
+        self._attempts[job] = attempt
+        self._held.pop(job, None)
+        return job, attempt
+
+    def pool_kwargs(self, forward_logger: str | None = None) -> Dict[str, object]:
+        """Arguments for ``ProcessPoolExecutor`` so its workers can log.
+
+        Messages of the ``forward_logger`` logger in the workers reach
+        ``line_callback``.
+        """
+        return {"initializer": init_worker, "initargs": (self.queue, forward_logger)}
+
+    def poll(self, timeout: float = 0.0) -> int:
+        """Receive what the workers sent and deliver it in job order.
+
+        Waits up to ``timeout`` seconds for the first batch and returns the
+        number of records delivered.
+        """
+        delivered = 0
+        block = timeout > 0
+        while True:
+            try:
+                (job, attempt), records, ended = (
+                    self.queue.get(block, timeout) if block else self.queue.get_nowait()
+                )
+            except (queue_module.Empty, EOFError, OSError):
+                return delivered
+            block = False
+            if attempt != self._attempts.get(job) or job < self._next:
+                continue
+            if self.progress_callback is not None:
+                for record in records:
+                    if record[0] == PROGRESS:
+                        self.progress_callback(job, *record[1:])
+            self._held.setdefault(job, []).extend(records)
+            if ended:
+                self._ended.add(job)
+                delivered += self._advance()
+
+    def wait(self, job: int, timeout: float | None = None, alive: Callable[[], bool] | None = None) -> bool:
+        """Poll until every job up to ``job`` has sent its end marker and been delivered.
+
+        Without ``timeout`` this waits for the markers however long it
+        takes. ``alive()`` tells whether the pool's processes still run:
+        a worker killed with its pool can lose an end marker it had already
+        queued, so once ``alive()`` is false what arrived is delivered and
+        ``job`` is ended.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._next <= job:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            if alive is not None and not alive():
+                self.poll(0.05)
+                for pending in range(self._next, job + 1):
+                    self.end(pending)
+                break
+            self.poll(0.05)
+        return True
+
+    def end(self, job: int) -> None:
+        """Treat ``job`` as ended, e.g. after its worker process died for good.
+
+        What its last attempt logged before dying is delivered.
+        """
+        self._ended.add(job)
+        self._advance()
+
+    def renew_queue(self) -> None:
+        """Receive what arrived and switch to a new queue for a new pool.
+
+        A worker killed while writing can leave the old queue locked for
+        every other process, so a pool started after a crash must not use it.
+        """
+        self.poll()
+        self.queue.close()
+        self.queue = self._mp_context.Queue()
+
+    def close(self) -> None:
+        self.poll()
+        self.queue.close()
+        self.queue.join_thread()
+
+    def _advance(self) -> int:
+        delivered = 0
+        while self._next in self._ended:
+            self._ended.discard(self._next)
+            delivered += self._deliver(self._held.pop(self._next, []))
+            self._next += 1
+        return delivered
+
+    def _deliver(self, records) -> int:
+        logger, metrics = self.logger, self.metrics
+        for record in records:
+            kind = record[0]
+            if kind == COPY:
+                if logger is not None:
+                    logger.log_copy(*record[1:])
+            elif kind == ERROR:
+                if logger is not None:
+                    logger.log_error(*record[1:])
+            elif kind == INFO:
+                if logger is not None:
+                    logger.log_info(record[1])
+            elif kind == WARNING:
+                if logger is not None:
+                    logger.log_warning(record[1])
+            elif kind == LINE:
+                if self.line_callback is not None:
+                    self.line_callback(record[1])
+            elif kind == METRIC:
+                if metrics is not None:
+                    metrics.add(record[1], record[2])
+            elif kind == SOURCE:
+                if metrics is not None:
+                    metrics.record_source(*record[1:])
+        return len(records)
@@ -1,7 +1,24 @@
 # -*- coding: utf-8 -*-
-import logging
+"""Application logger and the copy log of ``ExcelProcessor``.
+
+:class:`Logger` hands entries to a background thread through a bounded
+queue; the thread writes them to the log file in batches (plain text or
+JSON lines), rotates the file by size and echoes entries at or above
+``console_level`` to the console. ``COPY`` entries stay off the console by
+default. When the queue is full the caller waits, so memory stays bounded.
+With a ``journal`` the same thread also stores ``COPY`` and ``ERROR``
+entries in a :class:`~utils.journal.CopyJournal`.
+"""
 import datetime
+import json
+import logging
 import os
+import queue
+import sqlite3
+import threading
+import time
+
+from utils.journal import CopyJournal
 
 logger = logging.getLogger("app_logger")
 logger.setLevel(logging.DEBUG)
@@ -11,36 +28,229 @@ if not logger.hasHandlers():
     handler.setFormatter(formatter)
     logger.addHandler(handler)
 
+COPY = 15
+logging.addLevelName(COPY, "COPY")
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+
+FORMAT_TEXT = "text"
+FORMAT_JSON = "json"
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 3
+DEFAULT_QUEUE_SIZE = 10000
+BATCH_SIZE = 1000
+
+_STOP = object()
+
+
 class Logger:
-    def __init__(self, log_file="copy_log.txt"):
+    """Copy log with a background, batched writer.
+
+    Args:
+        log_file: Path of the log; ``None`` keeps only the console output.
+        console_level: Lowest level echoed to ``app_logger``.
+        file_level: Lowest level written to ``log_file``.
+        fmt: ``"text"`` (``[time] LEVEL: ...`` lines) or ``"json"`` (one
+            object per line with ``time``, ``level``, ``message`` and, for
+            cell entries, ``sheet``, ``row``, ``col``, ``value``).
+        max_bytes: Rotate ``log_file`` before it grows past this size;
+            ``0`` disables rotation.
+        backup_count: Rotated files kept as ``log_file.1`` … ``.N``.
+        queue_size: Entries waiting for the writer before callers block.
+        journal: Path of a SQLite journal (or a
+            :class:`~utils.journal.CopyJournal`) that also receives the cell
+            entries; runs are delimited by :meth:`begin_run`/:meth:`end_run`.
+    """
+
+    def __init__(self, log_file="copy_log.txt", console_level=INFO, file_level=COPY, fmt=FORMAT_TEXT,
+                 max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT, queue_size=DEFAULT_QUEUE_SIZE,
+                 journal=None):
+        if fmt not in (FORMAT_TEXT, FORMAT_JSON):
+            raise ValueError(f"Unknown log format: {fmt}")
         self.log_file = log_file
-        self.entries = []
+        self.console_level = console_level
+        self.file_level = file_level
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stream = None
+        self.journal = CopyJournal(journal) if isinstance(journal, str) else journal
+        self.run_id = None
+        self._run_target = None
+        self._journal_conn = None
+        self._stamp = (None, "")
 
-    def log(self, message):
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        entry = f"[{timestamp}] {message}"
-        self.entries.append(entry)
-        logger.error(message)  # <-- вот здесь дублируем в стандартный логгер
+    def _wanted(self, level):
+        return level >= self.console_level or level >= self.file_level or (
+            self.journal is not None and level in (COPY, ERROR)
+        )
+
+    def log(self, message, level=INFO, **fields):
+        if not self._wanted(level):
+            return
+        self._ensure_writer()
+        self._queue.put((time.time(), level, message, fields, self.run_id, self._run_target))
 
     def log_copy(self, sheet, row, col, value):
+        if not self._wanted(COPY):
+            return
         msg = f"COPY: {sheet} R{row}C{col} -> {repr(value)}"
-        self.log(msg)
+        self.log(msg, COPY, sheet=sheet, row=row, col=col, value=value)
 
     def log_error(self, sheet, row, col, value):
         msg = f"ERROR: {sheet} R{row}C{col} -> {repr(value)}"
-        self.log(msg)
+        self.log(msg, ERROR, sheet=sheet, row=row, col=col, value=value)
 
     def log_info(self, text):
-        self.log(f"INFO: {text}")
+        self.log(f"INFO: {text}", INFO)
 
     def log_warning(self, text):
-        self.log(f"WARNING: {text}")
+        self.log(f"WARNING: {text}", WARNING)
 
     def save(self):
-        if not self.entries:
+        """Write everything logged so far and stop the writer thread.
+
+        The next entry starts a new writer, so a logger can be reused
+        across runs without keeping an idle thread.
+        """
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    close = save
+
+    def begin_run(self, target, **info):
+        """Start a journal run for ``target``; a no-op without a journal."""
+        if self.journal is None:
+            return None
+        self.run_id = self.journal.begin_run(target, info)
+        self._run_target = os.path.normcase(os.path.abspath(target))
+        return self.run_id
+
+    def end_run(self, status, output=None):
+        """Write pending entries, then close the current journal run."""
+        if self.journal is None or self.run_id is None:
+            return
+        self.save()
+        self.journal.end_run(self.run_id, status, output)
+        self.run_id = None
+        self._run_target = None
+
+    # --- фоновая запись ---------------------------------------------------
+
+    def _ensure_writer(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="xlmerger-log", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stop = False
+        try:
+            while not stop:
+                batch = [self._queue.get()]
+                while len(batch) < BATCH_SIZE:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if _STOP in batch:
+                    # Записи, пришедшие одновременно с остановкой, тоже пишутся.
+                    batch.remove(_STOP)
+                    stop = True
+                    while True:
+                        try:
+                            batch.append(self._queue.get_nowait())
+                        except queue.Empty:
+                            break
+                self._write_batch(batch)
+        finally:
+            self._close_stream()
+            if self._journal_conn is not None:
+                self._journal_conn.close()
+                self._journal_conn = None
+
+    def _write_batch(self, batch):
+        lines, events = [], []
+        for timestamp, level, message, fields, run_id, target in batch:
+            if level >= self.console_level:
+                logger.log(level, message)
+            if level >= self.file_level and self.log_file:
+                lines.append(self._format(timestamp, level, message, fields))
+            if self.journal is not None and fields and level in (COPY, ERROR):
+                events.append((
+                    run_id, timestamp, logging.getLevelName(level), target,
+                    fields["sheet"], fields["row"], fields["col"], fields["value"],
+                ))
+        if events:
+            self._write_events(events)
+        if not lines:
             return
-        os.makedirs(os.path.dirname(self.log_file) or ".", exist_ok=True)
-        with open(self.log_file, "a", encoding="utf-8") as f:
-            for entry in self.entries:
-                f.write(entry + "\n")
-        self.entries.clear()
\ No newline at end of file
+        data = "".join(lines)
+        try:
+            stream = self._open_stream(len(data.encode("utf-8")))
+            stream.write(data)
+            stream.flush()
+        except OSError as e:
+            logger.warning("Не удалось записать журнал %s: %s", self.log_file, e)
+            self._close_stream()
+
+    def _write_events(self, events):
+        try:
+            if self._journal_conn is None:
+                self._journal_conn = self.journal.connect()
+            self.journal.insert_events(self._journal_conn, events)
+        except sqlite3.Error as e:
+            logger.warning("Не удалось записать журнал %s: %s", self.journal.path, e)
+
+    def _format(self, timestamp, level, message, fields):
+        if self.fmt == FORMAT_JSON:
+            record = {
+                "time": datetime.datetime.fromtimestamp(timestamp).isoformat(timespec="milliseconds"),
+                "level": logging.getLevelName(level),
+                "message": message,
+                **fields,
+            }
+            return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        second = int(timestamp)
+        if self._stamp[0] != second:
+            # strftime на каждую строку заметно тормозит запись больших журналов.
+            self._stamp = (second, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second)))
+        return f"[{self._stamp[1]}] {message}\n"
+
+    def _open_stream(self, incoming):
+        if self._stream is None:
+            os.makedirs(os.path.dirname(self.log_file) or ".", exist_ok=True)
+            self._stream = open(self.log_file, "a", encoding="utf-8")
+        if self.max_bytes and self._stream.tell() and self._stream.tell() + incoming > self.max_bytes:
+            self._rotate()
+        return self._stream
+
+    def _rotate(self):
+        self._close_stream()
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                src = f"{self.log_file}.{index}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.log_file}.{index + 1}")
+            os.replace(self.log_file, f"{self.log_file}.1")
+        else:
+            os.remove(self.log_file)
+        self._stream = open(self.log_file, "a", encoding="utf-8")
+
+    def _close_stream(self):
+        if self._stream is not None:
+            try:
+                self._stream.close()
+            finally:
+                self._stream = None
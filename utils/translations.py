@@ -323,6 +323,32 @@ TRANSLATIONS = {
         "Вернуться к сопоставлению": "Return to mapping",
         "Закрыть": "Close",
         # --- End limit check translations ---
+        "Проверка после сохранения:": "Verify after save:",
+        "Быстрая (длина + CRC)": "Fast (length + CRC)",
+        "Строгая (SHA-256)": "Strict (SHA-256)",
+        "Выключена": "Off",
+        "Загружать только выбранные листы": "Load only the selected sheets",
+        "Записывать только изменённые ячейки при повторном запуске": "Write only changed cells on repeated runs",
+        "Не пересчитывать результат, если файлы и настройки не изменились": "Reuse the result when files and settings are unchanged",
+        "Продолжать прерванное копирование с места остановки": "Resume an interrupted copy where it stopped",
+        "Копировать сетевые файлы в локальный кэш": "Copy network files to a local cache",
+        "Разбирать папки с переводами параллельно": "Parse translation folders in parallel",
+        "Сопоставлять строки по ключу (ID)": "Match rows by key (ID)",
+        "Ключ в целевом (буква или заголовок):": "Target key (letter or header):",
+        "Ключ в переводах (буква):": "Source key (letter):",
+        "Ключ в переводах укажи буквой столбца, например A.": "Enter the source key as a column letter, e.g. A.",
+        "Ключ в переводах должен быть буквой столбца, например A.": "The source key must be a column letter, e.g. A.",
+        "Отменить": "Cancel",
+        "Отмена...": "Cancelling...",
+        "Файлов: {done} из {total}": "Files: {done} of {total}",
+        "{rate} ячеек/с": "{rate} cells/s",
+        "осталось ~{eta}": "~{eta} left",
+        "Копирование отменено": "Copy cancelled",
+        "Результат не сохранён": "Result was not saved",
+        "Копирование отменено. Результат не сохранён.": "Copy cancelled. The result was not saved.",
+        "Объединено файлов: {done} из {total}": "Merged files: {done} of {total}",
+        "Не удалось объединить:\n{details}": "Could not merge:\n{details}",
+        "Объединение отменено": "Merge cancelled",
         "✔ Готово!": "✔ Done!"
     },
     "ru": {